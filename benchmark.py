@@ -0,0 +1,187 @@
+import argparse
+import contextlib
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from consultas import Consultas
+from cubo import montar_cubo
+from dados import DIRETORIO_BASE, MAPA_COLUNAS, carregar_tabelas, graus_academicos, ler_fonte, processar_planilha
+from regression import GRAUS_CANDIDATOS, ajustar_polinomios, bandas_bootstrap, regressao_polinomial
+from sintetico import escalar_tabela
+from taxas import fatiar_taxas, matriz_aproveitamento
+
+CAMINHO_HISTORICO = DIRETORIO_BASE / 'data' / 'benchmarks' / 'historico.json'
+ESCALAS = [1, 10, 100, 1000]
+# Uma execução só é considerada regressão se ficar acima de LIMITE x a mediana das últimas execuções
+LIMITE = 1.5
+JANELA_HISTORICO = 5
+# Diferenças absolutas menores que esta (em segundos) são ruído de medição, mesmo acima do LIMITE
+TOLERANCIA_ABSOLUTA = 0.002
+# Orçamentos absolutos (segundos), verificados mesmo sem histórico: a página completa deve renderizar a tempo
+ORCAMENTOS = {'pagina_completa@1x': 3.0}
+
+# Mesmas categorias usadas nas taxas de aproveitamento do dashboard
+TAXAS = {coluna: (coluna, coluna) for coluna, modalidade, *_ in MAPA_COLUNAS if modalidade == 'Total'}
+TAXAS.update({coluna: (coluna, coluna) for coluna in ('Total presencial', 'Total geral remota')})
+
+
+def cronometrar(funcao, repeticoes: int = 5) -> float:
+    """Mediana, em segundos, de `repeticoes` execuções de `funcao`."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def _casos_dados(df_ingressantes: pd.DataFrame, df_concluintes: pd.DataFrame) -> dict:
+    # Caminhos quentes que dependem apenas das tabelas (executados em todas as escalas)
+    anos = sorted(df_ingressantes['Ano'].unique())
+    graus = graus_academicos(df_ingressantes['Grau'].unique())
+    serie = df_ingressantes[df_ingressantes['Grau'] == 'Total'][['Ano', 'Total geral']]
+    totais = df_ingressantes.pivot_table(index='Ano', columns='Grau', values='Total geral', aggfunc='sum')
+
+    # O bloco de filtros e KPIs do dashboard: Consultas.resultado (somar_cubo para os totais e serie_anual para a série).
+    # Sem memória, para medir a redução em si e não o acerto na memorização
+    consultas = Consultas({'Ingressantes': df_ingressantes, 'Concluintes': df_concluintes}, tamanho_maximo=0)
+
+    def consulta_filtro():
+        consultas.resultado('Ingressantes', anos[0], anos[-1], graus)
+        consultas.resultado('Concluintes', anos[0], anos[-1], graus)
+
+    def taxas():
+        matriz = matriz_aproveitamento(df_ingressantes, df_concluintes, TAXAS)
+        for categoria in TAXAS:
+            fatiar_taxas(matriz, anos[:-5], 5, [categoria])
+
+    return {
+        'montar_cubo': lambda: (montar_cubo(df_ingressantes), montar_cubo(df_concluintes)),
+        'consulta_filtro': consulta_filtro,
+        'calcular_taxas': taxas,
+        'regressao_polinomial': lambda: regressao_polinomial(serie, 3, 3, True),
+        'ajustar_polinomios_lote': lambda: ajustar_polinomios(totais.index, totais.fillna(0).to_numpy(), GRAUS_CANDIDATOS, 10),
+        'bandas_bootstrap': lambda: bandas_bootstrap(serie['Ano'], serie['Total geral'], 3, 10, 10_000),
+    }
+
+
+def _casos_reais() -> dict:
+    # Caminhos que dependem do arquivo real e do app (executados só na escala 1)
+    conteudo = ler_fonte()
+    casos = {
+        'carregar_tabelas_cache': carregar_tabelas,
+        'processar_planilha': lambda: processar_planilha(conteudo),
+    }
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return casos
+
+    def pagina_completa():
+        # O dashboard usa caminhos relativos à raiz do repositório (images/...)
+        with contextlib.chdir(DIRETORIO_BASE):
+            app = AppTest.from_file('dashboard-censo.py', default_timeout=120).run()
+        if app.exception:
+            raise RuntimeError(f"O dashboard falhou durante o benchmark: {app.exception[0].message}")
+
+    casos['pagina_completa'] = pagina_completa
+    return casos
+
+
+def executar(escalas: list[int], repeticoes: int) -> dict:
+    """
+    Executa todos os casos em todas as escalas.
+
+    Returns:
+        dict: '<caso>@<escala>x' -> mediana em segundos.
+    """
+    df_ingressantes, df_concluintes = carregar_tabelas()
+    resultados = {}
+    for escala in escalas:
+        casos = _casos_dados(escalar_tabela(df_ingressantes, escala, 1), escalar_tabela(df_concluintes, escala, 2))
+        if escala == 1:
+            casos.update(_casos_reais())
+        for nome, funcao in casos.items():
+            # A página completa é cara; poucas repetições bastam
+            resultados[f'{nome}@{escala}x'] = cronometrar(funcao, 2 if nome == 'pagina_completa' else repeticoes)
+            print(f"{nome:<26} {escala:>5}x  {resultados[f'{nome}@{escala}x'] * 1000:10.2f} ms", flush=True)
+    return resultados
+
+
+def comparar(resultados: dict, historico: list[dict], limite: float = LIMITE, orcamentos: dict = ORCAMENTOS) -> list[str]:
+    """
+    Compara os resultados com a mediana das últimas JANELA_HISTORICO execuções sem regressões e com os orçamentos.
+
+    Execuções que falharam ficam no histórico (marcadas com 'regressoes') mas não entram na referência,
+    senão repetir uma execução lenta a incorporaria à mediana e a verificação passaria.
+
+    Returns:
+        list[str]: Descrição de cada caso que regrediu além do limite ou passou do orçamento.
+    """
+    aprovadas = [execucao for execucao in historico if not execucao.get('regressoes')]
+    regressoes = []
+    for caso, tempo in resultados.items():
+        if caso in orcamentos and tempo > orcamentos[caso]:
+            regressoes.append(f"{caso}: {tempo * 1000:.2f} ms (orçamento {orcamentos[caso] * 1000:.0f} ms)")
+        anteriores = [execucao['resultados'][caso] for execucao in aprovadas[-JANELA_HISTORICO:] if caso in execucao['resultados']]
+        if not anteriores:
+            continue
+        referencia = statistics.median(anteriores)
+        if tempo > limite * referencia and tempo - referencia > TOLERANCIA_ABSOLUTA:
+            regressoes.append(f"{caso}: {tempo * 1000:.2f} ms (referência {referencia * 1000:.2f} ms, {tempo / referencia:.2f}x)")
+    return regressoes
+
+
+def _commit_atual() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=DIRETORIO_BASE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks dos caminhos de dados e modelagem do dashboard.")
+    parser.add_argument('--escalas', type=int, nargs='+', default=ESCALAS, help="Fatores de aumento dos dados sintéticos.")
+    parser.add_argument('--repeticoes', type=int, default=5, help="Execuções por caso (usa-se a mediana).")
+    parser.add_argument('--limite', type=float, default=LIMITE, help="Razão máxima em relação ao histórico antes de falhar.")
+    parser.add_argument('--orcamento-pagina', type=float, default=ORCAMENTOS['pagina_completa@1x'],
+                        help="Tempo máximo (segundos) da renderização completa do dashboard.")
+    parser.add_argument('--historico', type=Path, default=CAMINHO_HISTORICO, help="Arquivo JSON com o histórico de execuções.")
+    parser.add_argument('--nao-gravar', action='store_true', help="Não adiciona esta execução ao histórico.")
+    args = parser.parse_args()
+
+    historico = json.loads(args.historico.read_text()) if args.historico.exists() else []
+    resultados = executar(args.escalas, args.repeticoes)
+    regressoes = comparar(resultados, historico, args.limite, {**ORCAMENTOS, 'pagina_completa@1x': args.orcamento_pagina})
+
+    if not args.nao_gravar:
+        historico.append({
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'commit': _commit_atual(),
+            'python': platform.python_version(),
+            'maquina': platform.machine(),
+            'resultados': resultados,
+            'regressoes': regressoes,  # Não vazia: a execução fica fora da referência das próximas
+        })
+        args.historico.parent.mkdir(parents=True, exist_ok=True)
+        args.historico.write_text(json.dumps(historico, indent=2, ensure_ascii=False))
+
+    if regressoes:
+        print("\nRegressões de desempenho detectadas:")
+        for regressao in regressoes:
+            print(f"  - {regressao}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
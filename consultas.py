@@ -0,0 +1,181 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from cubo import montar_cubo, serie_anual, somar_cubo
+from dados import GRAUS_AGREGADOS
+from instrumentacao import cronometrado
+from taxas import matriz_aproveitamento
+
+# Número de filtros diferentes guardados em memória (os mais antigos são descartados)
+TAMANHO_MAXIMO = 512
+
+
+def chave_filtro(base: str, ano_inicio: int, ano_fim: int, graus) -> tuple:
+    """Chave canônica de um filtro da barra lateral (independe da ordem da seleção de graus)."""
+    return base, int(ano_inicio), int(ano_fim), tuple(sorted(graus))
+
+
+class Consultas:
+    """
+    Camada de consultas do dashboard: todos os totais e séries de um filtro saem do cubo pré-calculado.
+
+    Para cada (base, intervalo de anos, conjunto de graus) o bloco Ano x Grau x Medida do cubo é
+    somado sobre os graus uma vez, dando a série anual de todas as medidas; os totais do período
+    vêm das somas acumuladas do cubo (somar_cubo). O resultado é memorizado pela chave do filtro e compartilhado por
+    todas as seções da página (e, guardado com st.cache_resource, por todas as sessões).
+    Os recortes de linhas (selecao) e as matrizes de taxas (matriz_taxas) são memorizados do mesmo
+    jeito, então nenhuma sessão guarda cópias próprias de tabelas ou derivados.
+
+    Args:
+        tabelas (dict): Base ('Ingressantes'/'Concluintes') -> tabela larga.
+        tamanho_maximo (int): Número máximo de consultas memorizadas.
+    """
+
+    def __init__(self, tabelas: dict[str, pd.DataFrame], tamanho_maximo: int = TAMANHO_MAXIMO):
+        self.tabelas = tabelas
+        self.cubos = {base: montar_cubo(df) for base, df in tabelas.items()}
+        # Impressão digital do conteúdo das tabelas: identifica os dados em caches derivados (ex: figuras)
+        self.versao = '-'.join(
+            f"{int(pd.util.hash_pandas_object(df, index=False).sum()) & 0xFFFFFFFF:08x}" for df in tabelas.values()
+        )
+        self._iniciar_memoria(tamanho_maximo)
+
+    def _iniciar_memoria(self, tamanho_maximo: int) -> None:
+        self.tamanho_maximo = tamanho_maximo
+        self._memoria = OrderedDict()
+        self._trava = threading.Lock()
+
+    def salvar(self, caminho) -> None:
+        """Grava os cubos e a versão dos dados em um arquivo .npz (o instantâneo lido por carregar)."""
+        arrays = {'versao': np.array(self.versao)}
+        for base, cubo in self.cubos.items():
+            arrays.update({f'{base}.{campo}': np.asarray(valor) for campo, valor in cubo.items()})
+        np.savez(caminho, **arrays)
+
+    @classmethod
+    def carregar(cls, caminho, tabelas: dict[str, pd.DataFrame], tamanho_maximo: int = TAMANHO_MAXIMO) -> 'Consultas':
+        """Recria a camada gravada por salvar sobre as mesmas tabelas, sem montar os cubos nem recalcular a versão."""
+        consultas = cls.__new__(cls)
+        consultas.tabelas = tabelas
+        with np.load(caminho) as arquivo:
+            consultas.versao = str(arquivo['versao'])
+            consultas.cubos = {
+                base: {
+                    'anos': arquivo[f'{base}.anos'], 'graus': arquivo[f'{base}.graus'].tolist(),
+                    'medidas': arquivo[f'{base}.medidas'].tolist(),
+                    'valores': arquivo[f'{base}.valores'], 'acumulado': arquivo[f'{base}.acumulado'],
+                }
+                for base in tabelas
+            }
+        consultas._iniciar_memoria(tamanho_maximo)
+        return consultas
+
+    def anos(self, base: str) -> np.ndarray:
+        return self.cubos[base]['anos']
+
+    def graus(self, base: str, excluir=GRAUS_AGREGADOS) -> list[str]:
+        """Graus acadêmicos da base, na ordem da planilha, sem as linhas de total."""
+        return [g for g in self.cubos[base]['graus'] if g not in excluir]
+
+    @cronometrado(nome='Consultas.resultado')
+    def resultado(self, base: str, ano_inicio: int, ano_fim: int, graus) -> dict:
+        """
+        Todos os agregados de um filtro.
+
+        Args:
+            base (str): 'Ingressantes' ou 'Concluintes'.
+            ano_inicio (int): Primeiro ano do período (inclusive).
+            ano_fim (int): Último ano do período (inclusive).
+            graus (iterable): Graus acadêmicos selecionados.
+
+        Returns:
+            dict: 'chave' do filtro, 'totais' (pd.Series com o total de cada medida no período),
+            'serie' (pd.DataFrame com 'Ano' e uma coluna por medida, vazio se nenhum grau foi selecionado) e 'n_anos'.
+            Os objetos são compartilhados entre chamadas e não devem ser modificados.
+        """
+        chave = chave_filtro(base, ano_inicio, ano_fim, graus)
+
+        def calcular():
+            cubo = self.cubos[base]
+            serie = serie_anual(cubo, ano_inicio, ano_fim, graus, cubo['medidas'])
+            return {
+                'chave': chave,
+                # Somas acumuladas: o custo dos KPIs depende só do número de graus, não do número de anos
+                'totais': somar_cubo(cubo, ano_inicio, ano_fim, graus),
+                'serie': serie,
+                'n_anos': len(serie),
+            }
+
+        return self._memorizar(chave, calcular)
+
+    def _memorizar(self, chave: tuple, calcular):
+        # LRU compartilhado por todos os tipos de consulta (o primeiro elemento da chave distingue o tipo)
+        with self._trava:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                return self._memoria[chave]
+
+        resultado = calcular()
+        with self._trava:
+            self._memoria[chave] = resultado
+            while len(self._memoria) > self.tamanho_maximo:
+                self._memoria.popitem(last=False)
+        return resultado
+
+    def selecao(self, base: str, ano_inicio: int, ano_fim: int, graus) -> np.ndarray:
+        """
+        Posições das linhas da tabela larga que passam no filtro.
+
+        O filtro vira um vetor de posições (memorizado e compartilhado), não uma cópia das linhas;
+        as linhas só são materializadas por quem precisa delas (ver linhas).
+
+        Returns:
+            np.ndarray: Posições (int64) em ordem crescente, somente leitura.
+        """
+        base, ano_inicio, ano_fim, graus = chave_filtro(base, ano_inicio, ano_fim, graus)
+
+        def calcular():
+            df = self.tabelas[base]
+            posicoes = np.flatnonzero(df['Ano'].between(ano_inicio, ano_fim).to_numpy() & df['Grau'].isin(graus).to_numpy())
+            posicoes.flags.writeable = False
+            return posicoes
+
+        return self._memorizar(('selecao', base, ano_inicio, ano_fim, graus), calcular)
+
+    def matriz_taxas(self, modalidades: dict, graus) -> dict:
+        """
+        Matriz de taxas de aproveitamento (ver matriz_aproveitamento) dos graus selecionados, sobre todos os anos.
+
+        Args:
+            modalidades (dict): Categoria -> (coluna de ingressantes, coluna de concluintes).
+            graus (iterable): Graus acadêmicos selecionados.
+
+        Returns:
+            dict: Saída de matriz_aproveitamento, compartilhada entre chamadas (não deve ser modificada).
+        """
+        graus = tuple(sorted(graus))
+
+        def calcular():
+            series = [self.resultado(base, self.anos(base)[0], self.anos(base)[-1], graus)['serie']
+                      for base in ('Ingressantes', 'Concluintes')]
+            return matriz_aproveitamento(*series, modalidades)
+
+        return self._memorizar(('taxas', graus, tuple(modalidades.items())), calcular)
+
+    def linhas(self, base: str, ano_inicio: int, ano_fim: int, graus) -> pd.DataFrame:
+        """
+        Linhas da tabela larga que passam no filtro (para a aba de dados brutos e o download).
+
+        Args:
+            base (str): 'Ingressantes' ou 'Concluintes'.
+            ano_inicio (int): Primeiro ano do período (inclusive).
+            ano_fim (int): Último ano do período (inclusive).
+            graus (iterable): Graus acadêmicos selecionados.
+
+        Returns:
+            pd.DataFrame: Recorte da tabela original, com o índice original.
+        """
+        return self.tabelas[base].take(self.selecao(base, ano_inicio, ano_fim, graus))
@@ -0,0 +1,343 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xlrd
+
+# --- Fontes e Cache ---
+DIRETORIO_BASE = Path(__file__).resolve().parent
+CAMINHO_LOCAL = DIRETORIO_BASE / 'data' / 'raw' / 'tabelas_de_divulgacao_censo_da_educacao_superior_2023.xls'
+URL_REMOTA = 'https://raw.githubusercontent.com/MuriloBarros304/censo-graduacao-br/main/data/raw/tabelas_de_divulgacao_censo_da_educacao_superior_2023.xls'
+DIRETORIO_CACHE = DIRETORIO_BASE / 'data' / 'cache'
+
+_logger = logging.getLogger(__name__)
+
+# Versão do esquema abaixo: entra na chave do cache para invalidá-lo quando o registro mudar
+VERSAO_ESQUEMA = 2
+
+# --- Registro de Planilhas ---
+# Mapeamento das 24 colunas numéricas das tabelas 3.02/3.04/3.05 para as dimensões
+# (Modalidade, Categoria, Subcategoria). A ordem segue a ordem das colunas na planilha.
+MAPA_COLUNAS = [
+    ('Total geral', 'Total', 'Total', 'Total'),
+    ('Total geral publica', 'Total', 'Pública', 'Total'),
+    ('Total geral federal', 'Total', 'Pública', 'Federal'),
+    ('Total geral estadual', 'Total', 'Pública', 'Estadual'),
+    ('Total geral municipal', 'Total', 'Pública', 'Municipal'),
+    ('Total geral privada', 'Total', 'Privada', 'Total'),
+    ('Total geral com fins', 'Total', 'Privada', 'Com fins'),
+    ('Total geral sem fins', 'Total', 'Privada', 'Sem fins'),
+    ('Total presencial', 'Presencial', 'Total', 'Total'),
+    ('Total presencial publica', 'Presencial', 'Pública', 'Total'),
+    ('Total presencial federal', 'Presencial', 'Pública', 'Federal'),
+    ('Total presencial estadual', 'Presencial', 'Pública', 'Estadual'),
+    ('Total presencial municipal', 'Presencial', 'Pública', 'Municipal'),
+    ('Total presencial privada', 'Presencial', 'Privada', 'Total'),
+    ('Total presencial com fins', 'Presencial', 'Privada', 'Com fins'),
+    ('Total presencial sem fins', 'Presencial', 'Privada', 'Sem fins'),
+    ('Total geral remota', 'A distância', 'Total', 'Total'),
+    ('Total remota publica', 'A distância', 'Pública', 'Total'),
+    ('Total remota federal', 'A distância', 'Pública', 'Federal'),
+    ('Total remota estadual', 'A distância', 'Pública', 'Estadual'),
+    ('Total remota municipal', 'A distância', 'Pública', 'Municipal'),
+    ('Total remota privada', 'A distância', 'Privada', 'Total'),
+    ('Total remota com fins', 'A distância', 'Privada', 'Com fins'),
+    ('Total remota sem fins', 'A distância', 'Privada', 'Sem fins'),
+]
+COLUNAS = ['Ano', 'Grau'] + [coluna for coluna, *_ in MAPA_COLUNAS]
+# Linhas de 'Grau' que não são graus acadêmicos: o total da planilha e os cursos sem grau (ex: ABI)
+GRAUS_AGREGADOS = ('Total', 'Não aplicável')
+
+# Cada planilha declara:
+#   base: nome da base de dados na tabela de fatos
+#   arquivo: nome do arquivo Parquet da base no cache
+#   cabecalho: linha onde começa o cabeçalho (a célula da primeira coluna deve ser 'Ano')
+#   dados: intervalo [início, fim) das linhas de dados, excluindo o rodapé "Fonte: Mec/Inep"
+#   colunas: mapeamento das colunas para as dimensões
+REGISTRO_PLANILHAS = {
+    'Tab3.02': {'base': 'Matrículas', 'arquivo': 'matriculas', 'cabecalho': 2, 'dados': (7, 71), 'colunas': MAPA_COLUNAS},
+    'Tab3.04': {'base': 'Ingressantes', 'arquivo': 'ingressantes', 'cabecalho': 2, 'dados': (7, 71), 'colunas': MAPA_COLUNAS},
+    'Tab3.05': {'base': 'Concluintes', 'arquivo': 'concluintes', 'cabecalho': 2, 'dados': (8, 61), 'colunas': MAPA_COLUNAS},
+}
+
+DIMENSOES = ['Planilha', 'Base', 'Ano', 'Grau', 'Modalidade', 'Categoria', 'Subcategoria']
+
+
+def ler_fonte(caminho_local: Path = CAMINHO_LOCAL, url: str = URL_REMOTA) -> bytes:
+    """
+    Lê os bytes da planilha do INEP, priorizando a cópia local em data/raw/.
+
+    Args:
+        caminho_local (Path): Caminho da planilha no disco.
+        url (str): Endereço usado apenas quando a cópia local não existe.
+
+    Returns:
+        bytes: Conteúdo bruto do arquivo .xls.
+    """
+    if caminho_local is not None and Path(caminho_local).exists():
+        return Path(caminho_local).read_bytes()
+    with urllib.request.urlopen(url, timeout=30) as resposta:
+        return resposta.read()
+
+
+def hash_conteudo(conteudo: bytes) -> str:
+    """Retorna o SHA-256 (hexadecimal) do conteúdo da planilha."""
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def _limpar_tabela(df_bruto: pd.DataFrame, esquema: dict) -> pd.DataFrame:
+    # Recorta as linhas de dados declaradas no registro e aplica o mesmo tratamento do dashboard
+    if str(df_bruto.iat[esquema['cabecalho'], 0]).strip() != 'Ano':
+        raise ValueError(f"Cabeçalho inesperado na planilha da base {esquema['base']}: o layout do INEP mudou?")
+    inicio, fim = esquema['dados']
+    df = df_bruto.iloc[inicio:fim].copy()
+    df.columns = ['Ano', 'Grau'] + [coluna for coluna, *_ in esquema['colunas']]
+    df = df.dropna(how='all').reset_index(drop=True)
+    df['Ano'] = df['Ano'].ffill()
+    df = df.fillna(0).replace({'.': 0, '-': 0})
+
+    # Uma única conversão para todas as colunas numéricas (inclusive 'Ano'), em vez de uma por coluna
+    cols_to_convert = list(df.columns)
+    cols_to_convert.remove('Grau')
+    bloco = df[cols_to_convert].to_numpy(dtype=object)
+    numeros = pd.to_numeric(bloco.ravel(), errors='coerce').reshape(bloco.shape)
+    df[cols_to_convert] = np.nan_to_num(numeros, nan=0).astype(np.int64)
+    return compactar_tabela(df)
+
+
+def _menor_inteiro(valores: np.ndarray) -> np.dtype:
+    # Menor inteiro com sinal em que cabe a soma de cada coluna inteira, de modo que
+    # agregações por ano ou grau (que preservam o tipo no pandas) não transbordem
+    limite = int(np.abs(valores).sum(axis=0).max()) if valores.size else 0
+    for tipo in (np.int8, np.int16, np.int32):
+        if limite <= np.iinfo(tipo).max:
+            return np.dtype(tipo)
+    return np.dtype(np.int64)
+
+
+def colunas_medidas(df: pd.DataFrame) -> list[str]:
+    """Colunas de medidas de uma tabela larga: as numéricas, exceto 'Ano' ('Grau' e outras dimensões ficam de fora)."""
+    return [c for c in df.columns if c != 'Ano' and pd.api.types.is_numeric_dtype(df[c])]
+
+
+def compactar_tabela(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte uma tabela larga para a representação compacta usada no cache e no dashboard.
+
+    'Grau' (e qualquer outra dimensão de texto, como as dos dados sintéticos) vira categórica,
+    'Ano' vira int16 e as colunas numéricas passam, em uma única conversão, para o menor inteiro
+    que comporta a soma de qualquer uma delas. Todas as colunas numéricas ficam com o mesmo
+    tipo, o que as mantém em um único bloco de memória.
+
+    Args:
+        df (pd.DataFrame): Tabela larga com 'Ano', 'Grau' e as colunas numéricas inteiras.
+
+    Returns:
+        pd.DataFrame: Nova tabela com as mesmas colunas e valores.
+    """
+    numericas = colunas_medidas(df)
+    valores = df[numericas].to_numpy()
+    compacto = pd.DataFrame(valores.astype(_menor_inteiro(valores)), columns=numericas, index=df.index)
+    compacto.insert(0, 'Ano', df['Ano'].astype(np.int16))
+    dimensoes = [c for c in df.columns if c != 'Ano' and c not in numericas]
+    for posicao, coluna in enumerate(dimensoes, start=1):
+        compacto.insert(posicao, coluna, df[coluna].astype('category'))
+    return compacto
+
+
+def graus_academicos(graus) -> list[str]:
+    """Graus acadêmicos de uma lista de valores de 'Grau' (na mesma ordem), sem GRAUS_AGREGADOS."""
+    return [g for g in graus if g not in GRAUS_AGREGADOS]
+
+
+def memoria(df: pd.DataFrame) -> int:
+    """Memória ocupada pelo DataFrame em bytes, contando o conteúdo das strings."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def processar_planilha(conteudo: bytes, planilhas: list[str] | None = None, max_workers: int | None = None) -> dict[str, pd.DataFrame]:
+    """
+    Converte as planilhas registradas em REGISTRO_PLANILHAS nos DataFrames limpos (formato largo).
+
+    O arquivo é aberto uma única vez (um pd.read_excel por planilha relia o arquivo inteiro a
+    cada chamada) e, com on_demand, o xlrd só decodifica as planilhas pedidas. Cada planilha
+    é extraída e limpa em uma thread: a extração passa por uma trava, pois o livro do xlrd é
+    compartilhado e não suporta acesso concorrente, e a limpeza corre em paralelo.
+
+    Args:
+        conteudo (bytes): Conteúdo do arquivo .xls.
+        planilhas (list[str] | None): Nomes das planilhas a processar. Se None, processa todas as registradas.
+        max_workers (int | None): Número de threads. Se 1, processa no thread atual; se None, uma por planilha
+            (limitado ao número de núcleos).
+
+    Returns:
+        dict: DataFrame limpo de cada planilha, indexado pelo nome da planilha (ex: 'Tab3.04').
+    """
+    planilhas = list(REGISTRO_PLANILHAS) if planilhas is None else planilhas
+    trava = threading.Lock()
+
+    with pd.ExcelFile(xlrd.open_workbook(file_contents=conteudo, on_demand=True), engine='xlrd') as arquivo:
+        def processar(nome: str) -> pd.DataFrame:
+            with trava:
+                df_bruto = arquivo.parse(nome, header=None)
+            return _limpar_tabela(df_bruto, REGISTRO_PLANILHAS[nome])
+
+        if max_workers == 1 or len(planilhas) <= 1:
+            resultados = [processar(nome) for nome in planilhas]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers or min(len(planilhas), os.cpu_count() or 1)) as executor:
+                resultados = list(executor.map(processar, planilhas))
+    return dict(zip(planilhas, resultados))
+
+
+def tabela_fatos(tabelas: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Normaliza as planilhas em formato largo em uma única tabela longa de fatos.
+
+    Args:
+        tabelas (dict): Saída de processar_planilha.
+
+    Returns:
+        pd.DataFrame: Colunas Planilha, Base, Ano, Grau, Modalidade, Categoria, Subcategoria e valor,
+        com as dimensões codificadas como categóricas.
+    """
+    partes = []
+    for nome, df in tabelas.items():
+        esquema = REGISTRO_PLANILHAS[nome]
+        df_longo = df.melt(id_vars=['Ano', 'Grau'], var_name='Coluna', value_name='valor')
+        dimensoes = pd.DataFrame(esquema['colunas'], columns=['Coluna', 'Modalidade', 'Categoria', 'Subcategoria'])
+        df_longo = df_longo.merge(dimensoes, on='Coluna', how='left').drop(columns='Coluna')
+        df_longo.insert(0, 'Planilha', nome)
+        df_longo.insert(1, 'Base', esquema['base'])
+        partes.append(df_longo)
+
+    fatos = pd.concat(partes, ignore_index=True)[DIMENSOES + ['valor']]
+    fatos['Ano'] = fatos['Ano'].astype('int16')
+    for coluna in ['Planilha', 'Base', 'Grau', 'Modalidade', 'Categoria', 'Subcategoria']:
+        fatos[coluna] = fatos[coluna].astype('category')
+    return fatos
+
+
+def relatorio_memoria(tabelas: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Compara cada tabela compacta com a representação anterior (Grau como texto e int64).
+
+    Args:
+        tabelas (dict): Saída de processar_planilha.
+
+    Returns:
+        pd.DataFrame: Uma linha por tabela, com 'Base', 'Antes (KiB)', 'Depois (KiB)' e os tipos de Ano, Grau e valores.
+    """
+    linhas = []
+    for nome, df in tabelas.items():
+        antes = df.astype({'Grau': object}).astype({c: np.int64 for c in df.columns if c != 'Grau'})
+        linhas.append({
+            'Base': REGISTRO_PLANILHAS[nome]['base'], 'Antes (KiB)': round(memoria(antes) / 1024, 1),
+            'Depois (KiB)': round(memoria(df) / 1024, 1), 'Ano': str(df['Ano'].dtype), 'Grau': str(df['Grau'].dtype),
+            'Valores': str(df.iloc[:, 2].dtype),
+        })
+    return pd.DataFrame(linhas)
+
+
+def _ultimo_cache(diretorio_cache: Path) -> Path | None:
+    # Cache mais recente disponível, usado quando a fonte não pode ser lida (ex: sem rede)
+    candidatos = [d for d in Path(diretorio_cache).glob('*') if (d / 'fatos.parquet').exists()]
+    return max(candidatos, key=lambda d: d.stat().st_mtime) if candidatos else None
+
+
+def _ler_cache(destino: Path, arquivos: list[str]) -> list[pd.DataFrame]:
+    return [pd.read_parquet(destino / f'{arquivo}.parquet') for arquivo in arquivos]
+
+
+def atualizar_cache(caminho_local: Path = CAMINHO_LOCAL, url: str = URL_REMOTA,
+                    diretorio_cache: Path = DIRETORIO_CACHE, forcar: bool = False) -> Path:
+    """
+    Garante que o cache Parquet corresponda à planilha atual, reconstruindo-o apenas
+    quando o hash do conteúdo (ou a versão do esquema) muda.
+
+    Args:
+        caminho_local (Path): Cópia offline da planilha.
+        url (str): Endereço remoto da planilha, usado se não houver cópia local.
+        diretorio_cache (Path): Diretório onde os arquivos Parquet são gravados.
+        forcar (bool): Se True, reprocessa a planilha mesmo que o cache exista.
+
+    Returns:
+        Path: Diretório do cache com um arquivo por base e o fatos.parquet.
+    """
+    diretorio_cache = Path(diretorio_cache)
+    try:
+        conteudo = ler_fonte(caminho_local, url)
+    except OSError:
+        # Sem cópia local e sem rede: usa o último cache gravado, se houver
+        destino = _ultimo_cache(diretorio_cache)
+        if destino is None:
+            raise
+        return destino
+
+    chave = hash_conteudo(conteudo + f'esquema-v{VERSAO_ESQUEMA}'.encode())
+    destino = diretorio_cache / chave[:16]
+    if not forcar and (destino / 'fatos.parquet').exists():
+        return destino
+
+    tabelas = processar_planilha(conteudo)
+    if _logger.isEnabledFor(logging.INFO):  # O relatório copia as tabelas: só quando alguém vai lê-lo
+        _logger.info("Memória das tabelas:\n%s", relatorio_memoria(tabelas).to_string(index=False))
+
+    # Grava em um diretório temporário e renomeia, para nunca expor um cache pela metade
+    temporario = diretorio_cache / f'.{destino.name}.tmp'
+    shutil.rmtree(temporario, ignore_errors=True)
+    temporario.mkdir(parents=True)
+    for nome, df in tabelas.items():
+        df.to_parquet(temporario / f"{REGISTRO_PLANILHAS[nome]['arquivo']}.parquet", index=False)
+    tabela_fatos(tabelas).to_parquet(temporario / 'fatos.parquet', index=False)
+    shutil.rmtree(destino, ignore_errors=True)
+    temporario.rename(destino)
+
+    # Remove caches de versões anteriores da planilha
+    for antigo in diretorio_cache.iterdir():
+        if antigo.is_dir() and antigo != destino and not antigo.name.startswith('.'):
+            shutil.rmtree(antigo, ignore_errors=True)
+
+    return destino
+
+
+def carregar_tabelas(**kwargs) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Carrega ingressantes e concluintes (formato largo) a partir do cache Parquet local.
+
+    Args:
+        **kwargs: Repassados para atualizar_cache (caminho_local, url, diretorio_cache, forcar).
+
+    Returns:
+        tuple: DataFrames de ingressantes e concluintes.
+    """
+    df_ingressantes, df_concluintes = _ler_cache(atualizar_cache(**kwargs), ['ingressantes', 'concluintes'])
+    return df_ingressantes, df_concluintes
+
+
+def carregar_fatos(**kwargs) -> pd.DataFrame:
+    """
+    Carrega a tabela longa de fatos com todas as planilhas registradas.
+
+    Args:
+        **kwargs: Repassados para atualizar_cache (caminho_local, url, diretorio_cache, forcar).
+
+    Returns:
+        pd.DataFrame: Tabela de fatos (ver tabela_fatos).
+    """
+    return _ler_cache(atualizar_cache(**kwargs), ['fatos'])[0]
+
+
+if __name__ == '__main__':
+    # Etapa de ingestão: python dados.py
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    destino = atualizar_cache(forcar=True)
+    fatos = carregar_fatos()
+    print(f"Cache gravado em {destino}: {len(fatos)} fatos de {fatos['Planilha'].nunique()} planilhas.")
@@ -1,7 +1,20 @@
 import streamlit as st
+# A instrumentação vem antes das demais importações para medir quanto tempo elas levam no início a frio
+from instrumentacao import (iniciar_execucao, finalizar_execucao, secao, cronometrado, cache_instrumentado,
+                            medir_fragmento, importar_tardio, Amostrador, tabela_secoes, tabela_funcoes, tabela_inicio)
 import pandas as pd
-import plotly.express as px
-from regression import regressao_polinomial
+import numpy as np
+from regression import (ajustar_polinomios, bandas_bootstrap, tabela_ajustes, tabela_metricas, melhor_grau, GRAUS_CANDIDATOS,
+                        REAMOSTRAGENS)
+from pipeline import carregar_etapa, carregar_instantaneo
+from taxas import fatiar_taxas, tabela_defasagens
+from figuras import CacheFiguras, exibir_figura
+from previsoes import indexar_previsoes, consultar_previsao, HORIZONTE_MAXIMO
+from exportacao import REGISTRO_FORMATOS, exportado, formatos_disponiveis, ler_exportacao, lotes, tamanho_legivel
+from previsores import REGISTRO_MODELOS, CRITERIO, HORIZONTE_BACKTEST, TREINO_MINIMO, consultar_modelos
+
+# plotly.express só é carregado quando o primeiro gráfico é montado, depois que os KPIs já foram exibidos
+px = importar_tardio('plotly.express')
 
 # --- Configuração da Página ---
 # A configuração da página deve ser o primeiro comando do Streamlit
@@ -11,82 +24,81 @@ st.set_page_config(
     layout="wide" # 'centered' ou 'wide'
 )
 
+# --- Instrumentação ---
+# Cada execução grava os tempos por seção e os acertos/faltas de cache em data/metricas/execucoes.jsonl (rotacionado por tamanho).
+# Com ?profile=1 na URL a execução também roda sob um perfilador por amostragem, exibido na barra lateral.
+# A primeira execução de cada processo também grava as fases do início a frio (ver tabela_inicio).
+iniciar_execucao()
+modo_perfil = st.query_params.get('profile') == '1'
+amostrador = Amostrador().iniciar() if modo_perfil else None
+secao('Carregamento dos dados')
+
 # --- Carregamento e Cache dos Dados ---
-# @st.cache_data garante que o pré-processamento pesado só rode uma vez.
-@st.cache_data
-def carregar_dados():
-    path = 'https://raw.githubusercontent.com/MuriloBarros304/censo-graduacao-br/main/data/raw/tabelas_de_divulgacao_censo_da_educacao_superior_2023.xls'
-    # path = 'tabelas_de_divulgacao_censo_da_educacao_superior_2023.xls'
-    
+# @st.cache_resource guarda um único objeto por processo: todas as sessões leem as mesmas tabelas, sem cópias.
+@cache_instrumentado(st.cache_resource)
+def carregar_consultas():
+    # Camada de consultas sobre os cubos Ano x Grau x Medida: cada filtro (base, período, graus) é reduzido
+    # uma única vez e o resultado é memorizado e compartilhado entre seções, execuções e sessões.
+    # As tabelas vêm da etapa 'tabelas' do pipeline (a mesma que o notebook usa), que só é refeita quando o hash
+    # da planilha muda; são visões somente leitura do arquivo Arrow da etapa mapeado em memória (compartilhado
+    # até entre réplicas). Os cubos e a versão dos dados vêm do instantâneo gerado por `python pipeline.py`.
+    # A cópia em data/raw/ é usada como fonte offline; a URL do GitHub só é acessada se ela não existir.
     try:
-        df_ingressantes = pd.read_excel(path, sheet_name="Tab3.04", header=None)
-        df_concluintes = pd.read_excel(path, sheet_name="Tab3.05", header=None)
-        
-        df_ingressantes = df_ingressantes.iloc[7:].drop(71)
-        df_ingressantes.columns = [
-            'Ano', 'Grau', 'Total geral', 'Total geral publica', 'Total geral federal', 'Total geral estadual', 'Total geral municipal', 'Total geral privada',
-            'Total geral com fins', 'Total geral sem fins', 'Total presencial', 'Total presencial publica', 'Total presencial federal', 'Total presencial estadual',
-            'Total presencial municipal', 'Total presencial privada', 'Total presencial com fins', 'Total presencial sem fins', 'Total geral remota',
-            'Total remota publica', 'Total remota federal', 'Total remota estadual', 'Total remota municipal', 'Total remota privada', 'Total remota com fins', 'Total remota sem fins'
-        ]
-        df_ingressantes = df_ingressantes.dropna(how='all').reset_index(drop=True)
-        df_ingressantes['Ano'] = df_ingressantes['Ano'].ffill()
-        df_ingressantes = df_ingressantes.fillna(0).replace({'.': 0, '-': 0})
-
-        df_concluintes = df_concluintes.iloc[8:].drop(61)
-        df_concluintes.columns = [
-            'Ano', 'Grau', 'Total geral', 'Total geral publica', 'Total geral federal', 'Total geral estadual', 'Total geral municipal', 'Total geral privada',
-            'Total geral com fins', 'Total geral sem fins', 'Total presencial', 'Total presencial publica', 'Total presencial federal', 'Total presencial estadual',
-            'Total presencial municipal', 'Total presencial privada', 'Total presencial com fins', 'Total presencial sem fins', 'Total geral remota', 'Total remota publica',
-            'Total remota federal', 'Total remota estadual', 'Total remota municipal','Total remota privada', 'Total remota com fins', 'Total remota sem fins'
-        ]
-        df_concluintes = df_concluintes.dropna(how='all').reset_index(drop=True)
-        df_concluintes['Ano'] = df_concluintes['Ano'].ffill()
-        df_concluintes = df_concluintes.fillna(0).replace({'.': 0, '-': 0})
-        
-        cols_to_convert = list(df_ingressantes.columns)
-        cols_to_convert.remove('Grau')
-        for col in cols_to_convert:
-            df_ingressantes[col] = pd.to_numeric(df_ingressantes[col], errors='coerce').fillna(0).astype(int)
-            df_concluintes[col] = pd.to_numeric(df_concluintes[col], errors='coerce').fillna(0).astype(int)
-            
-        return df_ingressantes, df_concluintes
+        return carregar_instantaneo()
     
     except pd.errors.EmptyDataError:
         st.error("Erro ao carregar os dados. O arquivo está vazio ou não foi encontrado.")
-        return None, None
+        return None
     except pd.errors.ParserError as e:
         st.error(f"Erro de análise ao carregar os dados. Verifique o formato do arquivo. Erro: {e}")
-        return None, None
+        return None
     except Exception as e:
         st.error(f"Ocorreu um erro inesperado ao carregar os dados: {e}")
-        return None, None
+        return None
     
-@st.cache_data # Usando cache para otimizar os cálculos
-def calcular_taxas(dicionario_modalidades, df_ingressantes, df_concluintes, anos_ingresso, defasagem):
-    records = []
-    for ano in anos_ingresso:
-        ano_conc = ano + defasagem
-        if ano_conc in df_concluintes['Ano'].unique():
-            for nome, (c_ing, c_conc) in dicionario_modalidades.items():
-                ing = df_ingressantes.loc[df_ingressantes['Ano']==ano, c_ing].sum()
-                conc = df_concluintes.loc[df_concluintes['Ano']==ano_conc, c_conc].sum()
-                taxa = (conc/ing*100) if ing>0 else 0
-                records.append({
-                    'Ano Ingresso': ano,
-                    'Ano Conclusão': ano_conc,
-                    'Categoria': nome,
-                    'Taxa de Aproveitamento (%)': round(taxa, 2)
-                })
-    return pd.DataFrame(records)
+@cronometrado
+def calcular_taxas(dicionario_modalidades, graus, anos_ingresso, defasagem):
+    # A matriz (Ano Ingresso x defasagem 1 a 10 x Categoria) cobre todas as categorias de taxas_todas e fica na camada
+    # de consultas, calculada uma vez por seleção de graus para todas as sessões; período e defasagem apenas a fatiam
+    return fatiar_taxas(consultas.matriz_taxas(taxas_todas, graus), anos_ingresso, defasagem, list(dicionario_modalidades))
 
 # Carrega os dados usando a função cacheada
-df_ingressantes, df_concluintes = carregar_dados()
+consultas = carregar_consultas()
 
-if df_ingressantes is None or df_concluintes is None:
+if consultas is None:
     st.stop() # Interrompe a execução se os dados não puderem ser carregados
 
+@st.cache_resource
+def carregar_cache_figuras():
+    # Figuras já serializadas, compartilhadas entre execuções e sessões (LRU limitado em memória)
+    return CacheFiguras()
+
+def plotar(id_grafico, chave_filtro, construir):
+    # A figura só é montada e serializada se esta visão (gráfico, filtros, versão dos dados) ainda não estiver no cache
+    exibir_figura(carregar_cache_figuras(), id_grafico, chave_filtro, consultas.versao, construir)
+
+# As etapas 'previsoes' e 'modelos' são geradas antes, por `python pipeline.py`: calculá-las aqui abriria um pool
+# de processos dentro do servidor. Sem elas o dashboard funciona com menos recursos (ver carregar_pre_calculado).
+# Exceções não ficam no cache do Streamlit, então as etapas geradas depois passam a ser usadas sem reiniciar o app
+@cache_instrumentado(st.cache_resource)
+def carregar_indice_previsoes():
+    # Tabela somente leitura com as previsões de todas as combinações de filtros, compartilhada por todas as sessões
+    return indexar_previsoes(carregar_etapa('previsoes', calcular=False)['previsoes'])
+
+@cache_instrumentado(st.cache_resource)
+def carregar_modelos():
+    # Backtest de todos os modelos de previsão em todas as séries
+    return carregar_etapa('modelos', calcular=False)['modelos']
+
+def carregar_pre_calculado(carregar):
+    # Resultado de uma etapa pré-calculada, ou None se ela ainda não foi gerada
+    try:
+        return carregar()
+    except FileNotFoundError:
+        return None
+
 # --- Sidebar com Filtros ---
+secao('Filtros')
 st.sidebar.image("images/logo.png", width=250)
 st.sidebar.title("Filtros")
 st.sidebar.markdown("Use os filtros abaixo para explorar os dados:")
@@ -98,12 +110,9 @@ tipo_analise = st.sidebar.radio(
     key="tipo_analise"
 )
 
-# Define o dataframe ativo com base na seleção
-df_ativo = df_ingressantes if tipo_analise == "Ingressantes" else df_concluintes
-
 # Filtro de intervalo de anos
-ano_min = int(df_ativo["Ano"].min())
-ano_max = int(df_ativo["Ano"].max())
+ano_min = int(consultas.anos(tipo_analise)[0])
+ano_max = int(consultas.anos(tipo_analise)[-1])
 
 anos_selecionados = st.sidebar.slider(
     "Selecione o Período:",
@@ -123,18 +132,15 @@ else:
     texto_anos = f"período de {ano_inicio} a {ano_fim}"
 
 # Filtro de grau acadêmico
-graus_disponiveis = df_ativo[(df_ativo['Grau'] != 'Total') & (df_ativo['Grau'] != 'Não aplicável')]['Grau'].unique()
+graus_disponiveis = consultas.graus(tipo_analise)
 grau_selecionado = st.sidebar.multiselect(
     "Selecione o Grau Acadêmico:",
     options=graus_disponiveis,
     default=graus_disponiveis # Padrão para todos os graus
 )
 
-# Filtra o dataframe com base nas seleções
-df_filtrado = df_ativo[
-    (df_ativo['Ano'].between(ano_inicio, ano_fim)) &
-    (df_ativo["Grau"].isin(grau_selecionado))
-]
+# Todos os totais e séries do filtro atual, calculados uma única vez e lidos por todas as seções
+consulta = consultas.resultado(tipo_analise, ano_inicio, ano_fim, grau_selecionado)
 
 # --- Corpo Principal do Dashboard ---
 st.title(f"Dashboard do Censo da Educação Superior")
@@ -142,37 +148,39 @@ st.markdown(f"Fonte: [Censo da Educação Superior 2023](https://www.gov.br/inep
 st.markdown(f"## Análise de **{tipo_analise}** para o **{texto_anos}**")
 
 # --- KPIs ---
+secao('KPIs')
 st.markdown("---")
 st.subheader("Visão Geral")
-total_geral = df_filtrado['Total geral'].sum()
+totais = consulta['totais']
+total_geral = totais['Total geral']
 # Por categoria administrativa
-total_publica = df_filtrado['Total geral publica'].sum()
-total_privada = df_filtrado['Total geral privada'].sum()
+total_publica = totais['Total geral publica']
+total_privada = totais['Total geral privada']
 
 # Por modalidade
-total_presencial = df_filtrado['Total presencial'].sum()
-total_remota = df_filtrado['Total geral remota'].sum()
+total_presencial = totais['Total presencial']
+total_remota = totais['Total geral remota']
 
 # Por modalidade e categoria administrativa
-total_remota_publica = df_filtrado['Total remota publica'].sum()
-total_remota_privada = df_filtrado['Total remota privada'].sum()
-total_presencial_publica = df_filtrado['Total presencial publica'].sum()
-total_presencial_privada = df_filtrado['Total presencial privada'].sum()
+total_remota_publica = totais['Total remota publica']
+total_remota_privada = totais['Total remota privada']
+total_presencial_publica = totais['Total presencial publica']
+total_presencial_privada = totais['Total presencial privada']
 
 # Por modalidade e categoria administrativa (detalhado)
 # Públicas
-pres_estadual = df_filtrado['Total presencial estadual'].sum()
-pres_federal = df_filtrado['Total presencial federal'].sum()
-pres_mun = df_filtrado['Total presencial municipal'].sum()
-rem_estadual = df_filtrado['Total remota estadual'].sum()
-rem_federal = df_filtrado['Total remota federal'].sum()
-rem_mun = df_filtrado['Total remota municipal'].sum()
+pres_estadual = totais['Total presencial estadual']
+pres_federal = totais['Total presencial federal']
+pres_mun = totais['Total presencial municipal']
+rem_estadual = totais['Total remota estadual']
+rem_federal = totais['Total remota federal']
+rem_mun = totais['Total remota municipal']
 
 # Privadas
-pres_com_fins = df_filtrado['Total presencial com fins'].sum()
-rem_com_fins = df_filtrado['Total remota com fins'].sum()
-pres_sem_fins = df_filtrado['Total presencial sem fins'].sum()
-rem_sem_fins = df_filtrado['Total remota sem fins'].sum()
+pres_com_fins = totais['Total presencial com fins']
+rem_com_fins = totais['Total remota com fins']
+pres_sem_fins = totais['Total presencial sem fins']
+rem_sem_fins = totais['Total remota sem fins']
 
 # Layout em colunas para os KPIs
 col1, col2, col3 = st.columns(3)
@@ -198,204 +206,230 @@ mapa_de_cores = {
     'Com Fins': "#FFAA00",
     'Sem Fins': "#FF6F00"
 }
-tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(["Distribuições Gerais", "Modalidades de Ensino", "Categorias Administrativas", "Pública", "Privada", "Previsão de tendências", "Dados Brutos"])
 
-with tab1:
+# Cada aba é uma função: só a aba visível é executada (st.tabs executa o corpo de todas a cada rerun)
+def aba_distribuicoes():
     st.markdown(f"#### Distribuição Geral de {tipo_analise} ({texto_anos})")
     c1, c2 = st.columns(2)
     with c1:
-        df_adm = pd.DataFrame({
-            'Categoria': ['Pública', 'Privada'],
-            'Total': [total_publica, total_privada]
-        })
-        fig_dist_adm = px.bar(
-            df_adm,
-            x='Categoria',      # Eixo X com as categorias
-            y='Total',          # Eixo Y com os valores numéricos
-            title="Geral Por Categoria Administrativa",
-            color='Categoria',  # Colorir as barras pela categoria (funciona igual)
-            color_discrete_map=mapa_de_cores,
-            text_auto=True      # Adiciona o valor em cima de cada barra, ótimo para visualização!
-        )
-        st.plotly_chart(fig_dist_adm, use_container_width=True)
+        def montar_dist_adm():
+            df_adm = pd.DataFrame({
+                'Categoria': ['Pública', 'Privada'],
+                'Total': [total_publica, total_privada]
+            })
+            fig_dist_adm = px.bar(
+                df_adm,
+                x='Categoria',      # Eixo X com as categorias
+                y='Total',          # Eixo Y com os valores numéricos
+                title="Geral Por Categoria Administrativa",
+                color='Categoria',  # Colorir as barras pela categoria (funciona igual)
+                color_discrete_map=mapa_de_cores,
+                text_auto=True      # Adiciona o valor em cima de cada barra, ótimo para visualização!
+            )
+            return fig_dist_adm
+        plotar('dist_adm', consulta['chave'], montar_dist_adm)
     
     with c2:
         # O DataFrame continua o mesmo
-        df_mod = pd.DataFrame({
-            'Modalidade': ['Presencial', 'Remota (EAD)'],
-            'Total': [total_presencial, total_remota]
-        })
-        fig_dist_mod = px.bar(
-            df_mod,
-            x='Modalidade',     # Eixo X
-            y='Total',          # Eixo Y
-            title="Geral Por Modalidade de Ensino",
-            color='Modalidade', # Colorir as barras pela modalidade
-            color_discrete_map=mapa_de_cores,
-            text_auto=True      # Adiciona os valores nas barras
-        )
-        st.plotly_chart(fig_dist_mod, use_container_width=True)
-    df_adm_pie = pd.DataFrame({
-        'Categoria': ['Pública', 'Privada'],
-        'Total': [total_publica, total_privada]
-    })
-    fig_adm_pie = px.pie(
-        df_adm_pie,
-        names='Categoria',
-        values='Total',
-        title="Distribuição Geral por Categoria Administrativa",
-        hole=0.5,
-        color='Categoria',
-        color_discrete_map=mapa_de_cores
-    )
-    st.plotly_chart(fig_adm_pie, use_container_width=True)
-
-with tab2:
-    st.markdown(f"#### Categorias Administrativas de {tipo_analise} por Modalidade de Ensino ({texto_anos})")
-    c1, c2 = st.columns(2)
-    with c1:
-        df_adm_presencial = pd.DataFrame({
+        def montar_dist_mod():
+            df_mod = pd.DataFrame({
+                'Modalidade': ['Presencial', 'Remota (EAD)'],
+                'Total': [total_presencial, total_remota]
+            })
+            fig_dist_mod = px.bar(
+                df_mod,
+                x='Modalidade',     # Eixo X
+                y='Total',          # Eixo Y
+                title="Geral Por Modalidade de Ensino",
+                color='Modalidade', # Colorir as barras pela modalidade
+                color_discrete_map=mapa_de_cores,
+                text_auto=True      # Adiciona os valores nas barras
+            )
+            return fig_dist_mod
+        plotar('dist_mod', consulta['chave'], montar_dist_mod)
+    def montar_adm_pie():
+        df_adm_pie = pd.DataFrame({
             'Categoria': ['Pública', 'Privada'],
-            'Total': [total_presencial_publica, total_presencial_privada]
+            'Total': [total_publica, total_privada]
         })
-        fig_dist_adm_presencial = px.pie(
-            df_adm_presencial,
+        fig_adm_pie = px.pie(
+            df_adm_pie,
             names='Categoria',
             values='Total',
-            title="Modalidade Presencial",
-            hole=0.3,
+            title="Distribuição Geral por Categoria Administrativa",
+            hole=0.5,
             color='Categoria',
             color_discrete_map=mapa_de_cores
         )
-        st.plotly_chart(fig_dist_adm_presencial, use_container_width=True)
+        return fig_adm_pie
+    plotar('adm_pie', consulta['chave'], montar_adm_pie)
+
+def aba_modalidades():
+    st.markdown(f"#### Categorias Administrativas de {tipo_analise} por Modalidade de Ensino ({texto_anos})")
+    c1, c2 = st.columns(2)
+    with c1:
+        def montar_dist_adm_presencial():
+            df_adm_presencial = pd.DataFrame({
+                'Categoria': ['Pública', 'Privada'],
+                'Total': [total_presencial_publica, total_presencial_privada]
+            })
+            fig_dist_adm_presencial = px.pie(
+                df_adm_presencial,
+                names='Categoria',
+                values='Total',
+                title="Modalidade Presencial",
+                hole=0.3,
+                color='Categoria',
+                color_discrete_map=mapa_de_cores
+            )
+            return fig_dist_adm_presencial
+        plotar('dist_adm_presencial', consulta['chave'], montar_dist_adm_presencial)
     with c2:
-        df_adm_remota = pd.DataFrame({
-            'Categoria': ['Pública', 'Privada'],
-            'Total': [total_remota_publica, total_remota_privada]
-        })
-        fig_dist_adm_remota = px.pie(
-            df_adm_remota,
-            names='Categoria',
-            values='Total',
-            title="Modalidade Remota (EAD)",
-            hole=0.3,
-            color='Categoria',
-            color_discrete_map=mapa_de_cores
-        )
-        st.plotly_chart(fig_dist_adm_remota, use_container_width=True)
+        def montar_dist_adm_remota():
+            df_adm_remota = pd.DataFrame({
+                'Categoria': ['Pública', 'Privada'],
+                'Total': [total_remota_publica, total_remota_privada]
+            })
+            fig_dist_adm_remota = px.pie(
+                df_adm_remota,
+                names='Categoria',
+                values='Total',
+                title="Modalidade Remota (EAD)",
+                hole=0.3,
+                color='Categoria',
+                color_discrete_map=mapa_de_cores
+            )
+            return fig_dist_adm_remota
+        plotar('dist_adm_remota', consulta['chave'], montar_dist_adm_remota)
 
-with tab3:
+def aba_categorias():
     st.markdown(f"#### Modalidades de Ensino de {tipo_analise} por Categoria Administrativa ({texto_anos})")
     c1, c2 = st.columns(2)
     with c1:
-        df_mod_publica = pd.DataFrame({
-            'Modalidade': ['Presencial', 'Remota (EAD)'],
-            'Total': [total_presencial_publica, total_remota_publica]
-        })
-        fig_mod_publica = px.pie(
-            df_mod_publica,
-            names='Modalidade',
-            values='Total',
-            title="Instituições Públicas",
-            hole=0.3,
-            color='Modalidade',
-            color_discrete_map=mapa_de_cores
-        )
-        st.plotly_chart(fig_mod_publica, use_container_width=True)
+        def montar_mod_publica():
+            df_mod_publica = pd.DataFrame({
+                'Modalidade': ['Presencial', 'Remota (EAD)'],
+                'Total': [total_presencial_publica, total_remota_publica]
+            })
+            fig_mod_publica = px.pie(
+                df_mod_publica,
+                names='Modalidade',
+                values='Total',
+                title="Instituições Públicas",
+                hole=0.3,
+                color='Modalidade',
+                color_discrete_map=mapa_de_cores
+            )
+            return fig_mod_publica
+        plotar('mod_publica', consulta['chave'], montar_mod_publica)
     with c2:
-        df_mod_privada = pd.DataFrame({
-            'Modalidade': ['Presencial', 'Remota (EAD)'],
-            'Total': [total_presencial_privada, total_remota_privada]
-        })
-        fig_mod_privada = px.pie(
-            df_mod_privada,
-            names='Modalidade',
-            values='Total',
-            title="Instituições Privadas",
-            hole=0.3,
-            color='Modalidade',
-            color_discrete_map=mapa_de_cores
-        )
-        st.plotly_chart(fig_mod_privada, use_container_width=True)
+        def montar_mod_privada():
+            df_mod_privada = pd.DataFrame({
+                'Modalidade': ['Presencial', 'Remota (EAD)'],
+                'Total': [total_presencial_privada, total_remota_privada]
+            })
+            fig_mod_privada = px.pie(
+                df_mod_privada,
+                names='Modalidade',
+                values='Total',
+                title="Instituições Privadas",
+                hole=0.3,
+                color='Modalidade',
+                color_discrete_map=mapa_de_cores
+            )
+            return fig_mod_privada
+        plotar('mod_privada', consulta['chave'], montar_mod_privada)
 
-with tab4:
+def aba_publica():
     st.markdown(f"#### Detalhamento de Categorias Administrativas de {tipo_analise} Para o Setor Público ({texto_anos})")
     c1, c2 = st.columns(2)
     with c1:
-        df_presencial_detalhado = pd.DataFrame({
-            'Categoria': ['Federal', 'Estadual', 'Municipal'],
-            'Total': [pres_federal, pres_estadual, pres_mun]
-        })
-        fig_presencial_detalhado = px.pie(
-            df_presencial_detalhado,
-            names='Categoria',
-            values='Total',
-            title="Modalidade Presencial",
-            hole=0.3,
-            color='Categoria',
-            color_discrete_map=mapa_de_cores
-        )
-        fig_presencial_detalhado.for_each_trace(lambda t: t.update(name=t.name.replace('Total presencial ', '').capitalize()))
-        st.plotly_chart(fig_presencial_detalhado, use_container_width=True)
+        def montar_presencial_detalhado():
+            df_presencial_detalhado = pd.DataFrame({
+                'Categoria': ['Federal', 'Estadual', 'Municipal'],
+                'Total': [pres_federal, pres_estadual, pres_mun]
+            })
+            fig_presencial_detalhado = px.pie(
+                df_presencial_detalhado,
+                names='Categoria',
+                values='Total',
+                title="Modalidade Presencial",
+                hole=0.3,
+                color='Categoria',
+                color_discrete_map=mapa_de_cores
+            )
+            fig_presencial_detalhado.for_each_trace(lambda t: t.update(name=t.name.replace('Total presencial ', '').capitalize()))
+            return fig_presencial_detalhado
+        plotar('presencial_detalhado', consulta['chave'], montar_presencial_detalhado)
     with c2:
-        df_remota_detalhado = pd.DataFrame({
-            'Categoria': ['Federal', 'Estadual', 'Municipal'],
-            'Total': [rem_federal, rem_estadual, rem_mun]
-        })
-        fig_remota_detalhado = px.pie(
-            df_remota_detalhado,
-            names='Categoria',
-            values='Total',
-            title="Modalidade Remota (EAD)",
-            hole=0.3,
-            color='Categoria',
-            color_discrete_map=mapa_de_cores
-        )
-        fig_remota_detalhado.for_each_trace(lambda t: t.update(name=t.name.replace('Total remota ', '').capitalize()))
-        st.plotly_chart(fig_remota_detalhado, use_container_width=True)
+        def montar_remota_detalhado():
+            df_remota_detalhado = pd.DataFrame({
+                'Categoria': ['Federal', 'Estadual', 'Municipal'],
+                'Total': [rem_federal, rem_estadual, rem_mun]
+            })
+            fig_remota_detalhado = px.pie(
+                df_remota_detalhado,
+                names='Categoria',
+                values='Total',
+                title="Modalidade Remota (EAD)",
+                hole=0.3,
+                color='Categoria',
+                color_discrete_map=mapa_de_cores
+            )
+            fig_remota_detalhado.for_each_trace(lambda t: t.update(name=t.name.replace('Total remota ', '').capitalize()))
+            return fig_remota_detalhado
+        plotar('remota_detalhado', consulta['chave'], montar_remota_detalhado)
 
-with tab5:
+def aba_privada():
     st.markdown(f"#### Detalhamento de Categorias Administrativas de {tipo_analise} Para o Setor Privado ({texto_anos})")
     c1, c2 = st.columns(2)
     with c1:
-        df_presencial_privada = pd.DataFrame({
-            'Categoria': ['Com Fins', 'Sem Fins'],
-            'Total': [pres_com_fins, pres_sem_fins]
-        })
-        fig_presencial_privada = px.pie(
-            df_presencial_privada,
-            names='Categoria',
-            values='Total',
-            title="Modalidade Presencial",
-            hole=0.3,
-            color='Categoria',
-            color_discrete_map=mapa_de_cores
-        )
-        fig_presencial_privada.for_each_trace(lambda t: t.update(name=t.name.replace('Total presencial ', '').replace(' fins', '').capitalize()))
-        st.plotly_chart(fig_presencial_privada, use_container_width=True)
+        def montar_presencial_privada():
+            df_presencial_privada = pd.DataFrame({
+                'Categoria': ['Com Fins', 'Sem Fins'],
+                'Total': [pres_com_fins, pres_sem_fins]
+            })
+            fig_presencial_privada = px.pie(
+                df_presencial_privada,
+                names='Categoria',
+                values='Total',
+                title="Modalidade Presencial",
+                hole=0.3,
+                color='Categoria',
+                color_discrete_map=mapa_de_cores
+            )
+            fig_presencial_privada.for_each_trace(lambda t: t.update(name=t.name.replace('Total presencial ', '').replace(' fins', '').capitalize()))
+            return fig_presencial_privada
+        plotar('presencial_privada', consulta['chave'], montar_presencial_privada)
     with c2:
-        df_remota_privada = pd.DataFrame({
-            'Categoria': ['Com Fins', 'Sem Fins'],
-            'Total': [rem_com_fins, rem_sem_fins]
-        })
-        fig_remota_privada = px.pie(
-            df_remota_privada,
-            names='Categoria',
-            values='Total',
-            title="Modalidade Remota (EAD)",
-            hole=0.3,
-            color='Categoria',
-            color_discrete_map=mapa_de_cores
-        )
-        fig_remota_privada.for_each_trace(lambda t: t.update(name=t.name.replace('Total remota ', '').replace(' fins', '').capitalize()))
-        st.plotly_chart(fig_remota_privada, use_container_width=True)
+        def montar_remota_privada():
+            df_remota_privada = pd.DataFrame({
+                'Categoria': ['Com Fins', 'Sem Fins'],
+                'Total': [rem_com_fins, rem_sem_fins]
+            })
+            fig_remota_privada = px.pie(
+                df_remota_privada,
+                names='Categoria',
+                values='Total',
+                title="Modalidade Remota (EAD)",
+                hole=0.3,
+                color='Categoria',
+                color_discrete_map=mapa_de_cores
+            )
+            fig_remota_privada.for_each_trace(lambda t: t.update(name=t.name.replace('Total remota ', '').replace(' fins', '').capitalize()))
+            return fig_remota_privada
+        plotar('remota_privada', consulta['chave'], montar_remota_privada)
 
-with tab6:
+def aba_previsao():
     st.markdown("#### Previsão de Tendências Futuras")
     st.markdown(f"Analisando **{tipo_analise}** para o **{texto_anos}**")
     st.markdown("Grau(s) de graduação selecionado(s): " + ", ".join(grau_selecionado) if grau_selecionado else "Todos os Graus")
     st.markdown("Utilizando Regressão Polinomial para prever tendências futuras. Selecione o grau do polinômio e o número de anos para prever.")
     
+    grau_automatico = st.checkbox(
+        "Escolher o grau automaticamente (menor erro de validação cruzada leave-one-out)", value=True, key='grau_automatico'
+    )
+
     col1, col2, col3 = st.columns(3)
     with col1:
         anos_para_prever = st.number_input(
@@ -403,7 +437,7 @@ with tab6:
         )
     with col2:
         grau_polinomio = st.number_input(
-            "Grau do polinômio:", min_value=1, max_value=5, value=2, step=1, key='grau_polinomio'
+            "Grau do polinômio:", min_value=1, max_value=5, value=2, step=1, key='grau_polinomio', disabled=grau_automatico
         )
     with col3:
          filtro_regressao = st.selectbox(
@@ -417,70 +451,212 @@ with tab6:
         "Mostrar ajuste da curva polinomial nos dados históricos", value=True, key='mostrar_ajuste'
     )
 
-    df_para_previsao = df_filtrado.groupby('Ano', as_index=False).agg({
-        'Total geral': 'sum',
-        'Total geral publica': 'sum',
-        'Total geral privada': 'sum',
-        'Total presencial': 'sum',
-        'Total geral remota': 'sum'
-    })
-
-    df_regressao_input = df_para_previsao[['Ano', filtro_regressao]].copy()
-    df_regressao_input.rename(columns={filtro_regressao: 'Total geral'}, inplace=True)
+    df_para_previsao = consulta['serie'][
+        ['Ano', 'Total geral', 'Total geral publica', 'Total geral privada', 'Total presencial', 'Total geral remota']
+    ]
 
-    if len(df_filtrado) < 3: # Precisa de pelo menos 3 pontos para criar as features
+    if len(df_para_previsao) < 3: # Precisa de pelo menos 3 pontos para criar as features
         st.warning("Selecione um período com pelo menos 3 anos de dados para gerar uma previsão.")
     else:
-        df_resultado_previsao, betas = regressao_polinomial(df_regressao_input, anos_para_prever, grau_polinomio, mostrar_ajuste)
-        if not df_resultado_previsao.empty:
-            fig_previsao = px.line(
-                df_resultado_previsao, 
-                x='Ano', 
-                y='Total geral',
-                color='Tipo',
-                title=f"Previsão de {tipo_analise} para os próximos {anos_para_prever} anos analisando {filtro_regressao.title()}",
-                markers=True,
-                color_discrete_map={
-                    'Histórico': "#00BFC9",
-                    'Ajuste Polinomial': "#4EB504",
-                    'Previsão Polinomial': "#E95500"
-                }
+        # Todos os graus candidatos, com suas métricas de validação, vêm da tabela pré-calculada
+        resultado_graus = consultar_previsao(
+            carregar_pre_calculado(carregar_indice_previsoes), tipo_analise, grau_selecionado, ano_inicio, ano_fim, filtro_regressao, anos_para_prever
+        )
+        if resultado_graus is None: # Combinação fora da tabela (ou tabela não gerada): ajusta na hora, em um único lote
+            resultado_graus = ajustar_polinomios(
+                df_para_previsao['Ano'], df_para_previsao[filtro_regressao], GRAUS_CANDIDATOS, anos_para_prever
             )
-            fig_previsao.update_xaxes(dtick=1)
-            st.plotly_chart(fig_previsao, use_container_width=True)
+        grau_sugerido = int(melhor_grau(resultado_graus)[0])
+        if grau_automatico:
+            grau_polinomio = grau_sugerido
+
+        k = GRAUS_CANDIDATOS.index(grau_polinomio)
+        betas = resultado_graus['coeficientes'][k, :grau_polinomio + 1, 0]
+        if np.isnan(betas).any(): # Pontos insuficientes para o grau pedido
+            df_resultado_previsao = pd.DataFrame()
+        else:
+            df_resultado_previsao = tabela_ajustes(resultado_graus, mostrar_curva=mostrar_ajuste)
+            df_resultado_previsao = df_resultado_previsao[df_resultado_previsao['Grau'] == grau_polinomio]
+            df_resultado_previsao = df_resultado_previsao[['Ano', 'Valor', 'Tipo']].rename(columns={'Valor': 'Total geral'}).reset_index(drop=True)
+        if not df_resultado_previsao.empty:
+            # Banda de previsão por bootstrap dos resíduos: todas as reamostragens saem de um único solve (poucos ms)
+            bandas = bandas_bootstrap(df_para_previsao['Ano'], df_para_previsao[filtro_regressao], grau_polinomio, anos_para_prever)
+            def montar_previsao():
+                fig_previsao = px.line(
+                    df_resultado_previsao, 
+                    x='Ano', 
+                    y='Total geral',
+                    color='Tipo',
+                    title=f"Previsão de {tipo_analise} para os próximos {anos_para_prever} anos analisando {filtro_regressao.title()} (grau {grau_polinomio})",
+                    markers=True,
+                    color_discrete_map={
+                        'Histórico': "#00BFC9",
+                        'Ajuste Polinomial': "#4EB504",
+                        'Previsão Polinomial': "#E95500"
+                    }
+                )
+                fig_previsao.add_scatter(
+                    x=bandas['anos_futuros'], y=bandas['limite_superior'][:, 0], mode='lines', line_width=0,
+                    showlegend=False, hoverinfo='skip'
+                )
+                fig_previsao.add_scatter(
+                    x=bandas['anos_futuros'], y=bandas['limite_inferior'][:, 0], mode='lines', line_width=0,
+                    fill='tonexty', fillcolor='rgba(233, 85, 0, 0.2)', name='Banda de previsão 95% (bootstrap)'
+                )
+                fig_previsao.update_xaxes(dtick=1)
+                return fig_previsao
+            plotar('previsao', (consulta['chave'], filtro_regressao, anos_para_prever, grau_polinomio, mostrar_ajuste), montar_previsao)
+
+            st.markdown("###### Qualidade do ajuste por grau do polinômio:")
+            df_metricas = tabela_metricas(resultado_graus).drop(columns='Série').set_index('Grau')
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Erro LOO (RMSE)", f"{df_metricas.loc[grau_polinomio, 'Erro LOO (RMSE)']:,.0f}".replace(",", "."),
+                      help="Erro médio ao prever cada ano com o modelo ajustado sem ele (validação cruzada leave-one-out, calculada em forma fechada).")
+            c2.metric("AICc", f"{df_metricas.loc[grau_polinomio, 'AICc']:.2f}")
+            c3.metric("BIC", f"{df_metricas.loc[grau_polinomio, 'BIC']:.2f}")
+            if grau_polinomio > grau_sugerido:
+                st.warning(f"O grau {grau_polinomio} tem erro de validação cruzada maior que o grau {grau_sugerido}; graus altos com poucos anos tendem a sobreajustar.")
+            elif grau_polinomio < grau_sugerido:
+                st.warning(f"O grau {grau_polinomio} tem erro de validação cruzada maior que o grau {grau_sugerido}; um grau baixo pode não acompanhar a curvatura da série.")
+            st.dataframe(df_metricas.style.highlight_min(subset=['Erro LOO (RMSE)'], color='#005A9C'), use_container_width=True)
+
+            st.markdown("###### Intervalo de previsão (95%):")
+            st.dataframe(pd.DataFrame({
+                'Ano': resultado_graus['anos_futuros'].astype(int),
+                'Previsão': resultado_graus['previsoes'][k, :, 0],
+                'Limite inferior': resultado_graus['limite_inferior'][k, :, 0],
+                'Limite superior': resultado_graus['limite_superior'][k, :, 0],
+                'Bootstrap inferior': bandas['limite_inferior'][:, 0],
+                'Bootstrap superior': bandas['limite_superior'][:, 0],
+            }), hide_index=True)
+            st.caption(f"Limites pela distribuição t (supõe resíduos normais) e pelo bootstrap dos resíduos ({REAMOSTRAGENS} reamostragens, a banda sombreada no gráfico).")
+
             st.markdown("###### Coeficientes do Polinômio Ajustado:")
             for i, beta in enumerate(betas):
                 st.markdown(f"**β{i} (x^{i})**: {beta:.4f}")
             with st.expander("Ver dados da previsão"):
                 st.dataframe(df_resultado_previsao)
 
-with tab7:
+        with st.expander("Comparar previsões de todos os graus do polinômio"):
+            def montar_graus():
+                df_graus = tabela_ajustes(resultado_graus, [filtro_regressao], mostrar_curva=False)
+                df_graus = df_graus[(df_graus['Tipo'] != 'Histórico') | (df_graus['Grau'] == GRAUS_CANDIDATOS[0])]
+                df_graus['Modelo'] = df_graus['Grau'].map(lambda g: f"Grau {g}").where(df_graus['Tipo'] != 'Histórico', 'Histórico')
+                fig_graus = px.line(
+                    df_graus.dropna(subset=['Valor']), x='Ano', y='Valor', color='Modelo', markers=True,
+                    title=f"Previsões de {filtro_regressao.title()} por grau do polinômio",
+                    labels={'Valor': filtro_regressao}
+                )
+                fig_graus.update_xaxes(dtick=1)
+                return fig_graus
+            plotar('graus', (consulta['chave'], filtro_regressao, anos_para_prever), montar_graus)
+
+    st.markdown("###### Comparação de modelos (backtest com origem móvel):")
+    df_modelos_todos = carregar_pre_calculado(carregar_modelos)
+    if df_modelos_todos is None:
+        st.info("A comparação de modelos ainda não foi calculada: execute `python pipeline.py modelos`.")
+        return
+    df_modelos = consultar_modelos(df_modelos_todos, tipo_analise, grau_selecionado, filtro_regressao)
+    if df_modelos.empty or not df_modelos['Melhor'].any():
+        st.info("Não há backtest dos modelos para esta combinação de graus.")
+    else:
+        melhor = df_modelos.loc[df_modelos['Melhor'], 'Modelo'].iloc[0]
+        st.markdown(f"Melhor modelo para **{filtro_regressao}**: **{melhor}** ({REGISTRO_MODELOS[melhor]['descricao']}).")
+        st.dataframe(
+            df_modelos[['Modelo', 'MAE', 'RMSE', 'MAPE (%)']].set_index('Modelo').style.highlight_min(subset=[CRITERIO], color='#005A9C'),
+            use_container_width=True
+        )
+        st.caption(f"Cada modelo é ajustado com os primeiros anos do período completo da base (a partir de {TREINO_MINIMO}) e prevê "
+                   f"até {HORIZONTE_BACKTEST} anos à frente; os erros comparam essas previsões com os anos observados. "
+                   f"O melhor modelo é o de menor {CRITERIO}.")
+
+        def montar_modelos():
+            ano_fim_modelos = int(df_modelos['Ano fim'].iloc[0])
+            h = min(anos_para_prever, HORIZONTE_MAXIMO)
+            df_historico = df_para_previsao[['Ano', filtro_regressao]].rename(columns={filtro_regressao: 'Valor'})
+            df_comparacao = pd.concat(
+                [df_historico.assign(Modelo='Histórico')] + [
+                    pd.DataFrame({'Ano': ano_fim_modelos + np.arange(1, h + 1), 'Valor': np.asarray(linha['previsoes'])[:h],
+                                  'Modelo': linha['Modelo']})
+                    for _, linha in df_modelos.iterrows()
+                ],
+                ignore_index=True
+            )
+            fig_modelos = px.line(
+                df_comparacao.dropna(subset=['Valor']), x='Ano', y='Valor', color='Modelo', markers=True,
+                title=f"Previsões de {filtro_regressao.title()} por modelo", labels={'Valor': filtro_regressao}
+            )
+            fig_modelos.update_xaxes(dtick=1)
+            return fig_modelos
+        plotar('modelos', (consulta['chave'], filtro_regressao, anos_para_prever), montar_modelos)
+
+def aba_dados_brutos():
     st.markdown(f"#### Dados Filtrados ({tipo_analise} - {texto_anos})")
+    df_filtrado = consultas.linhas(tipo_analise, ano_inicio, ano_fim, grau_selecionado)
     st.dataframe(df_filtrado)
-    @st.cache_data
-    def convert_df_to_csv(df): return df.to_csv(index=False).encode('utf-8')
-    csv = convert_df_to_csv(df_filtrado)
-    st.download_button(label="Baixar dados como CSV", data=csv, file_name=f'{tipo_analise.lower()}_{anos_selecionados}.csv', mime='text/csv')
+
+    # O arquivo só é gerado quando pedido, escrito em lotes e guardado em disco pela chave do filtro:
+    # outras sessões (e esta, nas próximas execuções) baixam o mesmo arquivo sem gerá-lo de novo.
+    # Os bytes só são lidos e entregues ao botão de download na execução do clique, não a cada rerun
+    formatos = formatos_disponiveis()
+    formato = st.radio("Formato do arquivo:", formatos, horizontal=True, key='formato_exportacao')
+    if len(formatos) < len(REGISTRO_FORMATOS):
+        st.caption("Indisponível (dependência não instalada): " + ", ".join(f for f in REGISTRO_FORMATOS if f not in formatos))
+    chave_exportacao = (consultas.versao,) + consulta['chave']
+    arquivo = exportado(chave_exportacao, formato)
+    rotulo = f"Gerar arquivo {formato}" if arquivo is None else f"Preparar download ({tamanho_legivel(arquivo.stat().st_size)})"
+    if st.button(rotulo, key='gerar_exportacao'):
+        with st.spinner(f"Preparando arquivo {formato}..."):
+            try:
+                dados_arquivo = ler_exportacao(
+                    lambda: lotes(consultas.tabelas[tipo_analise],
+                                  consultas.selecao(tipo_analise, ano_inicio, ano_fim, grau_selecionado)),
+                    chave_exportacao, formato
+                )
+            except ValueError as e:
+                st.error(f"Não foi possível gerar o arquivo: {e}")
+            else:
+                # on_click='ignore': baixar não reexecuta o script
+                st.download_button(
+                    label=f"Baixar dados como {formato} ({tamanho_legivel(len(dados_arquivo))})", data=dados_arquivo,
+                    file_name=f"{tipo_analise.lower()}_{anos_selecionados}.{REGISTRO_FORMATOS[formato]['extensao']}",
+                    mime=REGISTRO_FORMATOS[formato]['mime'], key='baixar_exportacao', on_click='ignore'
+                )
+
+ABAS_PRINCIPAIS = {
+    "Distribuições Gerais": aba_distribuicoes,
+    "Modalidades de Ensino": aba_modalidades,
+    "Categorias Administrativas": aba_categorias,
+    "Pública": aba_publica,
+    "Privada": aba_privada,
+    "Previsão de tendências": aba_previsao,
+    "Dados Brutos": aba_dados_brutos,
+}
+
+@st.fragment
+@medir_fragmento('Gráficos principais')
+def graficos_principais():
+    # Fragmento: trocar de aba ou mexer nos controles da previsão reexecuta só este bloco, não a página inteira
+    aba = st.radio("Seção", list(ABAS_PRINCIPAIS), horizontal=True, key='aba_principal', label_visibility='collapsed')
+    secao(f'Aba: {aba}')
+    ABAS_PRINCIPAIS[aba]()
+
+graficos_principais()
 
 # --- Comparação entre Ingressantes e Concluintes ---
+secao('Ingressantes vs. Concluintes')
 st.markdown("---")
 st.subheader(f"Ingressantes vs. Concluintes ({texto_anos})")
 st.subheader("Comparação de Ingressantes e Concluintes em Valores Absolutos")
 st.markdown(f"Analisando os graus: **{', '.join(grau_selecionado)}**")
 
-# Filtrar ambos os dataframes com base nas seleções da sidebar
-df_ing_filtrado = df_ingressantes[
-    (df_ingressantes['Ano'].between(ano_inicio, ano_fim)) &
-    (df_ingressantes["Grau"].isin(grau_selecionado))
-]
-df_con_filtrado = df_concluintes[
-    (df_concluintes["Ano"].between(ano_inicio, ano_fim)) &
-    (df_concluintes["Grau"].isin(grau_selecionado))
-]
+# Totais de ambas as bases com base nas seleções da sidebar (a base ativa já está memorizada)
+totais_ing = consultas.resultado('Ingressantes', ano_inicio, ano_fim, grau_selecionado)['totais']
+totais_con = consultas.resultado('Concluintes', ano_inicio, ano_fim, grau_selecionado)['totais']
 
 # Calcular totais para a métrica
-total_ing = df_ing_filtrado['Total geral'].sum()
-total_con = df_con_filtrado['Total geral'].sum()
+total_ing = totais_ing['Total geral']
+total_con = totais_con['Total geral']
 proporcao = (total_con / total_ing ) * 100 if total_ing > 0 else 0
 
 st.metric(
@@ -489,58 +665,26 @@ st.metric(
     help="Proporção de alunos que concluíram em relação aos ingressantes no período selecionado. Esta métrica ajuda a entender a retenção e conclusão dos alunos nas instituições de ensino superior. Fórmula utilizada: (Total Concluintes / Total Ingressantes) * 100."
 )
 
-# Preparar dados para o gráfico de barras comparativo
-dados_comparativos = {
-    'Métrica': ['Pública', 'Privada', 'Presencial', 'Remota (EAD)'],
-    'Ingressantes': [
-        df_ing_filtrado['Total geral publica'].sum(), df_ing_filtrado['Total geral privada'].sum(),
-        df_ing_filtrado['Total presencial'].sum(), df_ing_filtrado['Total geral remota'].sum()
-    ],
-    'Concluintes': [
-        df_con_filtrado['Total geral publica'].sum(), df_con_filtrado['Total geral privada'].sum(),
-        df_con_filtrado['Total presencial'].sum(), df_con_filtrado['Total geral remota'].sum()
-    ]
-}
-df_comparativo_plot = pd.DataFrame(dados_comparativos).melt( # Transformando o DataFrame para o formato longo
-    id_vars='Métrica', var_name='Tipo', value_name='Número de Alunos'
-)
-
-# Gráfico de barras agrupado
-fig_comparativo = px.bar(
-    df_comparativo_plot, x='Métrica', y='Número de Alunos', color='Tipo',
-    barmode='group', title=f"Comparativo Detalhado para o {texto_anos}",
-    labels={'Número de Alunos': 'Total de Alunos', 'Métrica': 'Categoria'},
-    text_auto=True, color_discrete_map={'Ingressantes':"#179501", 'Concluintes':"#FFC105"}
-)
-st.plotly_chart(fig_comparativo, use_container_width=True)
-
-st.markdown("---")
-st.subheader("Comparação de Ingressantes e Concluintes em Taxa de Aproveitamento")
-df_ing_para_taxa = df_ingressantes[df_ingressantes["Grau"].isin(grau_selecionado)]
-df_con_para_taxa = df_concluintes[df_concluintes["Grau"].isin(grau_selecionado)]
-st.sidebar.markdown("### Filtros da Taxa de Aproveitamento")
-
-# Slider para selecionar o intervalo de anos de INGRESSO
-anos_disponiveis = sorted(df_ingressantes['Ano'].unique())
-anos_ingresso_selecionados = st.sidebar.slider(
-    "Selecione o período de ingresso para a análise:",
-    min_value=min(anos_disponiveis),
-    max_value=max(anos_disponiveis) - 5, # Garante que há dados de conclusão
-    value=(min(anos_disponiveis), max(anos_disponiveis) - 5), # Padrão: seleciona o intervalo completo menos 5 anos (defasagem padrão)
-    step=1,
-    key='anos_ingresso_selecionados'
-)
-
-# Input para a defasagem de anos
-defasagem_anos = st.sidebar.number_input(
-    "Defasagem de anos para conclusão:",
-    min_value=1,
-    max_value=10,
-    value=5
-)
+def montar_comparativo():
+    # Preparar dados para o gráfico de barras comparativo
+    dados_comparativos = {
+        'Métrica': ['Pública', 'Privada', 'Presencial', 'Remota (EAD)'],
+        'Ingressantes': list(totais_ing[['Total geral publica', 'Total geral privada', 'Total presencial', 'Total geral remota']]),
+        'Concluintes': list(totais_con[['Total geral publica', 'Total geral privada', 'Total presencial', 'Total geral remota']])
+    }
+    df_comparativo_plot = pd.DataFrame(dados_comparativos).melt( # Transformando o DataFrame para o formato longo
+        id_vars='Métrica', var_name='Tipo', value_name='Número de Alunos'
+    )
 
-# Gera a lista de anos de ingresso a partir da seleção do slider
-anos_ing = range(anos_ingresso_selecionados[0], anos_ingresso_selecionados[1] + 1)
+    # Gráfico de barras agrupado
+    fig_comparativo = px.bar(
+        df_comparativo_plot, x='Métrica', y='Número de Alunos', color='Tipo',
+        barmode='group', title=f"Comparativo Detalhado para o {texto_anos}",
+        labels={'Número de Alunos': 'Total de Alunos', 'Métrica': 'Categoria'},
+        text_auto=True, color_discrete_map={'Ingressantes':"#179501", 'Concluintes':"#FFC105"}
+    )
+    return fig_comparativo
+plotar('comparativo', consulta['chave'][1:], montar_comparativo) # Não depende da base selecionada
 
 # --- Dicionários de Taxas ---
 taxas_geral = {'Taxa Geral': ('Total geral', 'Total geral')}
@@ -548,61 +692,101 @@ taxas_setor = {'Pública': ('Total geral publica', 'Total geral publica'), 'Priv
 taxas_modalidade = {'Presencial': ('Total presencial', 'Total presencial'), 'Remota (EAD)': ('Total geral remota', 'Total geral remota')}
 taxas_detalhe_pub = {'Federal': ('Total geral federal', 'Total geral federal'), 'Estadual': ('Total geral estadual', 'Total geral estadual'), 'Municipal': ('Total geral municipal', 'Total geral municipal')}
 taxas_detalhe_priv = {'Com Fins': ('Total geral com fins', 'Total geral com fins'), 'Sem Fins': ('Total geral sem fins', 'Total geral sem fins')}
+taxas_todas = {**taxas_geral, **taxas_setor, **taxas_modalidade, **taxas_detalhe_pub, **taxas_detalhe_priv}
+
+# Abas da análise detalhada: (dicionário de taxas, título do gráfico)
+ABAS_TAXAS = {
+    "Por Categoria Administrativa": (taxas_setor, 'Taxa de Aproveitamento por Categoria Administrativa'),
+    "Por Modalidade de Ensino": (taxas_modalidade, 'Taxa de Aproveitamento por Modalidade de Ensino'),
+    "Público": (taxas_detalhe_pub, 'Taxa de Aproveitamento no Setor Público'),
+    "Privado": (taxas_detalhe_priv, 'Taxa de Aproveitamento no Setor Privado'),
+}
 
+@st.fragment
+@medir_fragmento('Taxa de aproveitamento')
+def taxa_aproveitamento(anos_disponiveis, graus):
+    # Fragmento: o período de ingresso, a defasagem e a aba detalhada reexecutam só esta seção.
+    # Os filtros ficam na própria seção porque um fragmento não pode escrever na barra lateral.
+    st.markdown("##### Filtros da Taxa de Aproveitamento")
+    c1, c2 = st.columns([3, 1])
+    with c1:
+        # Slider para selecionar o intervalo de anos de INGRESSO
+        anos_ingresso_selecionados = st.slider(
+            "Selecione o período de ingresso para a análise:",
+            min_value=min(anos_disponiveis),
+            max_value=max(anos_disponiveis) - 5, # Garante que há dados de conclusão
+            value=(min(anos_disponiveis), max(anos_disponiveis) - 5), # Padrão: seleciona o intervalo completo menos 5 anos (defasagem padrão)
+            step=1,
+            key='anos_ingresso_selecionados'
+        )
+    with c2:
+        # Input para a defasagem de anos
+        defasagem_anos = st.number_input(
+            "Defasagem de anos para conclusão:",
+            min_value=1,
+            max_value=10,
+            value=5,
+            key='defasagem_anos'
+        )
 
-# --- Visão Geral da Taxa de Aproveitamento ---
-st.markdown(f"##### Visão Geral para uma defasagem de {defasagem_anos} anos")
-df_taxa_geral = calcular_taxas(taxas_geral, df_ing_para_taxa, df_con_para_taxa, anos_ing, defasagem_anos)
-if not df_taxa_geral.empty:
-    fig_geral = px.line(df_taxa_geral, x='Ano Conclusão', y='Taxa de Aproveitamento (%)', markers=True, color_discrete_sequence=['#d62728'])
-    fig_geral.update_yaxes(ticksuffix="%")
-    fig_geral.update_xaxes(dtick=1)
-    st.plotly_chart(fig_geral, use_container_width=True)
-else:
-    st.warning("Nenhum dado encontrado para o período e defasagem selecionados.")
-
-st.markdown("### Análise Detalhada da Taxa de Aproveitamento")
-tab1, tab2, tab3, tab4 = st.tabs(["Por Categoria Administrativa", "Por Modalidade de Ensino", "Público", "Privado"])
-
-with tab1:
-    df_plot = calcular_taxas(taxas_setor, df_ing_para_taxa, df_con_para_taxa, anos_ing, defasagem_anos)
-    fig = px.line(df_plot, x='Ano Conclusão', y='Taxa de Aproveitamento (%)', color='Categoria', markers=True, color_discrete_map=mapa_de_cores, title='Taxa de Aproveitamento por Categoria Administrativa')
-    fig.update_yaxes(ticksuffix="%")
-    fig.update_xaxes(dtick=1)
-    st.plotly_chart(fig, use_container_width=True, grid=True)
-    with st.expander("Ver dados da tabela"):
-        st.dataframe(df_plot)
-
-with tab2:
-    df_plot = calcular_taxas(taxas_modalidade, df_ing_para_taxa, df_con_para_taxa, anos_ing, defasagem_anos)
-    fig = px.line(df_plot, x='Ano Conclusão', y='Taxa de Aproveitamento (%)', color='Categoria', markers=True,color_discrete_map=mapa_de_cores, title='Taxa de Aproveitamento por Modalidade de Ensino')
-    fig.update_yaxes(ticksuffix="%")
-    fig.update_xaxes(dtick=1)
-    st.plotly_chart(fig, use_container_width=True)
-    with st.expander("Ver dados da tabela"):
-        st.dataframe(df_plot)
-
-with tab3:
-    df_plot = calcular_taxas(taxas_detalhe_pub, df_ing_para_taxa, df_con_para_taxa, anos_ing, defasagem_anos)
-    fig = px.line(df_plot, x='Ano Conclusão', y='Taxa de Aproveitamento (%)', color='Categoria', markers=True, color_discrete_map=mapa_de_cores, title='Taxa de Aproveitamento no Setor Público')
-    fig.update_yaxes(ticksuffix="%")
-    fig.update_xaxes(dtick=1)
-    st.plotly_chart(fig, use_container_width=True)
+    # Gera a lista de anos de ingresso a partir da seleção do slider
+    anos_ing = range(anos_ingresso_selecionados[0], anos_ingresso_selecionados[1] + 1)
+    chave_taxas = (tuple(sorted(graus)), tuple(anos_ingresso_selecionados), defasagem_anos)
+
+    # --- Visão Geral da Taxa de Aproveitamento ---
+    st.markdown(f"##### Visão Geral para uma defasagem de {defasagem_anos} anos")
+    df_taxa_geral = calcular_taxas(taxas_geral, graus, anos_ing, defasagem_anos)
+    if not df_taxa_geral.empty:
+        def montar_geral():
+            fig_geral = px.line(df_taxa_geral, x='Ano Conclusão', y='Taxa de Aproveitamento (%)', markers=True, color_discrete_sequence=['#d62728'])
+            fig_geral.update_yaxes(ticksuffix="%")
+            fig_geral.update_xaxes(dtick=1)
+            return fig_geral
+        plotar('taxa_geral', chave_taxas, montar_geral)
+    else:
+        st.warning("Nenhum dado encontrado para o período e defasagem selecionados.")
+
+    with st.expander("Mapa de calor: taxa geral por ano de ingresso e defasagem"):
+        df_defasagens = tabela_defasagens(consultas.matriz_taxas(taxas_todas, graus), 'Taxa Geral')
+        if not df_defasagens.empty:
+            def montar_defasagens():
+                fig_defasagens = px.imshow(
+                    df_defasagens,
+                    labels={'x': 'Defasagem (anos)', 'y': 'Ano Ingresso', 'color': 'Taxa (%)'},
+                    text_auto='.1f',
+                    aspect='auto',
+                    color_continuous_scale='Teal'
+                )
+                fig_defasagens.update_xaxes(dtick=1)
+                fig_defasagens.update_yaxes(dtick=1)
+                return fig_defasagens
+            plotar('defasagens', chave_taxas[0], montar_defasagens) # Não depende do período nem da defasagem
+
+    secao('Taxa de aproveitamento detalhada')
+    st.markdown("### Análise Detalhada da Taxa de Aproveitamento")
+    aba = st.radio("Análise detalhada", list(ABAS_TAXAS), horizontal=True, key='aba_taxas', label_visibility='collapsed')
+    dicionario_taxas, titulo = ABAS_TAXAS[aba]
+    df_plot = calcular_taxas(dicionario_taxas, graus, anos_ing, defasagem_anos)
+    def montar_taxas():
+        fig = px.line(df_plot, x='Ano Conclusão', y='Taxa de Aproveitamento (%)', color='Categoria', markers=True, color_discrete_map=mapa_de_cores, title=titulo)
+        fig.update_yaxes(ticksuffix="%")
+        fig.update_xaxes(dtick=1)
+        return fig
+    plotar(f'taxas: {aba}', chave_taxas, montar_taxas)
     with st.expander("Ver dados da tabela"):
         st.dataframe(df_plot)
 
-with tab4:
-    df_plot = calcular_taxas(taxas_detalhe_priv, df_ing_para_taxa, df_con_para_taxa, anos_ing, defasagem_anos)
-    fig = px.line(df_plot, x='Ano Conclusão', y='Taxa de Aproveitamento (%)', color='Categoria', markers=True, color_discrete_map=mapa_de_cores, title='Taxa de Aproveitamento no Setor Privado')
-    fig.update_yaxes(ticksuffix="%")
-    fig.update_xaxes(dtick=1)
-    st.plotly_chart(fig, use_container_width=True)
-    with st.expander("Ver dados da tabela"):
-        st.dataframe(df_plot)
+st.markdown("---")
+secao('Taxa de aproveitamento')
+st.subheader("Comparação de Ingressantes e Concluintes em Taxa de Aproveitamento")
+# As taxas saem das séries anuais de todos os anos para os graus selecionados, já reduzidas pela camada de consultas
+anos_disponiveis = consultas.anos('Ingressantes').tolist()
+taxa_aproveitamento(anos_disponiveis, grau_selecionado)
 
 if len(grau_selecionado) == 0:
     st.warning("Nenhum grau acadêmico selecionado. Por favor, selecione pelo menos um grau para visualizar as taxas de aproveitamento.")
 
+secao('Rodapé')
 st.markdown("---")
 st.markdown("#### Sobre o Dashboard")
 st.markdown("""
@@ -619,3 +803,21 @@ with c1:
     st.image("images/DCA2.gif", width=150)
 with c2:
     st.image("images/ufrn.png", width=150)
+
+# --- Métricas da Execução ---
+resumo_execucao = finalizar_execucao()
+if modo_perfil:
+    amostrador.parar()
+    with st.sidebar.expander("Perfil desta execução", expanded=True):
+        st.caption(f"{resumo_execucao['total'] * 1000:.0f} ms no total, {amostrador.amostras} amostras. Remova ?profile=1 da URL para desativar.")
+        if 'inicio' in resumo_execucao:
+            st.markdown("###### Início a frio (primeira execução do processo)")
+            st.dataframe(tabela_inicio(resumo_execucao), hide_index=True, column_config={'ms': st.column_config.NumberColumn(format='%.1f'), 'Acumulado (ms)': st.column_config.NumberColumn(format='%.1f')})
+        st.markdown("###### Tempo por seção")
+        st.dataframe(tabela_secoes(resumo_execucao), hide_index=True, column_config={'ms': st.column_config.NumberColumn(format='%.1f'), '%': st.column_config.NumberColumn(format='%.1f')})
+        st.markdown("###### Funções instrumentadas e cache")
+        st.dataframe(tabela_funcoes(resumo_execucao), hide_index=True, column_config={'ms': st.column_config.NumberColumn(format='%.1f')})
+        st.markdown("###### Funções do projeto (tempo inclusivo)")
+        st.dataframe(amostrador.funcoes_projeto(), hide_index=True, column_config={'% do tempo': st.column_config.NumberColumn(format='%.1f')})
+        st.markdown("###### Pontos quentes (tempo próprio)")
+        st.dataframe(amostrador.pontos_quentes(), hide_index=True, column_config={'% do tempo': st.column_config.NumberColumn(format='%.1f')})
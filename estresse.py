@@ -0,0 +1,183 @@
+import argparse
+import sys
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmark import TAXAS, cronometrar
+from consultas import Consultas
+from dados import DIRETORIO_BASE, memoria
+from previsoes import COLUNAS_PREVISAO
+from regression import GRAUS_CANDIDATOS, ajustar_polinomios, regressao_polinomial
+from sintetico import GRAUS_CONCLUINTES, GRAUS_INGRESSANTES, dimensionar, gerar_censo
+from taxas import fatiar_taxas, matriz_aproveitamento
+
+CAMINHO_RESULTADOS = DIRETORIO_BASE / 'data' / 'benchmarks' / 'estresse.csv'
+ULTIMO_ANO = 2023
+# Pontos de cada eixo de crescimento; os outros dois eixos ficam no tamanho dos dados reais
+EIXOS = {
+    'linhas': [1_000, 10_000, 100_000, 1_000_000],  # linhas de ingressantes (via uma dimensão extra)
+    'anos': [11, 50, 200, 1000],
+    'graus': [4, 40, 400],
+}
+# Mesmos agrupamentos das abas de taxa de aproveitamento do dashboard
+GRUPOS_TAXAS = [['Total geral'], ['Total geral publica', 'Total geral privada'], ['Total presencial', 'Total geral remota'],
+                ['Total geral federal', 'Total geral estadual', 'Total geral municipal'], ['Total geral com fins', 'Total geral sem fins']]
+
+
+def gerar_ponto(eixo: str, tamanho: int, semente: int = 0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Tabelas sintéticas de um ponto de um eixo de crescimento (ver EIXOS)."""
+    if eixo == 'linhas':
+        return gerar_censo(dimensoes=dimensionar(tamanho), semente=semente)
+    if eixo == 'anos':
+        return gerar_censo(anos=range(ULTIMO_ANO - tamanho + 1, ULTIMO_ANO + 1), semente=semente)
+    if eixo == 'graus':
+        graus = GRAUS_INGRESSANTES + [f'Grau {i:03d}' for i in range(1, tamanho - len(GRAUS_INGRESSANTES) + 1)]
+        return gerar_censo(graus_ingressantes=graus, graus_concluintes=GRAUS_CONCLUINTES + graus[len(GRAUS_INGRESSANTES):],
+                           semente=semente)
+    raise ValueError(f"Eixo desconhecido: {eixo}")
+
+
+def _casos(df_ingressantes: pd.DataFrame, df_concluintes: pd.DataFrame) -> dict:
+    # A mesma sequência de chamadas que o dashboard faz a partir das tabelas carregadas
+    tabelas = {'Ingressantes': df_ingressantes, 'Concluintes': df_concluintes}
+    consultas = Consultas(tabelas, tamanho_maximo=0)  # Sem memória: mede a redução, não o acerto
+    anos = consultas.anos('Ingressantes')
+    graus = consultas.graus('Ingressantes')
+    meio = int(anos[len(anos) // 2])
+
+    def filtro():
+        # Filtro padrão (todo o período e todos os graus), um recorte e as linhas da aba de dados brutos
+        consultas.resultado('Ingressantes', anos[0], anos[-1], graus)
+        consultas.resultado('Concluintes', anos[0], anos[-1], graus)
+        consultas.resultado('Ingressantes', meio, anos[-1], graus[:1])
+        consultas.linhas('Ingressantes', anos[0], anos[-1], graus)
+
+    serie_ing = consultas.resultado('Ingressantes', anos[0], anos[-1], graus)['serie']
+    serie_con = consultas.resultado('Concluintes', anos[0], anos[-1], graus)['serie']
+
+    def calcular_taxas():
+        matriz = matriz_aproveitamento(serie_ing, serie_con, TAXAS)
+        for grupo in GRUPOS_TAXAS:
+            fatiar_taxas(matriz, anos[:-5], 5, grupo)
+
+    def regressao():
+        regressao_polinomial(serie_ing, 3, 3, True)
+        ajustar_polinomios(serie_ing['Ano'], serie_ing[COLUNAS_PREVISAO].to_numpy(), GRAUS_CANDIDATOS, 3)
+
+    return {
+        'carregar_consultas': lambda: Consultas(tabelas),
+        'filtro': filtro,
+        'calcular_taxas': calcular_taxas,
+        'regressao_polinomial': regressao,
+    }
+
+
+def pico_memoria(funcao) -> int:
+    """Pico de memória alocada (bytes) durante uma execução de `funcao`, medido com tracemalloc."""
+    tracemalloc.start()
+    try:
+        funcao()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def executar(eixos: list[str], max_linhas: int, repeticoes: int) -> pd.DataFrame:
+    """
+    Mede tempo e memória de cada caso em cada ponto dos eixos pedidos.
+
+    Returns:
+        pd.DataFrame: Uma linha por (eixo, tamanho, caso), com o número de linhas das tabelas,
+        a memória delas, a mediana do tempo e o pico de memória da execução.
+    """
+    linhas = []
+    for eixo in eixos:
+        for tamanho in EIXOS[eixo]:
+            if eixo == 'linhas' and tamanho > max_linhas:
+                continue
+            df_ingressantes, df_concluintes = gerar_ponto(eixo, tamanho)
+            for caso, funcao in _casos(df_ingressantes, df_concluintes).items():
+                # Tempo e memória em execuções separadas: o tracemalloc deixa o código bem mais lento
+                segundos = cronometrar(funcao, repeticoes)
+                pico = pico_memoria(funcao)
+                linhas.append({
+                    'eixo': eixo, 'tamanho': tamanho, 'caso': caso, 'linhas': len(df_ingressantes),
+                    'memoria_tabelas': memoria(df_ingressantes) + memoria(df_concluintes),
+                    'segundos': segundos, 'pico_memoria': pico,
+                })
+                print(f"{eixo:<7} {tamanho:>9}  {caso:<22} {segundos * 1000:10.2f} ms {pico / 2**20:10.2f} MiB", flush=True)
+    return pd.DataFrame(linhas)
+
+
+def expoentes(resultados: pd.DataFrame) -> pd.DataFrame:
+    """
+    Expoente de crescimento de cada caso em cada eixo: inclinação da reta log(custo) x log(tamanho).
+
+    Um expoente perto de 1 indica custo linear no eixo; perto de 0, custo que não depende dele.
+    """
+    linhas = []
+    for (eixo, caso), grupo in resultados.groupby(['eixo', 'caso'], sort=False):
+        if len(grupo) < 2:
+            continue
+        x = np.log(grupo['tamanho'].to_numpy(dtype=np.float64))
+        linhas.append({
+            'eixo': eixo, 'caso': caso,
+            'tempo': np.polyfit(x, np.log(grupo['segundos'].to_numpy()), 1)[0],
+            'memoria': np.polyfit(x, np.log(np.maximum(grupo['pico_memoria'].to_numpy(), 1)), 1)[0],
+        })
+    return pd.DataFrame(linhas, columns=['eixo', 'caso', 'tempo', 'memoria'])
+
+
+def salvar_grafico(resultados: pd.DataFrame, caminho: Path) -> None:
+    """Curvas de tempo e de pico de memória por eixo, em escala log-log."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    eixos = list(dict.fromkeys(resultados['eixo']))
+    fig, axes = plt.subplots(2, len(eixos), figsize=(5 * len(eixos), 8), squeeze=False)
+    for j, eixo in enumerate(eixos):
+        for caso, grupo in resultados[resultados['eixo'] == eixo].groupby('caso', sort=False):
+            axes[0, j].plot(grupo['tamanho'], grupo['segundos'] * 1000, marker='o', label=caso)
+            axes[1, j].plot(grupo['tamanho'], grupo['pico_memoria'] / 2**20, marker='o', label=caso)
+        axes[0, j].set_title(f"Eixo: {eixo}")
+        axes[0, j].set_ylabel('Tempo (ms)')
+        axes[1, j].set_ylabel('Pico de memória (MiB)')
+        axes[1, j].set_xlabel(eixo)
+        for ax in axes[:, j]:
+            ax.set_xscale('log')
+            ax.set_yscale('log')
+            ax.grid(True, which='both', alpha=0.3)
+    axes[0, 0].legend()
+    fig.tight_layout()
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(caminho, dpi=120)
+    plt.close(fig)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Teste de escala da lógica do dashboard com dados sintéticos.")
+    parser.add_argument('--eixos', nargs='+', choices=list(EIXOS), default=list(EIXOS), help="Eixos de crescimento a medir.")
+    parser.add_argument('--max-linhas', type=int, default=max(EIXOS['linhas']), help="Maior tabela do eixo 'linhas'.")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Execuções por caso (usa-se a mediana).")
+    parser.add_argument('--saida', type=Path, default=CAMINHO_RESULTADOS, help="Arquivo CSV com todas as medições.")
+    parser.add_argument('--grafico', type=Path, default=None, help="Se informado, grava as curvas neste PNG.")
+    args = parser.parse_args()
+
+    resultados = executar(args.eixos, args.max_linhas, args.repeticoes)
+    args.saida.parent.mkdir(parents=True, exist_ok=True)
+    resultados.to_csv(args.saida, index=False)
+
+    print("\nExpoente de crescimento (custo ~ tamanho^k):")
+    print(expoentes(resultados).to_string(index=False, float_format=lambda k: f'{k:.2f}'))
+    if args.grafico is not None:
+        salvar_grafico(resultados, args.grafico)
+        print(f"\nCurvas gravadas em {args.grafico}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+import hashlib
+import importlib.util
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dados import DIRETORIO_BASE
+from instrumentacao import cronometrado
+
+DIRETORIO_EXPORTACAO = DIRETORIO_BASE / 'data' / 'exportacoes'
+# Versão do formato dos arquivos exportados: entra na chave para invalidar arquivos antigos
+VERSAO_EXPORTACAO = 1
+# Linhas materializadas e escritas por vez: a memória do download não cresce com o tamanho do recorte
+TAMANHO_LOTE = 100_000
+# Espaço máximo dos arquivos guardados; os menos usados recentemente são apagados primeiro
+LIMITE_BYTES = 512 * 1024 ** 2
+# Arquivos usados há menos que isto (segundos) não são apagados: outra sessão pode estar prestes a lê-los
+PROTECAO_SEGUNDOS = 60
+# Limite de linhas de uma planilha do Excel (mais o cabeçalho)
+LINHAS_XLSX = 1_048_575
+
+_trava = threading.Lock()
+
+
+def lotes(tabela: pd.DataFrame, selecao: np.ndarray, tamanho: int = TAMANHO_LOTE):
+    """
+    Materializa as linhas selecionadas aos poucos, em DataFrames de até `tamanho` linhas.
+
+    Args:
+        tabela (pd.DataFrame): Tabela completa (ex: Consultas.tabelas[base]).
+        selecao (np.ndarray): Posições das linhas (ex: saída de Consultas.selecao).
+        tamanho (int): Número máximo de linhas por lote.
+
+    Yields:
+        pd.DataFrame: Recortes consecutivos, na ordem da seleção. Sempre há ao menos um (vazio se a seleção for vazia).
+    """
+    for inicio in range(0, max(len(selecao), 1), tamanho):
+        yield tabela.take(selecao[inicio:inicio + tamanho])
+
+
+# --- Escritores ---
+# Cada função recebe os lotes (iterável de DataFrames com as mesmas colunas) e o caminho do arquivo a escrever.
+
+def _escrever_csv(partes, caminho: Path) -> None:
+    with open(caminho, 'wb') as arquivo:
+        for i, df in enumerate(partes):
+            arquivo.write(df.to_csv(index=False, header=i == 0).encode('utf-8'))
+
+
+def _escrever_parquet(partes, caminho: Path) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = None
+    try:
+        for df in partes:
+            tabela = pa.Table.from_pandas(df, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(caminho, tabela.schema)
+            escritor.write_table(tabela)  # Um grupo de linhas por lote
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def _escrever_xlsx(partes, caminho: Path) -> None:
+    from openpyxl import Workbook
+
+    # Modo somente escrita: as linhas vão direto para o arquivo, sem montar a planilha em memória
+    livro = Workbook(write_only=True)
+    planilha = livro.create_sheet('Dados')
+    escritas = 0
+    for i, df in enumerate(partes):
+        if i == 0:
+            planilha.append([str(coluna) for coluna in df.columns])
+        escritas += len(df)
+        if escritas > LINHAS_XLSX:
+            raise ValueError(f"O recorte tem mais de {LINHAS_XLSX:,} linhas, o limite de uma planilha XLSX.")
+        for linha in df.itertuples(index=False):
+            planilha.append([None if pd.isna(valor) else valor.item() if hasattr(valor, 'item') else valor for valor in linha])
+    livro.save(caminho)
+
+
+# --- Registro de Formatos ---
+# Cada formato declara:
+#   escrever: função que grava os lotes no arquivo
+#   extensao, mime: usados no nome e no tipo do download
+#   dependencia: (opcional) módulo necessário; sem ele o formato não é oferecido
+REGISTRO_FORMATOS = {
+    'CSV': {'escrever': _escrever_csv, 'extensao': 'csv', 'mime': 'text/csv'},
+    'Parquet': {'escrever': _escrever_parquet, 'extensao': 'parquet', 'mime': 'application/vnd.apache.parquet',
+                'dependencia': 'pyarrow'},
+    'XLSX': {'escrever': _escrever_xlsx, 'extensao': 'xlsx',
+             'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'dependencia': 'openpyxl'},
+}
+
+
+def formatos_disponiveis() -> list[str]:
+    """Formatos de REGISTRO_FORMATOS cuja dependência está instalada."""
+    return [
+        nome for nome, formato in REGISTRO_FORMATOS.items()
+        if formato.get('dependencia') is None or importlib.util.find_spec(formato['dependencia']) is not None
+    ]
+
+
+def caminho_exportacao(chave: tuple, formato: str, diretorio: Path = DIRETORIO_EXPORTACAO) -> Path:
+    """
+    Caminho do arquivo de um recorte em um formato (exista ele ou não).
+
+    Args:
+        chave (tuple): Identifica o conteúdo, ex: (versão dos dados,) + chave do filtro (ver consultas.chave_filtro).
+        formato (str): Nome em REGISTRO_FORMATOS.
+        diretorio (Path): Diretório dos arquivos exportados.
+
+    Returns:
+        Path: diretorio/<hash da chave e do formato>.<extensão>.
+    """
+    digest = hashlib.sha256(repr((VERSAO_EXPORTACAO, formato, chave)).encode('utf-8')).hexdigest()[:16]
+    return Path(diretorio) / f"{digest}.{REGISTRO_FORMATOS[formato]['extensao']}"
+
+
+def exportado(chave: tuple, formato: str, diretorio: Path = DIRETORIO_EXPORTACAO) -> Path | None:
+    """Arquivo já gerado para o recorte e o formato, ou None. Marca o arquivo como usado recentemente."""
+    caminho = caminho_exportacao(chave, formato, diretorio)
+    try:
+        os.utime(caminho)
+    except FileNotFoundError:
+        return None
+    return caminho
+
+
+@cronometrado
+def exportar(partes, chave: tuple, formato: str, diretorio: Path = DIRETORIO_EXPORTACAO) -> Path:
+    """
+    Grava os lotes no formato pedido, reaproveitando o arquivo se o recorte já foi exportado.
+
+    O arquivo é escrito lote a lote em um temporário e renomeado ao final, então sessões
+    simultâneas nunca leem um arquivo pela metade. Depois de gravar, os arquivos menos usados
+    recentemente são apagados até o diretório caber em LIMITE_BYTES (exceto os usados nos
+    últimos PROTECAO_SEGUNDOS, que podem ultrapassar o limite por pouco tempo).
+
+    Args:
+        partes (iterable): Lotes a gravar (ex: saída de lotes). Só é consumido se o arquivo não existir.
+        chave (tuple): Identifica o conteúdo dos lotes (ver caminho_exportacao).
+        formato (str): Nome em REGISTRO_FORMATOS.
+        diretorio (Path): Diretório dos arquivos exportados.
+
+    Returns:
+        Path: Caminho do arquivo gerado.
+
+    Raises:
+        ValueError: Se o formato não existir ou não estiver disponível, ou se o recorte não couber no formato.
+    """
+    if formato not in formatos_disponiveis():
+        raise ValueError(f"Formato de exportação indisponível: {formato}. Disponíveis: {', '.join(formatos_disponiveis())}.")
+    existente = exportado(chave, formato, diretorio)
+    if existente is not None:
+        return existente
+
+    destino = caminho_exportacao(chave, formato, diretorio)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = destino.with_name(f'.{destino.name}.{os.getpid()}-{threading.get_ident()}.tmp')
+    try:
+        REGISTRO_FORMATOS[formato]['escrever'](partes, temporario)
+        os.replace(temporario, destino)
+    finally:
+        temporario.unlink(missing_ok=True)
+    _limitar_diretorio(Path(diretorio), manter=destino)
+    return destino
+
+
+def ler_exportacao(gerar_partes, chave: tuple, formato: str, diretorio: Path = DIRETORIO_EXPORTACAO) -> bytes:
+    """
+    Conteúdo do arquivo exportado de um recorte, gerando-o se preciso (ver exportar).
+
+    Se outra sessão apagar o arquivo entre a geração e a leitura, ele é gerado de novo uma vez.
+
+    Args:
+        gerar_partes (callable): Sem argumentos, devolve os lotes a gravar (ex: lambda: lotes(...)).
+            Só é chamado se o arquivo precisar ser gerado.
+        chave (tuple): Identifica o conteúdo dos lotes (ver caminho_exportacao).
+        formato (str): Nome em REGISTRO_FORMATOS.
+        diretorio (Path): Diretório dos arquivos exportados.
+
+    Returns:
+        bytes: Conteúdo do arquivo.
+    """
+    for tentativa in range(2):
+        caminho = exportado(chave, formato, diretorio)
+        if caminho is None:
+            caminho = exportar(gerar_partes(), chave, formato, diretorio)
+        try:
+            return caminho.read_bytes()
+        except FileNotFoundError:
+            if tentativa:
+                raise
+
+
+def _limitar_diretorio(diretorio: Path, manter: Path) -> None:
+    with _trava:
+        arquivos = []
+        recente = time.time() - PROTECAO_SEGUNDOS
+        for caminho in diretorio.iterdir():
+            if caminho.name.startswith('.'):
+                continue  # Temporários de outras exportações em andamento
+            try:
+                estado = caminho.stat()
+            except FileNotFoundError:
+                continue
+            arquivos.append((estado.st_mtime, estado.st_size, caminho))
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for usado_em, tamanho, caminho in sorted(arquivos):
+            if total <= LIMITE_BYTES or usado_em >= recente:
+                break  # Em ordem de uso: daqui em diante todos foram usados recentemente
+            if caminho != manter:
+                caminho.unlink(missing_ok=True)
+                total -= tamanho
+
+
+def tamanho_legivel(n_bytes: int) -> str:
+    """Tamanho em bytes no formato '12,3 MB'."""
+    if n_bytes < 1024:
+        return f"{n_bytes} B"
+    for unidade in ('KB', 'MB', 'GB'):
+        n_bytes /= 1024
+        if n_bytes < 1024 or unidade == 'GB':
+            return f"{n_bytes:.1f} {unidade}".replace('.', ',')
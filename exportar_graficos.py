@@ -0,0 +1,386 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')  # Sem janela: os gráficos só são gravados em disco
+import matplotlib.pyplot as plt
+import matplotlib.ticker as ticker
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+from dados import DIRETORIO_BASE, DIRETORIO_CACHE
+from pipeline import DEFASAGEM, carregar_etapa
+
+DIRETORIO_SAIDA = DIRETORIO_BASE / 'data'
+# Hash das entradas de cada gráfico já gravado; um gráfico só é refeito quando o hash muda
+CAMINHO_MANIFESTO = DIRETORIO_CACHE / 'graficos.json'
+# Versão do formato do manifesto e do processo de gravação: entra no hash de todos os gráficos
+VERSAO_GRAFICOS = 1
+DPI = 100
+
+COLUNAS_PAIRPLOT = ['Total geral', 'Total geral publica', 'Total geral privada', 'Total presencial', 'Total geral remota']
+
+
+def preparar_dados() -> dict[str, pd.DataFrame]:
+    """
+    Tabelas usadas pelos gráficos, lidas do cache das etapas do pipeline (ver pipeline.py).
+
+    Returns:
+        dict: Nome -> DataFrame ('ingressantes', 'concluintes', os totais por ano de cada base,
+        'aproveitamento' com os totais dos anos de ingresso e conclusão e 'taxas' por modalidade).
+    """
+    dados = {}
+    for etapa in ('tabelas', 'totais', 'aproveitamento'):
+        dados.update(carregar_etapa(etapa))
+    # 'Grau' como texto: com a categórica, pivôs e legendas incluiriam os graus sem linhas
+    for base in ('ingressantes', 'concluintes'):
+        dados[base] = dados[base].astype({'Grau': str})
+    return dados
+
+
+def _formatar_eixos(*axes, x: bool = False) -> None:
+    for ax in axes:
+        ax.yaxis.set_major_formatter(ticker.EngFormatter(unit=''))
+        if x:
+            ax.xaxis.set_major_formatter(ticker.EngFormatter(unit=''))
+
+
+# --- Gráficos ---
+# Cada função recebe as tabelas de preparar_dados e os parâmetros do registro e devolve a figura.
+
+def _total_por_ano(dados: dict, base: str, cor: str) -> plt.Figure:
+    df = dados[f'{base.lower()}_totais']
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(df['Ano'], df['Total geral'], marker='o', color=cor, label=base)
+    _formatar_eixos(ax)
+    ax.set_xticks(df['Ano'])
+    ax.set_xlabel('Ano')
+    ax.set_ylabel(f'Total de {base}')
+    ax.set_title(f'Total de {base} por Ano ({df["Ano"].min()}–{df["Ano"].max()})')
+    ax.grid(True)
+    return fig
+
+
+def _ingressantes_concluintes(dados: dict) -> plt.Figure:
+    ing, conc = dados['ingressantes_totais'], dados['concluintes_totais']
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(ing['Ano'], ing['Total geral'], marker='o', color='b', label='Ingressantes')
+    ax.plot(conc['Ano'], conc['Total geral'], marker='o', color='g', label='Concluintes')
+    _formatar_eixos(ax)
+    ax.set_xlabel('Ano')
+    ax.set_xticks(conc['Ano'])
+    ax.set_ylabel('Total de Estudantes')
+    ax.set_title('Total de Ingressantes e Concluintes por Ano')
+    ax.legend()
+    ax.grid(True)
+    fig.tight_layout()
+    return fig
+
+
+def _densidades(dados: dict) -> plt.Figure:
+    fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+    for ax, base, cor in zip(axes, ['Ingressantes', 'Concluintes'], ['b', 'g']):
+        sns.kdeplot(x=dados[f'{base.lower()}_totais']['Total geral'], color=cor, ax=ax)
+        _formatar_eixos(ax, x=True)
+        ax.set_title(f'Distribuição de {base}')
+        ax.set_xlabel(f'Total de {base}')
+        ax.set_ylabel('Densidade')
+    fig.tight_layout()
+    return fig
+
+
+def _curva_nivel(dados: dict) -> plt.Figure:
+    fig, ax = plt.subplots()
+    sns.kdeplot(x=dados['ingressantes_totais']['Total geral'], y=dados['concluintes_totais']['Total geral'],
+                fill=True, cmap='Blues', thresh=False, ax=ax)
+    _formatar_eixos(ax, x=True)
+    ax.set_title('Curva de Nível: Ingressantes vs Concluintes')
+    ax.set_xlabel('Ingressantes')
+    ax.set_ylabel('Concluintes')
+    ax.grid(True)
+    fig.tight_layout()
+    return fig
+
+
+def _pairplot(dados: dict, base: str, excluir: list[str]) -> plt.Figure:
+    df = dados[base.lower()]
+    df = df[~df['Grau'].isin(excluir)]
+    g = sns.pairplot(df, hue='Grau', vars=COLUNAS_PAIRPLOT, height=2.5, diag_kind='kde')
+    for ax in g.axes.flatten():
+        if ax is not None:
+            _formatar_eixos(ax, x=True)
+    g.figure.suptitle(f'Pairplot de {base} por Grau', y=1.02)
+    return g.figure
+
+
+def _modalidade_tipo(dados: dict, base: str) -> plt.Figure:
+    df = dados[f'{base.lower()}_totais']
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(df['Ano'], df['Total presencial publica'], marker='o', label='Pública - Presencial')
+    ax.plot(df['Ano'], df['Total presencial privada'], marker='o', label='Privada  - Presencial')
+    ax.plot(df['Ano'], df['Total remota publica'], marker='o', label='Pública - Remota')
+    ax.plot(df['Ano'], df['Total remota privada'], marker='o', label='Privada  - Remota')
+    _formatar_eixos(ax)
+    ax.set_xticks(df['Ano'])
+    ax.set_xlabel('Ano')
+    ax.set_ylabel('Total de Estudantes')
+    ax.set_title(f'{base} por Modalidade e Tipo de Instituição')
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+def _modalidade_tipo_comparado(dados: dict) -> plt.Figure:
+    ing, conc = dados['ingressantes_totais'], dados['concluintes_totais']
+    paineis = [('Total presencial publica', 'Pública - Presencial'), ('Total presencial privada', 'Privada - Presencial'),
+               ('Total remota publica', 'Pública - Remota'), ('Total remota privada', 'Privada - Remota')]
+    fig, axes = plt.subplots(2, 2, figsize=(12, 8))
+    for ax, (coluna, titulo) in zip(axes.flatten(), paineis):
+        ax.plot(ing['Ano'], ing[coluna], marker='o', label='Ingressantes')
+        ax.plot(conc['Ano'], conc[coluna], marker='o', label='Concluintes')
+        ax.set_title(titulo)
+        ax.set_xlabel('Ano')
+        ax.set_ylabel('Total de Estudantes')
+        _formatar_eixos(ax)
+        ax.legend()
+    fig.suptitle('Ingressantes e Concluintes por Modalidade e Tipo de Instituição', fontsize=16)
+    fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+    return fig
+
+
+def _por_grau(dados: dict, base: str) -> plt.Figure:
+    # Graus na ordem crescente do total de ingressantes, a mesma nas duas bases
+    excluir = ['Total', 'Não aplicável']
+    ing = dados['ingressantes']
+    ordem_graus = (ing[~ing['Grau'].isin(excluir)].pivot(index='Ano', columns='Grau', values='Total geral')
+                   .fillna(0).sum().sort_values().index)
+    df = dados[base.lower()]
+    df_pivot = df[~df['Grau'].isin(excluir)].pivot(index='Ano', columns='Grau', values='Total geral').fillna(0)
+    df_pivot = df_pivot[[g for g in ordem_graus if g in df_pivot.columns]]
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    df_pivot.plot(kind='bar', width=0.8, color=['darkorange', 'limegreen', 'teal'], ax=ax)
+    ax.set_title(f'{base} por Grau')
+    ax.set_xlabel('Ano')
+    ax.set_ylabel(f'Total de {base}')
+    _formatar_eixos(ax)
+    ax.legend(title='Grau')
+    ax.tick_params(axis='x', rotation=0)
+    fig.tight_layout()
+    return fig
+
+
+def _aproveitamento_barras(dados: dict) -> plt.Figure:
+    df = dados['aproveitamento']
+    x = np.arange(len(df))
+    largura = 0.35
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.bar(x - largura / 2, df['Ingressantes'], largura, label='Ingressantes', color='lightcoral')
+    ax.bar(x + largura / 2, df['Concluintes'], largura, label='Concluintes', color='seagreen')
+    ax.set_xticks(x)
+    ax.set_xticklabels(df['Ano ingresso'])
+    ax.set_xlabel('Ano de Conclusão')
+    ax.set_ylabel('Quantidade de Alunos')
+    ax.set_title(f'Ingressantes vs Concluintes ({DEFASAGEM} anos depois)')
+    _formatar_eixos(ax)
+    ax.legend()
+    ax.grid(axis='y', linestyle='--', alpha=0.5)
+    fig.tight_layout()
+    return fig
+
+
+def _aproveitamento_modalidade(dados: dict) -> plt.Figure:
+    df_plot = dados['taxas'].pivot(index='Ano Conclusão', columns='Categoria', values='Taxa de Aproveitamento (%)')
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for modalidade in df_plot.columns:
+        ax.plot(df_plot.index, df_plot[modalidade], marker='o', label=modalidade)
+    ax.yaxis.set_major_formatter(ticker.PercentFormatter())
+    ax.set_xlabel('Ano de Conclusão')
+    ax.set_ylabel('Taxa de Aproveitamento')
+    ax.set_title(f'Taxa de Aproveitamento por Modalidade\n(Concluintes em {DEFASAGEM} anos após ingresso)')
+    ax.set_xticks(df_plot.index)
+    ax.grid(axis='y', linestyle='--', alpha=0.6)
+    ax.legend(title='Modalidade', bbox_to_anchor=(1.02, 1), loc='upper left')
+    fig.tight_layout()
+    return fig
+
+
+def _aproveitamento_geral(dados: dict) -> plt.Figure:
+    df = dados['taxas'][dados['taxas']['Categoria'] == 'Geral']
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.plot(df['Ano Conclusão'], df['Taxa de Aproveitamento (%)'], marker='o', linestyle='-', color='teal', label='Geral')
+    ax.yaxis.set_major_formatter(ticker.PercentFormatter())
+    ax.set_xlabel('Ano de Conclusão')
+    ax.set_ylabel('Taxa de Aproveitamento (%)')
+    ax.set_title(f'Taxa de Aproveitamento Geral (Concluintes em {DEFASAGEM} anos)')
+    ax.set_xticks(df['Ano Conclusão'])
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+# --- Registro de Gráficos ---
+# Cada gráfico declara:
+#   desenhar: função que monta a figura
+#   dados: tabelas de preparar_dados que ela lê (só elas entram no hash)
+#   parametros: argumentos extras da função
+REGISTRO_GRAFICOS = {
+    'ing': {'desenhar': _total_por_ano, 'dados': ['ingressantes_totais'], 'parametros': {'base': 'Ingressantes', 'cor': 'b'}},
+    'conc': {'desenhar': _total_por_ano, 'dados': ['concluintes_totais'], 'parametros': {'base': 'Concluintes', 'cor': 'g'}},
+    'ing_conc': {'desenhar': _ingressantes_concluintes, 'dados': ['ingressantes_totais', 'concluintes_totais'], 'parametros': {}},
+    'den_ing_conc': {'desenhar': _densidades, 'dados': ['ingressantes_totais', 'concluintes_totais'], 'parametros': {}},
+    'cnivel_ing_conc': {'desenhar': _curva_nivel, 'dados': ['ingressantes_totais', 'concluintes_totais'], 'parametros': {}},
+    'pairplot_ing': {'desenhar': _pairplot, 'dados': ['ingressantes'],
+                     'parametros': {'base': 'Ingressantes', 'excluir': ['Não aplicável']}},
+    'pairplot_conc': {'desenhar': _pairplot, 'dados': ['concluintes'], 'parametros': {'base': 'Concluintes', 'excluir': []}},
+    'ing_mod_tipo': {'desenhar': _modalidade_tipo, 'dados': ['ingressantes_totais'], 'parametros': {'base': 'Ingressantes'}},
+    'conc_mod_tipo': {'desenhar': _modalidade_tipo, 'dados': ['concluintes_totais'], 'parametros': {'base': 'Concluintes'}},
+    'ing_conc_mod': {'desenhar': _modalidade_tipo_comparado, 'dados': ['ingressantes_totais', 'concluintes_totais'], 'parametros': {}},
+    'ing_grau': {'desenhar': _por_grau, 'dados': ['ingressantes'], 'parametros': {'base': 'Ingressantes'}},
+    'conc_grau': {'desenhar': _por_grau, 'dados': ['ingressantes', 'concluintes'], 'parametros': {'base': 'Concluintes'}},
+    'aprov_bar': {'desenhar': _aproveitamento_barras, 'dados': ['aproveitamento'], 'parametros': {}},
+    'aprov_mod': {'desenhar': _aproveitamento_modalidade, 'dados': ['taxas'], 'parametros': {}},
+    'aprov': {'desenhar': _aproveitamento_geral, 'dados': ['taxas'], 'parametros': {}},
+}
+
+
+def hash_grafico(nome: str, dados: dict[str, pd.DataFrame]) -> str:
+    """
+    Hash de tudo o que determina a imagem de um gráfico.
+
+    Entram o código da função de desenho, os parâmetros, o conteúdo das tabelas lidas e as
+    versões das bibliotecas de desenho. Mudanças em funções auxiliares (ex: _formatar_eixos)
+    não entram no hash: use --forcar depois de alterá-las.
+    """
+    registro = REGISTRO_GRAFICOS[nome]
+    h = hashlib.sha256()
+    h.update(f'v{VERSAO_GRAFICOS}|{DPI}|{nome}|{matplotlib.__version__}|{sns.__version__}'.encode())
+    h.update(inspect.getsource(registro['desenhar']).encode())
+    h.update(json.dumps(registro['parametros'], sort_keys=True, ensure_ascii=False).encode())
+    for tabela in registro['dados']:
+        df = dados[tabela]
+        h.update(tabela.encode())
+        h.update(json.dumps([str(c) for c in df.columns], ensure_ascii=False).encode())
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _configurar_estilo() -> None:
+    # Mesmo estilo das células iniciais do notebook; executado uma vez em cada processo
+    plt.style.use('seaborn-v0_8-whitegrid')
+    sns.set(rc={'figure.figsize': (11.7, 7.27)})
+    plt.rcParams.update({
+        'font.size': 16, 'axes.titlesize': 18, 'axes.labelsize': 16, 'xtick.labelsize': 14,
+        'ytick.labelsize': 14, 'legend.fontsize': 14, 'figure.titlesize': 16,
+    })
+
+
+def renderizar(nome: str, dados: dict[str, pd.DataFrame], destino: Path) -> tuple[str, float]:
+    """
+    Desenha um gráfico e grava o PNG (em um arquivo temporário, renomeado no fim).
+
+    Returns:
+        tuple: Nome do gráfico e segundos gastos.
+    """
+    inicio = time.perf_counter()
+    registro = REGISTRO_GRAFICOS[nome]
+    fig = registro['desenhar'](dados, **registro['parametros'])
+    temporario = destino.with_name(f'.{destino.name}.tmp')
+    fig.savefig(temporario, format='png', dpi=DPI, bbox_inches='tight')
+    plt.close(fig)
+    temporario.replace(destino)
+    return nome, time.perf_counter() - inicio
+
+
+def _ler_manifesto(caminho: Path) -> dict:
+    try:
+        return json.loads(Path(caminho).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def exportar_graficos(nomes: list[str] | None = None, diretorio: Path = DIRETORIO_SAIDA, manifesto: Path = CAMINHO_MANIFESTO,
+                      forcar: bool = False, max_workers: int | None = None) -> dict:
+    """
+    Regrava os gráficos cujas entradas mudaram desde a última exportação.
+
+    Args:
+        nomes (list[str] | None): Gráficos a considerar. Se None, todos os de REGISTRO_GRAFICOS.
+        diretorio (Path): Onde os PNGs são gravados.
+        manifesto (Path): Arquivo JSON com o hash das entradas de cada PNG gravado.
+        forcar (bool): Se True, refaz todos os gráficos pedidos.
+        max_workers (int | None): Número de processos. Se 1, desenha no processo atual; se None, usa todos os núcleos.
+
+    Returns:
+        dict: 'renderizados' (nome -> segundos) e 'ignorados' (nomes já atualizados).
+    """
+    nomes = list(REGISTRO_GRAFICOS) if nomes is None else nomes
+    diretorio = Path(diretorio)
+    dados = preparar_dados()
+    hashes = {nome: hash_grafico(nome, dados) for nome in nomes}
+    gravados = _ler_manifesto(manifesto)
+
+    pendentes = [nome for nome in nomes
+                 if forcar or gravados.get(nome) != hashes[nome] or not (diretorio / f'{nome}.png').exists()]
+    resultado = {'renderizados': {}, 'ignorados': [nome for nome in nomes if nome not in pendentes]}
+    if not pendentes:
+        return resultado
+
+    diretorio.mkdir(parents=True, exist_ok=True)
+    # Cada processo recebe só as tabelas que o seu gráfico lê
+    tarefas = {nome: ({t: dados[t] for t in REGISTRO_GRAFICOS[nome]['dados']}, diretorio / f'{nome}.png') for nome in pendentes}
+    try:
+        if max_workers == 1:
+            _configurar_estilo()
+            for nome, (entradas, destino) in tarefas.items():
+                _, segundos = renderizar(nome, entradas, destino)
+                resultado['renderizados'][nome] = segundos
+                gravados[nome] = hashes[nome]
+        else:
+            # Os gráficos mais lentos (pairplots) vão primeiro, para não ficarem sozinhos no fim
+            ordem = sorted(tarefas, key=lambda nome: not nome.startswith('pairplot'))
+            with ProcessPoolExecutor(max_workers=max_workers or min(len(ordem), os.cpu_count() or 1),
+                                     initializer=_configurar_estilo) as executor:
+                futuros = [executor.submit(renderizar, nome, *tarefas[nome]) for nome in ordem]
+                for futuro in as_completed(futuros):
+                    nome, segundos = futuro.result()
+                    resultado['renderizados'][nome] = segundos
+                    gravados[nome] = hashes[nome]
+    finally:
+        # O manifesto registra o que já foi gravado, mesmo se algum gráfico falhar
+        Path(manifesto).parent.mkdir(parents=True, exist_ok=True)
+        Path(manifesto).write_text(json.dumps(gravados, indent=2, sort_keys=True))
+    return resultado
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Regrava os gráficos da análise (data/*.png) sem abrir o notebook.")
+    parser.add_argument('graficos', nargs='*', help=f"Gráficos a exportar (padrão: todos): {', '.join(REGISTRO_GRAFICOS)}.")
+    parser.add_argument('--forcar', action='store_true', help="Refaz os gráficos mesmo que as entradas não tenham mudado.")
+    parser.add_argument('--processos', type=int, default=None, help="Número de processos (padrão: todos os núcleos).")
+    parser.add_argument('--saida', type=Path, default=DIRETORIO_SAIDA, help="Diretório dos PNGs.")
+    args = parser.parse_args()
+    desconhecidos = [nome for nome in args.graficos if nome not in REGISTRO_GRAFICOS]
+    if desconhecidos:
+        parser.error(f"gráficos desconhecidos: {', '.join(desconhecidos)}")
+
+    inicio = time.perf_counter()
+    resultado = exportar_graficos(args.graficos or None, args.saida, forcar=args.forcar, max_workers=args.processos)
+    for nome, segundos in sorted(resultado['renderizados'].items()):
+        print(f"{nome + '.png':<22} {segundos:6.2f} s")
+    print(f"{len(resultado['renderizados'])} gráficos gravados e {len(resultado['ignorados'])} já atualizados "
+          f"em {time.perf_counter() - inicio:.1f} s.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+import streamlit as st
+
+from instrumentacao import cronometrado, execucao_atual
+
+# Versões do Streamlit (maior, menor) cujos internos _enviar_spec reproduz; fora delas usa st.plotly_chart
+VERSOES_STREAMLIT = ((1, 45),)
+
+try:
+    # Caminho direto para enviar uma especificação já serializada, sem reconstruir a figura.
+    # São módulos internos do Streamlit: se mudarem, exibir_figura volta a usar st.plotly_chart.
+    from streamlit.elements.lib.form_utils import current_form_id
+    from streamlit.elements.lib.utils import compute_and_register_element_id
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+except ImportError:  # pragma: no cover - depende da versão do Streamlit
+    PlotlyChartProto = None
+
+_logger = logging.getLogger(__name__)
+# Desligado de vez (no processo) na primeira falha do caminho direto
+_envio_direto = (PlotlyChartProto is not None
+                 and tuple(int(parte) for parte in st.__version__.split('.')[:2]) in VERSOES_STREAMLIT)
+
+# Limite de memória das especificações guardadas (o JSON de uma figura do dashboard tem poucos KiB)
+TAMANHO_MAXIMO_BYTES = 64 * 1024 * 1024
+# Mesma configuração que st.plotly_chart envia por padrão
+CONFIGURACAO = json.dumps({'showLink': False, 'linkText': False})
+
+
+class CacheFiguras:
+    """
+    Cache LRU das figuras do Plotly já serializadas, compartilhado entre execuções e sessões.
+
+    A chave é (id do gráfico, chave do filtro, versão dos dados); o valor é o JSON que o
+    st.plotly_chart enviaria ao navegador. Quando a soma dos tamanhos passa do limite, as
+    figuras usadas há mais tempo são descartadas.
+
+    Args:
+        tamanho_maximo_bytes (int): Limite da soma dos tamanhos das especificações guardadas.
+    """
+
+    def __init__(self, tamanho_maximo_bytes: int = TAMANHO_MAXIMO_BYTES):
+        self.tamanho_maximo_bytes = tamanho_maximo_bytes
+        self.bytes = 0
+        self.acertos = 0
+        self.faltas = 0
+        self._figuras = OrderedDict()
+        self._trava = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._figuras)
+
+    def obter(self, chave: tuple, construir) -> str:
+        """
+        Especificação JSON da figura da chave, construída com `construir()` se não estiver no cache.
+
+        Args:
+            chave (tuple): (id do gráfico, chave do filtro, versão dos dados); deve ser hashable.
+            construir (callable): Função sem argumentos que devolve a go.Figure.
+
+        Returns:
+            str: Figura serializada (plotly.io.to_json).
+        """
+        with self._trava:
+            spec = self._figuras.get(chave)
+            if spec is not None:
+                self._figuras.move_to_end(chave)
+                self.acertos += 1
+                return spec
+
+        # Construção fora da trava: duas sessões podem montar a mesma figura ao mesmo tempo, o que é inofensivo
+        spec = pio.to_json(construir(), validate=False)
+        with self._trava:
+            self.faltas += 1
+            if chave not in self._figuras:
+                self._figuras[chave] = spec
+                self.bytes += len(spec)
+            while self.bytes > self.tamanho_maximo_bytes and len(self._figuras) > 1:
+                _, removida = self._figuras.popitem(last=False)
+                self.bytes -= len(removida)
+        return spec
+
+    def limpar(self) -> None:
+        with self._trava:
+            self._figuras.clear()
+            self.bytes = 0
+
+
+def _enviar_spec(spec: str, use_container_width: bool) -> None:
+    # Equivalente ao final de st.plotly_chart (sem seleção), a partir do JSON pronto
+    dg = st._main
+    proto = PlotlyChartProto()
+    proto.use_container_width = use_container_width
+    proto.theme = 'streamlit'
+    proto.form_id = current_form_id(dg)
+    proto.spec = spec
+    proto.config = CONFIGURACAO
+    proto.id = compute_and_register_element_id(
+        'plotly_chart', user_key=None, form_id=proto.form_id, plotly_spec=spec, plotly_config=CONFIGURACAO,
+        selection_mode=('points', 'box', 'lasso'), is_selection_activated=False, theme='streamlit',
+        use_container_width=use_container_width,
+    )
+    dg._enqueue('plotly_chart', proto)
+
+
+@cronometrado(nome='exibir_figura')
+def exibir_figura(cache: CacheFiguras, id_grafico: str, chave_filtro: tuple, versao_dados, construir,
+                  use_container_width: bool = True) -> None:
+    """
+    Exibe uma figura do Plotly, reaproveitando a especificação serializada quando a mesma visão já foi montada.
+
+    Args:
+        cache (CacheFiguras): Cache compartilhado.
+        id_grafico (str): Identificador do gráfico na página.
+        chave_filtro (tuple): Tudo o que determina o conteúdo do gráfico (filtros e controles).
+        versao_dados: Versão dos dados; uma nova versão invalida as figuras antigas.
+        construir (callable): Função sem argumentos que monta a go.Figure (só é chamada em caso de falta).
+        use_container_width (bool): Repassado para o gráfico.
+    """
+    faltas_antes = cache.faltas
+    spec = cache.obter((id_grafico, chave_filtro, versao_dados), construir)
+    execucao = execucao_atual()
+    if execucao is not None:
+        # Contadores por execução (aproximados se outra sessão construir uma figura ao mesmo tempo)
+        if cache.faltas == faltas_antes:
+            execucao.acertos['exibir_figura'] += 1
+        else:
+            execucao.faltas['exibir_figura'] += 1
+    global _envio_direto
+    if _envio_direto:
+        try:
+            _enviar_spec(spec, use_container_width)
+            return
+        except (TypeError, AttributeError, ValueError):
+            # Assinatura ou campo interno diferente do esperado: segue com a API pública daqui em diante
+            _logger.warning("Envio direto de figuras indisponível nesta versão do Streamlit; usando st.plotly_chart.",
+                            exc_info=True)
+            _envio_direto = False
+    st.plotly_chart(pio.from_json(spec), use_container_width=use_container_width)
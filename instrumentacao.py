@@ -0,0 +1,409 @@
+import functools
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+import types
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+
+# Momento em que este módulo foi importado: separa o início do processo das importações do script.
+# Tomado antes do pandas, cuja importação já faz parte das importações do script
+_CARREGADO_EM = time.perf_counter()
+
+import pandas as pd
+
+DIRETORIO_BASE = Path(__file__).resolve().parent
+# Uma linha JSON por execução do script; CENSO_METRICAS='' desativa a gravação
+CAMINHO_METRICAS = Path(os.environ.get('CENSO_METRICAS', DIRETORIO_BASE / 'data' / 'metricas' / 'execucoes.jsonl'))
+GRAVAR_METRICAS = os.environ.get('CENSO_METRICAS', None) != ''
+# Ao passar deste tamanho o arquivo vira <nome>.1 (substituindo o anterior): no máximo ~2x o limite em disco
+LIMITE_BYTES_METRICAS = 16 * 1024 ** 2
+INTERVALO_AMOSTRAGEM = 0.005  # segundos entre amostras do perfilador
+
+# Cada sessão do Streamlit executa o script na sua própria thread, então o estado da execução é por thread
+_local = threading.local()
+_trava_arquivo = threading.Lock()
+_execucoes_processo = 0
+_trava_processo = threading.Lock()
+
+
+class Execucao:
+    """Tempos e contadores de uma execução do script (um rerun do dashboard)."""
+
+    def __init__(self, nome: str, fria: bool = False):
+        self.nome = nome
+        self.inicio = time.perf_counter()
+        self.fria = fria                       # primeira execução do processo (início a frio)
+        self.secoes = {}                       # seção -> segundos (na ordem de execução)
+        self.funcoes = defaultdict(float)      # função -> segundos acumulados
+        self.chamadas = Counter()              # função -> número de chamadas
+        self.acertos = Counter()               # função cacheada -> acertos de cache
+        self.faltas = Counter()                # função cacheada -> faltas de cache
+        self.ativa = True
+        self._secao_atual = None
+        self._inicio_secao = None
+
+    def marcar(self, secao: str | None) -> None:
+        # Fecha a seção atual e, se `secao` não for None, abre a próxima
+        agora = time.perf_counter()
+        if self._secao_atual is not None:
+            self.secoes[self._secao_atual] = self.secoes.get(self._secao_atual, 0.0) + agora - self._inicio_secao
+        self._secao_atual, self._inicio_secao = secao, agora
+
+    def total(self) -> float:
+        return time.perf_counter() - self.inicio
+
+    def resumo(self) -> dict:
+        resumo = {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'script': self.nome,
+            'total': round(self.total(), 6),
+            'secoes': {k: round(v, 6) for k, v in self.secoes.items()},
+            'funcoes': {k: {'segundos': round(v, 6), 'chamadas': self.chamadas[k]} for k, v in self.funcoes.items()},
+            'cache': {k: {'acertos': self.acertos[k], 'faltas': self.faltas[k]} for k in self.acertos.keys() | self.faltas.keys()},
+        }
+        if self.fria:
+            resumo['inicio'] = fases_processo(self.inicio)
+        return resumo
+
+
+def fases_processo(inicio_script: float) -> dict:
+    """
+    Fases do início do processo até `inicio_script`: interpretador e servidor, e importações do script.
+
+    Args:
+        inicio_script (float): time.perf_counter() no começo da primeira execução do script.
+
+    Returns:
+        dict: 'processo' (segundos do início do processo até a importação deste módulo) e 'importacoes'
+        (daí até `inicio_script`).
+    """
+    import psutil  # Só no início a frio
+
+    # Idade do processo medida agora, convertida para o instante em que este módulo foi importado
+    idade = time.time() - psutil.Process().create_time() - (time.perf_counter() - _CARREGADO_EM)
+    return {'processo': round(max(idade, 0.0), 6), 'importacoes': round(inicio_script - _CARREGADO_EM, 6)}
+
+
+def iniciar_execucao(nome: str = 'dashboard') -> Execucao:
+    """Começa a medir uma nova execução na thread atual, descartando a anterior."""
+    global _execucoes_processo
+    with _trava_processo:
+        _execucoes_processo += 1
+        fria = _execucoes_processo == 1
+    _local.execucao = Execucao(nome, fria)
+    return _local.execucao
+
+
+def execucao_atual() -> Execucao | None:
+    """Execução em andamento na thread atual (None fora do dashboard, ex: em scripts e no notebook)."""
+    return getattr(_local, 'execucao', None)
+
+
+def secao(nome: str) -> None:
+    """
+    Marca o início de uma seção do script; a seção anterior termina aqui.
+
+    Marcas sequenciais evitam reindentar o script inteiro em blocos `with`.
+    """
+    execucao = execucao_atual()
+    if execucao is not None:
+        execucao.marcar(nome)
+
+
+def finalizar_execucao() -> dict | None:
+    """
+    Fecha a última seção, grava a linha de métricas e devolve o resumo da execução.
+
+    O arquivo de métricas é rotacionado por tamanho (ver LIMITE_BYTES_METRICAS), então um
+    servidor de longa duração não o faz crescer sem limite.
+
+    Returns:
+        dict | None: Resumo (ver Execucao.resumo), ou None se nenhuma execução foi iniciada.
+    """
+    execucao = execucao_atual()
+    if execucao is None:
+        return None
+    execucao.marcar(None)
+    execucao.ativa = False
+    resumo = execucao.resumo()
+    if GRAVAR_METRICAS:
+        try:
+            CAMINHO_METRICAS.parent.mkdir(parents=True, exist_ok=True)
+            with _trava_arquivo:
+                with open(CAMINHO_METRICAS, 'a', encoding='utf-8') as arquivo:
+                    arquivo.write(json.dumps(resumo, ensure_ascii=False) + '\n')
+                    tamanho = arquivo.tell()
+                if tamanho > LIMITE_BYTES_METRICAS:
+                    os.replace(CAMINHO_METRICAS, CAMINHO_METRICAS.with_name(CAMINHO_METRICAS.name + '.1'))
+        except OSError:
+            pass  # Métricas nunca devem derrubar o dashboard
+    return resumo
+
+
+def cronometrado(funcao=None, *, nome: str | None = None):
+    """
+    Decorador que soma o tempo e o número de chamadas da função na execução atual.
+
+    Fora de uma execução medida o custo é só uma consulta ao estado da thread.
+    Pode ser usado como @cronometrado ou @cronometrado(nome='...').
+    """
+    def decorar(funcao):
+        rotulo = nome or funcao.__qualname__
+
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            execucao = execucao_atual()
+            if execucao is None:
+                return funcao(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                execucao.funcoes[rotulo] += time.perf_counter() - inicio
+                execucao.chamadas[rotulo] += 1
+        return envoltorio
+
+    return decorar(funcao) if funcao is not None else decorar
+
+
+def medir_fragmento(nome: str):
+    """
+    Decorador para funções marcadas com @st.fragment (aplicado por baixo dele).
+
+    Dentro de uma execução completa o fragmento vira apenas uma seção. Quando o Streamlit
+    reexecuta só o fragmento, não há execução ativa na thread, então o fragmento é medido
+    como uma execução própria, gravada com o nome 'fragmento: <nome>'.
+    """
+    def decorar(funcao):
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            execucao = execucao_atual()
+            if execucao is not None and execucao.ativa:
+                execucao.marcar(nome)
+                return funcao(*args, **kwargs)
+            iniciar_execucao(f'fragmento: {nome}').marcar(nome)
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                finalizar_execucao()
+        return envoltorio
+
+    return decorar
+
+
+def cache_instrumentado(decorador_cache, nome: str | None = None):
+    """
+    Aplica um decorador de cache do Streamlit contando acertos e faltas.
+
+    O corpo da função só executa quando o cache falha, então uma chamada em que o corpo não
+    rodou é um acerto. Uso: @cache_instrumentado(st.cache_data) no lugar de @st.cache_data.
+
+    Args:
+        decorador_cache: st.cache_data, st.cache_resource ou uma chamada deles com parâmetros.
+        nome (str | None): Rótulo nas métricas. Se None, usa o nome da função.
+    """
+    def decorar(funcao):
+        rotulo = nome or funcao.__qualname__
+
+        @functools.wraps(funcao)
+        def corpo(*args, **kwargs):
+            execucao = execucao_atual()
+            if execucao is not None:
+                execucao.faltas[rotulo] += 1
+            return funcao(*args, **kwargs)
+
+        cacheada = decorador_cache(corpo)
+
+        @functools.wraps(funcao)
+        def chamada(*args, **kwargs):
+            execucao = execucao_atual()
+            if execucao is None:
+                return cacheada(*args, **kwargs)
+            faltas_antes = execucao.faltas[rotulo]
+            inicio = time.perf_counter()
+            try:
+                return cacheada(*args, **kwargs)
+            finally:
+                execucao.funcoes[rotulo] += time.perf_counter() - inicio
+                execucao.chamadas[rotulo] += 1
+                if execucao.faltas[rotulo] == faltas_antes:
+                    execucao.acertos[rotulo] += 1
+
+        chamada.clear = cacheada.clear
+        return chamada
+
+    return decorar
+
+
+class _ModuloTardio(types.ModuleType):
+    # Substituto do módulo até o primeiro acesso a um atributo. O importlib.util.LazyLoader não serve:
+    # no Python 3.11 duas sessões que acessam o módulo ao mesmo tempo podem executá-lo duas vezes
+    # ou ver o módulo pela metade. Aqui a primeira importação acontece sob uma trava.
+
+    def __init__(self, nome: str):
+        super().__init__(nome)
+        self._trava = threading.Lock()
+        self._modulo = None
+
+    def __getattr__(self, atributo: str):
+        # Só é chamado para atributos que o substituto não tem, ou seja, os do módulo real
+        if self._modulo is None:
+            with self._trava:
+                if self._modulo is None:
+                    self._modulo = importlib.import_module(self.__name__)
+        return getattr(self._modulo, atributo)
+
+
+def importar_tardio(nome: str):
+    """
+    Importa um módulo de forma preguiçosa: o código dele só roda no primeiro acesso a um atributo.
+
+    Tira do início a frio módulos pesados que só algumas seções usam (ex: plotly.express, que
+    só é necessário quando um gráfico é montado, depois que os KPIs já foram exibidos). O primeiro
+    acesso é protegido por uma trava, então sessões simultâneas podem usar o mesmo substituto.
+
+    Args:
+        nome (str): Nome completo do módulo.
+
+    Returns:
+        module: O módulo, se já foi importado, ou um substituto que repassa os atributos a ele.
+    """
+    if nome in sys.modules:
+        return sys.modules[nome]
+    return _ModuloTardio(nome)
+
+
+class Amostrador:
+    """
+    Perfilador por amostragem de uma thread: a cada `intervalo` segundos registra a pilha dela.
+
+    Roda em uma thread separada e só lê sys._current_frames(), então o custo na thread medida
+    é pequeno e independe do número de chamadas (ao contrário do cProfile).
+    """
+
+    def __init__(self, id_thread: int | None = None, intervalo: float = INTERVALO_AMOSTRAGEM):
+        self.id_thread = id_thread or threading.get_ident()
+        self.intervalo = intervalo
+        self.amostras = 0
+        self.proprio = Counter()    # (arquivo, linha, função) no topo da pilha
+        self.inclusivo = Counter()  # (arquivo, função) em qualquer ponto da pilha
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, daemon=True, name='amostrador-perfil')
+
+    def iniciar(self) -> 'Amostrador':
+        self._thread.start()
+        return self
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+    def parar(self) -> None:
+        self._parar.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _executar(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.id_thread)
+            if frame is None:  # A thread medida terminou (ex: st.stop() antes do fim do script)
+                break
+            self.amostras += 1
+            self.proprio[(frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name)] += 1
+            vistos = set()
+            while frame is not None:
+                chave = (frame.f_code.co_filename, frame.f_code.co_name)
+                if chave not in vistos:  # Recursão conta uma vez por amostra
+                    vistos.add(chave)
+                    self.inclusivo[chave] += 1
+                frame = frame.f_back
+
+    def pontos_quentes(self, n: int = 15) -> pd.DataFrame:
+        """
+        Linhas com mais amostras no topo da pilha (tempo próprio).
+
+        Returns:
+            pd.DataFrame: Colunas 'Função', 'Local', 'Amostras' e '% do tempo'.
+        """
+        linhas = [
+            {'Função': funcao, 'Local': f"{_caminho_curto(arquivo)}:{linha}", 'Amostras': qtd,
+             '% do tempo': 100 * qtd / max(self.amostras, 1)}
+            for (arquivo, linha, funcao), qtd in self.proprio.most_common(n)
+        ]
+        return pd.DataFrame(linhas, columns=['Função', 'Local', 'Amostras', '% do tempo'])
+
+    def funcoes_projeto(self, n: int = 15) -> pd.DataFrame:
+        """
+        Funções dos módulos do projeto com mais amostras em qualquer ponto da pilha (tempo inclusivo).
+
+        Returns:
+            pd.DataFrame: Colunas 'Função', 'Arquivo', 'Amostras' e '% do tempo'.
+        """
+        linhas = [
+            {'Função': funcao, 'Arquivo': _caminho_curto(arquivo), 'Amostras': qtd,
+             '% do tempo': 100 * qtd / max(self.amostras, 1)}
+            for (arquivo, funcao), qtd in self.inclusivo.most_common()
+            if Path(arquivo).parent == DIRETORIO_BASE and arquivo != __file__ and funcao != '<module>'
+        ]
+        return pd.DataFrame(linhas[:n], columns=['Função', 'Arquivo', 'Amostras', '% do tempo'])
+
+
+def _caminho_curto(arquivo: str) -> str:
+    # Caminho relativo ao projeto ou ao site-packages, para caber na barra lateral
+    caminho = Path(arquivo)
+    if caminho.parent == DIRETORIO_BASE:
+        return caminho.name
+    partes = caminho.parts
+    for marcador in ('site-packages', 'dist-packages', 'lib'):
+        if marcador in partes:
+            return '/'.join(partes[len(partes) - partes[::-1].index(marcador):])
+    return arquivo
+
+
+def tabela_secoes(resumo: dict) -> pd.DataFrame:
+    """Tempos por seção de um resumo de execução, em ms e em % do total."""
+    total = resumo['total'] or 1.0
+    return pd.DataFrame(
+        [{'Seção': nome, 'ms': 1000 * s, '%': 100 * s / total} for nome, s in resumo['secoes'].items()],
+        columns=['Seção', 'ms', '%']
+    )
+
+
+def tabela_funcoes(resumo: dict) -> pd.DataFrame:
+    """Tempos das funções instrumentadas e contadores de cache de um resumo de execução."""
+    linhas = []
+    for nome, dados in resumo['funcoes'].items():
+        cache = resumo['cache'].get(nome)
+        linhas.append({
+            'Função': nome, 'ms': 1000 * dados['segundos'], 'Chamadas': dados['chamadas'],
+            'Acertos de cache': cache['acertos'] if cache else None,
+            'Faltas de cache': cache['faltas'] if cache else None,
+        })
+    colunas = ['Função', 'ms', 'Chamadas', 'Acertos de cache', 'Faltas de cache']
+    return pd.DataFrame(linhas, columns=colunas).sort_values('ms', ascending=False, ignore_index=True)
+
+
+def tabela_inicio(resumo: dict) -> pd.DataFrame:
+    """
+    Linha do tempo de um início a frio: processo, importações e cada seção da primeira execução.
+
+    A coluna 'Acumulado (ms)' é o tempo desde o início do processo até o fim de cada fase; o valor
+    na seção 'KPIs' é o tempo até os primeiros números aparecerem para o usuário.
+
+    Returns:
+        pd.DataFrame: Colunas 'Fase', 'ms' e 'Acumulado (ms)' (vazio se a execução não foi a primeira do processo).
+    """
+    if 'inicio' not in resumo:
+        return pd.DataFrame(columns=['Fase', 'ms', 'Acumulado (ms)'])
+    fases = {'Processo e servidor': resumo['inicio']['processo'], 'Importações': resumo['inicio']['importacoes'],
+             **resumo['secoes']}
+    df = pd.DataFrame({'Fase': list(fases), 'ms': [1000 * s for s in fases.values()]})
+    df['Acumulado (ms)'] = df['ms'].cumsum()
+    return df
@@ -0,0 +1,241 @@
+import argparse
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from dados import DIRETORIO_BASE
+
+# --- Fontes ---
+# Microdados do Censo da Educação Superior (cadastro de cursos), um arquivo por ano:
+# https://www.gov.br/inep/pt-br/acesso-a-informacao/dados-abertos/microdados/censo-da-educacao-superior
+DIRETORIO_MICRODADOS = DIRETORIO_BASE / 'data' / 'microdados'
+CAMINHO_AMOSTRA = DIRETORIO_BASE / 'data' / 'fixtures' / 'MICRODADOS_CADASTRO_CURSOS_AMOSTRA.CSV'
+SEPARADOR = ';'
+CODIFICACAO = 'latin-1'
+# Linhas lidas por vez: limita a memória independentemente do tamanho do arquivo (alguns GB por ano)
+LINHAS_POR_BLOCO = 200_000
+
+# --- Mapeamento para as dimensões das tabelas de divulgação (ver dados.MAPA_COLUNAS) ---
+# TP_GRAU_ACADEMICO: 4 (Bacharelado e Licenciatura, áreas básicas de ingresso) e vazio não têm grau definido
+GRAUS = {1: 'Bacharelado', 2: 'Licenciatura', 3: 'Tecnológico', 4: 'Não aplicável'}
+GRAU_AUSENTE = 'Não aplicável'
+MODALIDADES = {1: 'Presencial', 2: 'A distância'}
+# TP_CATEGORIA_ADMINISTRATIVA -> (Categoria, Subcategoria)
+# As instituições especiais (art. 242 da Constituição) são criadas pelo poder público mas cobram mensalidade:
+# não cabem em Pública nem em Privada, então ficam em uma categoria própria em vez de inflar uma das duas
+CATEGORIAS = {
+    1: ('Pública', 'Federal'),
+    2: ('Pública', 'Estadual'),
+    3: ('Pública', 'Municipal'),
+    4: ('Privada', 'Com fins'),
+    5: ('Privada', 'Sem fins'),
+    6: ('Privada', 'Com fins'),   # Particular em sentido estrito
+    7: ('Especial', 'Especial'),
+    8: ('Privada', 'Sem fins'),   # Comunitária
+    9: ('Privada', 'Sem fins'),   # Confessional
+}
+# Colunas de identificação mantidas para os detalhamentos (curso, instituição e UF)
+IDENTIFICACAO = {'CO_IES': 'int64', 'CO_CURSO': 'int64', 'NO_CURSO': 'string', 'SG_UF': 'string', 'NO_MUNICIPIO': 'string'}
+# Quantidades do cadastro de cursos -> base correspondente das tabelas de divulgação
+MEDIDAS = {'QT_ING': 'Ingressantes', 'QT_MAT': 'Matrículas', 'QT_CONC': 'Concluintes'}
+CODIGOS = ['NU_ANO_CENSO', 'TP_GRAU_ACADEMICO', 'TP_MODALIDADE_ENSINO', 'TP_CATEGORIA_ADMINISTRATIVA']
+DIMENSOES = ['Ano', 'Grau', 'Modalidade', 'Categoria', 'Subcategoria', 'SG_UF', 'CO_IES', 'CO_CURSO', 'NO_CURSO', 'NO_MUNICIPIO']
+
+ESQUEMA = pa.schema([
+    ('Ano', pa.int16()),
+    ('Grau', pa.dictionary(pa.int8(), pa.string())),
+    ('Modalidade', pa.dictionary(pa.int8(), pa.string())),
+    ('Categoria', pa.dictionary(pa.int8(), pa.string())),
+    ('Subcategoria', pa.dictionary(pa.int8(), pa.string())),
+    ('SG_UF', pa.dictionary(pa.int8(), pa.string())),
+    ('CO_IES', pa.int64()),
+    ('CO_CURSO', pa.int64()),
+    ('NO_CURSO', pa.string()),
+    ('NO_MUNICIPIO', pa.string()),
+] + [(base, pa.int32()) for base in MEDIDAS.values()])
+
+
+def ler_blocos(caminho: Path, linhas_por_bloco: int = LINHAS_POR_BLOCO):
+    """
+    Lê um CSV de microdados em blocos, apenas com as colunas usadas.
+
+    Args:
+        caminho (Path): Arquivo MICRODADOS_CADASTRO_CURSOS_<ano>.CSV (';' e latin-1).
+        linhas_por_bloco (int): Número de linhas de cada bloco.
+
+    Yields:
+        pd.DataFrame: Bloco com as colunas de CODIGOS, IDENTIFICACAO e MEDIDAS.
+    """
+    tipos = {codigo: 'Int64' for codigo in CODIGOS} | IDENTIFICACAO | {medida: 'Int64' for medida in MEDIDAS}
+    yield from pd.read_csv(
+        caminho, sep=SEPARADOR, encoding=CODIFICACAO, usecols=list(tipos), dtype=tipos,
+        chunksize=linhas_por_bloco, low_memory=True
+    )
+
+
+def mapear_bloco(bloco: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte um bloco bruto para as dimensões Ano/Grau/Modalidade/Categoria/Subcategoria das tabelas de divulgação.
+
+    Args:
+        bloco (pd.DataFrame): Saída de ler_blocos.
+
+    Returns:
+        pd.DataFrame: Colunas de DIMENSOES e uma coluna por base (Ingressantes, Matrículas, Concluintes).
+        Linhas sem ano, modalidade ou categoria reconhecida são descartadas.
+    """
+    categoria = bloco['TP_CATEGORIA_ADMINISTRATIVA']
+    df = pd.DataFrame({
+        'Ano': bloco['NU_ANO_CENSO'],
+        'Grau': bloco['TP_GRAU_ACADEMICO'].map(GRAUS).fillna(GRAU_AUSENTE),
+        'Modalidade': bloco['TP_MODALIDADE_ENSINO'].map(MODALIDADES),
+        'Categoria': categoria.map({codigo: c for codigo, (c, _) in CATEGORIAS.items()}),
+        'Subcategoria': categoria.map({codigo: s for codigo, (_, s) in CATEGORIAS.items()}),
+        **{coluna: bloco[coluna] for coluna in IDENTIFICACAO},
+        **{base: bloco[medida].fillna(0) for medida, base in MEDIDAS.items()},
+    })
+    return df.dropna(subset=['Ano', 'Modalidade', 'Categoria'])[DIMENSOES + list(MEDIDAS.values())]
+
+
+def _para_arrow(df: pd.DataFrame) -> pa.Table:
+    # Dimensões como dicionário (codificação compacta no Parquet) e quantidades em int32
+    dicionarios = [campo.name for campo in ESQUEMA if pa.types.is_dictionary(campo.type)]
+    return pa.Table.from_pandas(df.astype({nome: 'category' for nome in dicionarios}), preserve_index=False).cast(ESQUEMA)
+
+
+def ingerir_microdados(arquivos: list[Path], destino: Path = DIRETORIO_MICRODADOS,
+                       linhas_por_bloco: int = LINHAS_POR_BLOCO) -> dict:
+    """
+    Converte os CSVs de microdados em um dataset Parquet particionado por ano (destino/Ano=<ano>/*.parquet).
+
+    Cada bloco é mapeado e gravado antes da leitura do próximo, então a memória usada depende
+    de linhas_por_bloco e não do tamanho dos arquivos. O dataset é montado em um diretório
+    temporário e só substitui o anterior ao final, como o cache das tabelas de divulgação.
+
+    Args:
+        arquivos (list[Path]): CSVs a ingerir (um ou mais anos).
+        destino (Path): Diretório do dataset.
+        linhas_por_bloco (int): Linhas lidas por vez.
+
+    Returns:
+        dict: 'linhas' gravadas, 'descartadas' (sem dimensões reconhecidas), 'blocos' e 'anos'.
+    """
+    destino = Path(destino)
+    temporario = destino.with_name(f'.{destino.name}.tmp')
+    shutil.rmtree(temporario, ignore_errors=True)
+    temporario.mkdir(parents=True)
+
+    resumo = {'linhas': 0, 'descartadas': 0, 'blocos': 0, 'anos': set()}
+    for arquivo in arquivos:
+        for bloco in ler_blocos(arquivo, linhas_por_bloco):
+            df = mapear_bloco(bloco)
+            resumo['descartadas'] += len(bloco) - len(df)
+            if df.empty:
+                continue
+            ds.write_dataset(
+                _para_arrow(df), temporario, format='parquet', partitioning=['Ano'], partitioning_flavor='hive',
+                basename_template=f"parte-{resumo['blocos']:05d}-{{i}}.parquet",
+                existing_data_behavior='overwrite_or_ignore'
+            )
+            resumo['linhas'] += len(df)
+            resumo['blocos'] += 1
+            resumo['anos'].update(int(ano) for ano in df['Ano'].unique())
+
+    shutil.rmtree(destino, ignore_errors=True)
+    temporario.rename(destino)
+    resumo['anos'] = sorted(resumo['anos'])
+    return resumo
+
+
+def abrir_microdados(diretorio: Path = DIRETORIO_MICRODADOS) -> ds.Dataset:
+    """Abre o dataset particionado por ano (sem ler os dados)."""
+    return ds.dataset(diretorio, format='parquet', partitioning='hive')
+
+
+def _filtro(anos=None, graus=None, ufs=None, ies=None):
+    # Expressão do pyarrow: o filtro de ano elimina partições inteiras, os demais usam as estatísticas dos row groups
+    condicoes = []
+    if anos is not None:
+        condicoes.append(ds.field('Ano').isin([int(ano) for ano in anos]))
+    if graus is not None:
+        condicoes.append(ds.field('Grau').isin(list(graus)))
+    if ufs is not None:
+        condicoes.append(ds.field('SG_UF').isin(list(ufs)))
+    if ies is not None:
+        condicoes.append(ds.field('CO_IES').isin([int(codigo) for codigo in ies]))
+    filtro = None
+    for condicao in condicoes:
+        filtro = condicao if filtro is None else filtro & condicao
+    return filtro
+
+
+def consultar_microdados(diretorio: Path = DIRETORIO_MICRODADOS, colunas: list[str] | None = None,
+                         anos=None, graus=None, ufs=None, ies=None) -> pd.DataFrame:
+    """
+    Lê do dataset apenas as linhas e colunas pedidas.
+
+    Args:
+        diretorio (Path): Dataset gravado por ingerir_microdados.
+        colunas (list[str] | None): Colunas a ler. Se None, lê todas.
+        anos, graus, ufs, ies (iterable | None): Valores aceitos de Ano, Grau, SG_UF e CO_IES (None = sem filtro).
+
+    Returns:
+        pd.DataFrame: Linhas filtradas, com as dimensões como categóricas.
+    """
+    df = abrir_microdados(diretorio).to_table(columns=colunas, filter=_filtro(anos, graus, ufs, ies)).to_pandas()
+    if 'Ano' in df:  # A partição é lida como int32; mantém o mesmo tipo das tabelas de divulgação
+        df['Ano'] = df['Ano'].astype(np.int16)
+    return df
+
+
+def agregar_microdados(por: list[str], diretorio: Path = DIRETORIO_MICRODADOS, bases: list[str] | None = None,
+                       anos=None, graus=None, ufs=None, ies=None) -> pd.DataFrame:
+    """
+    Soma as bases pelas dimensões pedidas sem carregar o dataset no pandas.
+
+    A leitura usa os filtros (partições e row groups) e a agregação é feita no Arrow;
+    só o resultado agregado é convertido para DataFrame.
+
+    Args:
+        por (list[str]): Dimensões do agrupamento (ex: ['Ano', 'SG_UF']).
+        diretorio (Path): Dataset gravado por ingerir_microdados.
+        bases (list[str] | None): Bases a somar. Se None, soma Ingressantes, Matrículas e Concluintes.
+        anos, graus, ufs, ies (iterable | None): Filtros, como em consultar_microdados.
+
+    Returns:
+        pd.DataFrame: Uma linha por combinação de `por`, ordenada, com uma coluna por base.
+    """
+    bases = list(MEDIDAS.values()) if bases is None else bases
+    tabela = abrir_microdados(diretorio).to_table(columns=por + bases, filter=_filtro(anos, graus, ufs, ies))
+    # group_by não aceita colunas de dicionário em todas as versões do Arrow: agrupa pelos valores
+    tabela = pa.table({
+        nome: pc.cast(tabela[nome], tabela.schema.field(nome).type.value_type)
+        if pa.types.is_dictionary(tabela.schema.field(nome).type) else tabela[nome]
+        for nome in tabela.column_names
+    })
+    agregado = tabela.group_by(por).aggregate([(base, 'sum') for base in bases])
+    df = agregado.to_pandas().rename(columns={f'{base}_sum': base for base in bases})
+    df[bases] = df[bases].fillna(0).astype(np.int64)
+    if 'Ano' in por:
+        df['Ano'] = df['Ano'].astype(np.int16)
+    return df[por + bases].sort_values(por, ignore_index=True)
+
+
+if __name__ == '__main__':
+    # Etapa de ingestão dos microdados: python microdados.py MICRODADOS_CADASTRO_CURSOS_2023.CSV ...
+    # Sem argumentos, ingere a amostra sintética de data/fixtures/ (útil para testar sem os arquivos do INEP)
+    parser = argparse.ArgumentParser(description="Ingestão dos microdados de cursos do INEP em Parquet particionado por ano.")
+    parser.add_argument('arquivos', type=Path, nargs='*', default=[CAMINHO_AMOSTRA], help="CSVs de microdados.")
+    parser.add_argument('--destino', type=Path, default=DIRETORIO_MICRODADOS, help="Diretório do dataset.")
+    parser.add_argument('--linhas-por-bloco', type=int, default=LINHAS_POR_BLOCO, help="Linhas lidas por vez.")
+    args = parser.parse_args()
+
+    resumo = ingerir_microdados(args.arquivos, args.destino, args.linhas_por_bloco)
+    print(f"{resumo['linhas']} cursos gravados em {args.destino} ({resumo['blocos']} blocos, anos {resumo['anos']}); "
+          f"{resumo['descartadas']} linhas descartadas.")
+    print(agregar_microdados(['Ano', 'Grau'], args.destino).to_string(index=False))
@@ -0,0 +1,348 @@
+import argparse
+import hashlib
+import inspect
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import consultas
+import cubo
+import previsoes
+import previsores
+import regression
+import taxas
+from consultas import Consultas
+from cubo import montar_cubo
+from dados import DIRETORIO_BASE, atualizar_cache, carregar_tabelas, graus_academicos
+from previsoes import calcular_previsoes, carregar_estados, salvar_estados
+from previsores import avaliar_modelos
+from taxas import fatiar_taxas, matriz_aproveitamento
+
+DIRETORIO_PIPELINE = DIRETORIO_BASE / 'data' / 'pipeline'
+# Versão do formato do cache das etapas: entra na chave de todas elas
+VERSAO_PIPELINE = 1
+
+# Ingressantes de 2013 a 2017 e seus concluintes 5 anos depois (como no notebook)
+ANOS_INGRESSO = range(2013, 2018)
+DEFASAGEM = 5
+MODALIDADES_APROVEITAMENTO = {
+    'Geral': ('Total geral', 'Total geral'),  # ingresso, concluinte
+    'Presencial Pub': ('Total presencial publica', 'Total presencial publica'),
+    'Presencial Priv': ('Total presencial privada', 'Total presencial privada'),
+    'Remota Pub': ('Total remota publica', 'Total remota publica'),
+    'Remota Priv': ('Total remota privada', 'Total remota privada'),
+}
+PONTOS_DENSIDADE = 200
+
+
+# --- Etapas ---
+# Cada função recebe as saídas das etapas de entrada (nome da saída -> DataFrame) e devolve as suas.
+
+def _tabelas(entradas: dict) -> dict[str, pd.DataFrame]:
+    df_ingressantes, df_concluintes = carregar_tabelas()
+    return {'ingressantes': df_ingressantes, 'concluintes': df_concluintes}
+
+
+def _chave_fonte() -> str:
+    # O diretório do cache de dados.py já é o hash do conteúdo da planilha (e da versão do esquema)
+    return Path(atualizar_cache()).name
+
+
+def _totais(entradas: dict) -> dict[str, pd.DataFrame]:
+    return {
+        f'{base}_totais': entradas[base][entradas[base]['Grau'] == 'Total'].reset_index(drop=True)
+        for base in ('ingressantes', 'concluintes')
+    }
+
+
+def _aproveitamento(entradas: dict) -> dict[str, pd.DataFrame]:
+    ing = entradas['ingressantes_totais'].set_index('Ano')['Total geral']
+    conc = entradas['concluintes_totais'].set_index('Ano')['Total geral']
+    anos = np.asarray(ANOS_INGRESSO)
+    aproveitamento = pd.DataFrame({
+        'Ano ingresso': anos,
+        'Ano conclusao': anos + DEFASAGEM,
+        'Ingressantes': ing.reindex(anos, fill_value=0).to_numpy(dtype=np.int64),
+        'Concluintes': conc.reindex(anos + DEFASAGEM, fill_value=0).to_numpy(dtype=np.int64),
+    })
+    with np.errstate(divide='ignore', invalid='ignore'):
+        taxa = np.where(aproveitamento['Ingressantes'] > 0, aproveitamento['Concluintes'] / aproveitamento['Ingressantes'] * 100, 0.0)
+    aproveitamento['Taxa aproveitamento (%)'] = np.round(taxa, 2)
+
+    matriz = matriz_aproveitamento(entradas['ingressantes_totais'], entradas['concluintes_totais'], MODALIDADES_APROVEITAMENTO)
+    return {'aproveitamento': aproveitamento, 'taxas': fatiar_taxas(matriz, ANOS_INGRESSO, DEFASAGEM)}
+
+
+def _densidades(entradas: dict) -> dict[str, pd.DataFrame]:
+    from scipy.stats import gaussian_kde  # Importação pesada: só quando a etapa é calculada
+
+    # Estimativa de densidade por kernel do total anual de cada base (mesma banda e extensão padrão do seaborn)
+    partes = []
+    for base in ('ingressantes', 'concluintes'):
+        valores = entradas[f'{base}_totais']['Total geral'].to_numpy(dtype=np.float64)
+        kde = gaussian_kde(valores, bw_method='scott')
+        banda = np.sqrt(kde.covariance[0, 0])
+        x = np.linspace(valores.min() - 3 * banda, valores.max() + 3 * banda, PONTOS_DENSIDADE)
+        partes.append(pd.DataFrame({'Base': base.title(), 'x': x, 'densidade': kde(x)}))
+    return {'densidades': pd.concat(partes, ignore_index=True)}
+
+
+def _previsoes(entradas: dict) -> dict[str, pd.DataFrame]:
+    # Os estados da regressão incremental da execução anterior ficam ao lado do cache dos dados: com um ano novo,
+    # cada ano inicial recebe uma atualização em vez de um reajuste. Os anos iniciais são distribuídos entre os núcleos
+    cubos = {'Ingressantes': montar_cubo(entradas['ingressantes']), 'Concluintes': montar_cubo(entradas['concluintes'])}
+    estados = carregar_estados()
+    previsoes_calculadas = calcular_previsoes(cubos, max_workers=None, estados=estados)
+    salvar_estados(estados)
+    return {'previsoes': previsoes_calculadas}
+
+
+def _modelos(entradas: dict) -> dict[str, pd.DataFrame]:
+    # Os ajustes do statsmodels dominam o tempo: as séries são distribuídas entre todos os núcleos
+    cubos = {'Ingressantes': montar_cubo(entradas['ingressantes']), 'Concluintes': montar_cubo(entradas['concluintes'])}
+    return {'modelos': avaliar_modelos(cubos, max_workers=None)}
+
+
+# --- Registro de Etapas ---
+# Cada etapa declara:
+#   calcular: função da etapa
+#   entradas: etapas cujas saídas ela lê
+#   saidas: nomes das tabelas que ela devolve (únicos no pipeline)
+#   codigo: módulos (ou funções) cujo código entra na chave, além do da própria etapa. Os módulos entram
+#           inteiros, para que funções auxiliares (ex: _previsoes_inicio) também invalidem o cache.
+#           Código fora da lista (e versões de bibliotecas) não entra na chave: use --forcar depois de alterá-lo.
+#   chave_externa: (opcional) função que identifica dados vindos de fora do pipeline
+REGISTRO_ETAPAS = {
+    'tabelas': {'calcular': _tabelas, 'entradas': [], 'saidas': ['ingressantes', 'concluintes'],
+                'codigo': [], 'chave_externa': _chave_fonte},
+    'totais': {'calcular': _totais, 'entradas': ['tabelas'], 'saidas': ['ingressantes_totais', 'concluintes_totais'],
+               'codigo': []},
+    'aproveitamento': {'calcular': _aproveitamento, 'entradas': ['totais'], 'saidas': ['aproveitamento', 'taxas'],
+                       'codigo': [taxas]},
+    'densidades': {'calcular': _densidades, 'entradas': ['totais'], 'saidas': ['densidades'], 'codigo': []},
+    'previsoes': {'calcular': _previsoes, 'entradas': ['tabelas'], 'saidas': ['previsoes'],
+                  'codigo': [cubo, previsoes, regression, graus_academicos]},
+    'modelos': {'calcular': _modelos, 'entradas': ['tabelas'], 'saidas': ['modelos'],
+                'codigo': [cubo, previsoes, previsores, regression, graus_academicos]},
+}
+
+
+def chave_etapa(nome: str, chaves: dict | None = None) -> str:
+    """
+    Chave do resultado de uma etapa: hash do código dela e das chaves das etapas de entrada.
+
+    Editar uma etapa muda a chave dela e, em cascata, a das que dependem dela; as demais não mudam.
+
+    Args:
+        nome (str): Nome da etapa em REGISTRO_ETAPAS.
+        chaves (dict | None): Chaves já calculadas nesta execução (preenchido pela função).
+
+    Returns:
+        str: SHA-256 hexadecimal.
+    """
+    chaves = {} if chaves is None else chaves
+    if nome not in chaves:
+        etapa = REGISTRO_ETAPAS[nome]
+        h = hashlib.sha256(f'v{VERSAO_PIPELINE}|{nome}'.encode())
+        for codigo in [etapa['calcular']] + etapa['codigo']:
+            h.update(inspect.getsource(codigo).encode())
+        for entrada in etapa['entradas']:
+            h.update(chave_etapa(entrada, chaves).encode())
+        if 'chave_externa' in etapa:
+            h.update(etapa['chave_externa']().encode())
+        chaves[nome] = h.hexdigest()
+    return chaves[nome]
+
+
+def _ler_etapa(destino: Path, saidas: list[str]) -> dict[str, pd.DataFrame] | None:
+    if not all((destino / f'{saida}.parquet').exists() for saida in saidas):
+        return None
+    return {saida: pd.read_parquet(destino / f'{saida}.parquet') for saida in saidas}
+
+
+def carregar_etapa(nome: str, forcar: bool = False, diretorio: Path = DIRETORIO_PIPELINE, calcular: bool = True,
+                   _chaves: dict | None = None, _relatorio: dict | None = None) -> dict[str, pd.DataFrame]:
+    """
+    Saídas de uma etapa, lidas do cache em disco ou calculadas (junto com as entradas que faltarem).
+
+    Uma etapa em cache é lida sem carregar as suas entradas: só as chaves delas são calculadas.
+
+    Args:
+        nome (str): Nome da etapa em REGISTRO_ETAPAS.
+        forcar (bool): Se True, recalcula esta etapa (as entradas continuam vindo do cache).
+        diretorio (Path): Raiz do cache das etapas.
+        calcular (bool): Se False, só lê o cache. Para quem não pode pagar o cálculo (ex: o dashboard,
+            em que previsoes e modelos abririam um pool de processos): essas etapas são geradas antes,
+            por `python pipeline.py`.
+
+    Returns:
+        dict: Nome da saída -> DataFrame.
+
+    Raises:
+        FileNotFoundError: Se `calcular` for False e a etapa não estiver em cache.
+    """
+    chaves = {} if _chaves is None else _chaves
+    etapa = REGISTRO_ETAPAS[nome]
+    chave = chave_etapa(nome, chaves)
+    destino = Path(diretorio) / nome / chave[:16]
+
+    if not forcar:
+        saidas = _ler_etapa(destino, etapa['saidas'])
+        if saidas is not None:
+            if _relatorio is not None:
+                _relatorio.setdefault(nome, ('cache', 0.0))  # Não apaga o registro de uma etapa calculada nesta execução
+            return saidas
+    if not calcular:
+        raise FileNotFoundError(f"A etapa {nome} não está em cache: execute `python pipeline.py {nome}`.")
+
+    entradas = {}
+    for entrada in etapa['entradas']:
+        entradas.update(carregar_etapa(entrada, diretorio=diretorio, _chaves=chaves, _relatorio=_relatorio))
+    inicio = time.perf_counter()
+    saidas = etapa['calcular'](entradas)
+    if set(saidas) != set(etapa['saidas']):
+        raise ValueError(f"A etapa {nome} devolveu {sorted(saidas)}, mas declara {sorted(etapa['saidas'])}")
+
+    # Grava em um diretório temporário e renomeia, para nunca expor uma etapa pela metade
+    temporario = destino.with_name(f'.{destino.name}.tmp')
+    shutil.rmtree(temporario, ignore_errors=True)
+    temporario.mkdir(parents=True)
+    for saida, df in saidas.items():
+        df.to_parquet(temporario / f'{saida}.parquet', index=False)
+    shutil.rmtree(destino, ignore_errors=True)
+    temporario.rename(destino)
+    # Remove resultados de versões anteriores da etapa
+    for antigo in destino.parent.iterdir():
+        if antigo.is_dir() and antigo != destino and not antigo.name.startswith('.'):
+            shutil.rmtree(antigo, ignore_errors=True)
+
+    if _relatorio is not None:
+        _relatorio[nome] = ('calculada', time.perf_counter() - inicio)
+    return saidas
+
+
+def mapear_etapa(nome: str, diretorio: Path = DIRETORIO_PIPELINE, _chaves: dict | None = None) -> dict[str, pd.DataFrame]:
+    """
+    Saídas de uma etapa como visões somente leitura de arquivos Arrow mapeados em memória.
+
+    Na primeira chamada, grava uma cópia Arrow IPC (sem compressão) de cada saída ao lado do Parquet
+    da etapa. As colunas numéricas dos DataFrames devolvidos apontam direto para as páginas do
+    arquivo: não há cópia na leitura, e processos que mapeiam o mesmo arquivo dividem a mesma
+    memória (o cache de páginas do sistema). Os arrays não são graváveis, então qualquer tentativa
+    de modificar as tabelas no lugar falha em vez de alterar os dados de todos os leitores.
+
+    Args:
+        nome (str): Nome da etapa em REGISTRO_ETAPAS.
+        diretorio (Path): Raiz do cache das etapas.
+
+    Returns:
+        dict: Nome da saída -> DataFrame.
+    """
+    etapa = REGISTRO_ETAPAS[nome]
+    destino = Path(diretorio) / nome / chave_etapa(nome, _chaves)[:16]
+    faltantes = [saida for saida in etapa['saidas'] if not (destino / f'{saida}.arrow').exists()]
+    if faltantes:
+        saidas = carregar_etapa(nome, diretorio=diretorio, _chaves=_chaves)
+        for saida in faltantes:
+            tabela = pa.Table.from_pandas(saidas[saida], preserve_index=False)
+            temporario = destino / f'.{saida}.arrow.tmp'
+            with pa.OSFile(str(temporario), 'wb') as arquivo, pa.ipc.new_file(arquivo, tabela.schema) as escritor:
+                escritor.write_table(tabela)
+            os.replace(temporario, destino / f'{saida}.arrow')
+
+    mapeadas = {}
+    for saida in etapa['saidas']:
+        tabela = pa.ipc.open_file(pa.memory_map(str(destino / f'{saida}.arrow'))).read_all()
+        # Um bloco por coluna: sem a consolidação do pandas, as colunas numéricas sem nulos não são copiadas
+        mapeadas[saida] = tabela.to_pandas(split_blocks=True)
+    return mapeadas
+
+
+def _chave_instantaneo() -> str:
+    # O layout do instantâneo (campos dos cubos) é definido por cubo.py e consultas.py: editá-los invalida o arquivo
+    h = hashlib.sha256(f'v{VERSAO_PIPELINE}|instantaneo'.encode())
+    for modulo in (cubo, consultas):
+        h.update(inspect.getsource(modulo).encode())
+    return h.hexdigest()
+
+
+def carregar_instantaneo(diretorio: Path = DIRETORIO_PIPELINE) -> Consultas:
+    """
+    Camada de consultas sobre as tabelas mapeadas (ver mapear_etapa), pronta para o início do dashboard.
+
+    Os cubos e a versão dos dados ficam em um instantâneo (consultas-<hash>.npz) ao lado das saídas da
+    etapa 'tabelas', então um processo novo não refaz as agregações nem o hash das tabelas. O hash
+    no nome vem do código de cubo.py e consultas.py, que definem o layout gravado. O instantâneo
+    é gerado na primeira chamada ou antes, por `python pipeline.py`.
+
+    Args:
+        diretorio (Path): Raiz do cache das etapas.
+
+    Returns:
+        Consultas: Camada de consultas com as bases 'Ingressantes' e 'Concluintes'.
+    """
+    chaves = {}
+    saidas = mapear_etapa('tabelas', diretorio, _chaves=chaves)
+    tabelas = {'Ingressantes': saidas['ingressantes'], 'Concluintes': saidas['concluintes']}
+    caminho = Path(diretorio) / 'tabelas' / chaves['tabelas'][:16] / f'consultas-{_chave_instantaneo()[:16]}.npz'
+    if caminho.exists():
+        return Consultas.carregar(caminho, tabelas)
+
+    camada = Consultas(tabelas)
+    temporario = caminho.with_name(f'.{caminho.name}.tmp')
+    with open(temporario, 'wb') as arquivo:
+        camada.salvar(arquivo)
+    os.replace(temporario, caminho)
+    # Remove instantâneos gravados por versões anteriores do código
+    for antigo in caminho.parent.glob('consultas*.npz'):
+        if antigo != caminho:
+            antigo.unlink(missing_ok=True)
+    return camada
+
+
+def executar(nomes: list[str] | None = None, forcar: bool = False, diretorio: Path = DIRETORIO_PIPELINE) -> dict:
+    """
+    Garante que as etapas pedidas (e as suas entradas) estejam em cache.
+
+    Args:
+        nomes (list[str] | None): Etapas a executar. Se None, todas.
+        forcar (bool): Se True, recalcula todas as etapas pedidas.
+        diretorio (Path): Raiz do cache das etapas.
+
+    Returns:
+        dict: Etapa -> ('cache' ou 'calculada', segundos gastos no cálculo).
+    """
+    chaves, relatorio = {}, {}
+    for nome in (list(REGISTRO_ETAPAS) if nomes is None else nomes):
+        if nome not in relatorio or forcar:
+            carregar_etapa(nome, forcar, diretorio, _chaves=chaves, _relatorio=relatorio)
+    return relatorio
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Executa as etapas da análise, reaproveitando as que estão em cache.")
+    parser.add_argument('etapas', nargs='*', help=f"Etapas a executar (padrão: todas): {', '.join(REGISTRO_ETAPAS)}.")
+    parser.add_argument('--forcar', action='store_true', help="Recalcula as etapas pedidas mesmo que estejam em cache.")
+    args = parser.parse_args()
+    desconhecidas = [nome for nome in args.etapas if nome not in REGISTRO_ETAPAS]
+    if desconhecidas:
+        parser.error(f"etapas desconhecidas: {', '.join(desconhecidas)}")
+
+    for nome, (estado, segundos) in executar(args.etapas or None, args.forcar).items():
+        print(f"{nome:<16} {estado:<10} {segundos * 1000:10.1f} ms")
+    if not args.etapas or 'tabelas' in args.etapas:
+        # Deixa pronto o que o dashboard lê ao iniciar: tabelas em Arrow e o instantâneo da camada de consultas
+        inicio = time.perf_counter()
+        carregar_instantaneo()
+        print(f"{'instantaneo':<16} {'pronto':<10} {(time.perf_counter() - inicio) * 1000:10.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
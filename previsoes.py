@@ -0,0 +1,211 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cubo import serie_anual
+from dados import DIRETORIO_CACHE, graus_academicos
+from instrumentacao import cronometrado
+from regression import GRAUS_CANDIDATOS, RegressaoIncremental
+
+COLUNAS_PREVISAO = ['Total geral', 'Total geral publica', 'Total geral privada', 'Total presencial', 'Total geral remota']
+HORIZONTE_MAXIMO = 10
+CHAVE = ['Base', 'Graus', 'Ano inicio', 'Ano fim', 'Coluna']
+# Arrays comuns a todos os graus de uma série e arrays de cada grau
+COMPARTILHADOS = ['anos', 'observados']
+POR_GRAU = ['ajustados', 'previsoes', 'limite_inferior', 'limite_superior', 'coeficientes']
+METRICAS = ['rss', 'loo_rmse', 'aic', 'aicc', 'bic']
+# Estados da regressão incremental de cada (base, ano inicial, ano final), gravados ao lado do cache dos dados.
+# Um arquivo só (e não um diretório): atualizar_cache apaga os diretórios de versões anteriores da planilha
+CAMINHO_ESTADOS = DIRETORIO_CACHE / 'regressoes_incrementais.npz'
+# Versão do formato dos estados: arquivos de outra versão são ignorados
+VERSAO_ESTADOS = 1
+
+
+def chave_graus(graus) -> str:
+    """Chave canônica de um conjunto de graus acadêmicos (independe da ordem da seleção)."""
+    return '|'.join(sorted(graus))
+
+
+def _subconjuntos(graus: list[str]) -> list[tuple[str, ...]]:
+    return [c for k in range(1, len(graus) + 1) for c in itertools.combinations(graus, k)]
+
+
+def _confere(estado: RegressaoIncremental, anos: np.ndarray, valores: np.ndarray, nomes: list[str]) -> bool:
+    # O estado gravado vale se as séries, os anos e as observações são os de agora (o INEP pode revisar anos passados)
+    return (estado.grau_max == max(GRAUS_CANDIDATOS) and estado.nomes_series == nomes
+            and np.array_equal(estado.anos, anos) and np.array_equal(np.asarray(estado.valores), valores))
+
+
+def _previsoes_inicio(cubo: dict, ano_inicio: int, estados: dict) -> tuple[list[str], list, dict]:
+    # Todos os intervalos que começam em ano_inicio. O estado de (inicio, fim) é o de (inicio, fim - 1) mais uma
+    # atualização; estados gravados que ainda conferem com os dados são usados sem nenhuma atualização
+    combinacoes = _subconjuntos(graus_academicos(cubo['graus']))  # Os mesmos graus do filtro do dashboard
+    series = [serie_anual(cubo, ano_inicio, cubo['anos'][-1], graus, COLUNAS_PREVISAO) for graus in combinacoes]
+    anos = series[0]['Ano'].to_numpy()
+    valores = np.column_stack([df[COLUNAS_PREVISAO].to_numpy(dtype=np.float64) for df in series])
+    nomes = [f'{chave_graus(graus)}|{coluna}' for graus in combinacoes for coluna in COLUNAS_PREVISAO]
+
+    resultados, atualizados, anterior = [], {}, None
+    for k, ano_fim in enumerate(anos.tolist(), start=1):
+        estado = estados.get(ano_fim)
+        if estado is None or not _confere(estado, anos[:k], valores[:k], nomes):
+            if anterior is None:
+                # A base escalada cobre o período todo, para que as atualizações seguintes continuem bem condicionadas
+                estado = RegressaoIncremental(anos[:1], valores[:1], nomes, anos_escala=anos)
+            else:
+                estado = anterior.copiar()
+                estado.atualizar(ano_fim, valores[k - 1])
+        atualizados[ano_fim] = anterior = estado
+        resultados.append((ano_fim, estado.resultado(GRAUS_CANDIDATOS, HORIZONTE_MAXIMO)))
+    return [chave_graus(graus) for graus in combinacoes], resultados, atualizados
+
+
+def _tabela_intervalo(base: str, ano_inicio: int, ano_fim: int, graus: list[str], resultado: dict) -> pd.DataFrame:
+    # Achata o resultado (grau, ..., série) em linhas (série, grau), na ordem graus x colunas de _previsoes_inicio
+    g, s = len(resultado['graus']), resultado['observados'].shape[1]
+    n = len(resultado['anos'])
+    df = pd.DataFrame({
+        'Base': base, 'Graus': np.repeat(graus, len(COLUNAS_PREVISAO) * g), 'Ano inicio': ano_inicio, 'Ano fim': ano_fim,
+        'Coluna': np.tile(np.repeat(COLUNAS_PREVISAO, g), len(graus)), 'Grau': np.tile(resultado['graus'], s),
+    })
+    df['anos'] = [resultado['anos']] * (s * g)
+    df['observados'] = list(np.repeat(resultado['observados'].T, g, axis=0).reshape(s * g, n))
+    for nome in POR_GRAU:
+        df[nome] = list(np.moveaxis(resultado[nome], 2, 0).reshape(s * g, -1))
+    for nome in METRICAS:
+        df[nome] = resultado[nome].T.reshape(-1)
+    return df
+
+
+def calcular_previsoes(cubos: dict, max_workers: int | None = 1, estados: dict | None = None) -> pd.DataFrame:
+    """
+    Pré-calcula as previsões de todas as combinações de filtros da aba de previsão.
+
+    O espaço é finito: base x intervalo de anos x conjunto de graus x coluna x grau do polinômio.
+    O horizonte não entra na chave, pois as previsões de h anos são o prefixo das de HORIZONTE_MAXIMO.
+    Cada intervalo é uma RegressaoIncremental com todas as combinações de graus x colunas como séries:
+    o intervalo (inicio, fim) é o (inicio, fim - 1) mais um ano. Com os estados da execução anterior
+    (ver carregar_estados), um ano novo do INEP custa uma atualização por ano inicial, e os
+    intervalos já conhecidos saem dos fatores guardados. Com max_workers > 1 os anos iniciais são
+    distribuídos entre processos.
+
+    Args:
+        cubos (dict): Base ('Ingressantes'/'Concluintes') -> saída de montar_cubo.
+        max_workers (int | None): Número de processos. Se 1, calcula no processo atual; se None, usa todos os núcleos.
+        estados (dict | None): (base, ano inicial, ano final) -> RegressaoIncremental da execução anterior.
+            Atualizado no lugar com os estados de agora (os que não valem mais são descartados).
+
+    Returns:
+        pd.DataFrame: Uma linha por combinação, com as colunas de CHAVE, 'Grau', os arrays de
+        ajustar_polinomios (fatiados para a série) e as métricas.
+    """
+    estados = {} if estados is None else estados
+    tarefas = [(base, int(inicio)) for base, cubo in cubos.items() for inicio in cubo['anos']]
+    argumentos = [
+        (cubos[base], inicio, {fim: estado for (b, i, fim), estado in estados.items() if (b, i) == (base, inicio)})
+        for base, inicio in tarefas
+    ]
+    if max_workers == 1:
+        partes = [_previsoes_inicio(*args) for args in argumentos]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            partes = list(executor.map(_previsoes_inicio, *zip(*argumentos)))
+
+    estados.clear()
+    tabelas = []
+    for (base, inicio), (graus, resultados, atualizados) in zip(tarefas, partes):
+        estados.update({(base, inicio, fim): estado for fim, estado in atualizados.items()})
+        tabelas.extend(_tabela_intervalo(base, inicio, fim, graus, resultado) for fim, resultado in resultados)
+    return pd.concat(tabelas, ignore_index=True)
+
+
+def carregar_estados(caminho: Path = CAMINHO_ESTADOS) -> dict:
+    """
+    Estados gravados por salvar_estados.
+
+    Returns:
+        dict: (base, ano inicial, ano final) -> RegressaoIncremental. Vazio se o arquivo não existe ou é de outra versão.
+    """
+    try:
+        arquivo = np.load(caminho)
+    except FileNotFoundError:
+        return {}
+    with arquivo:
+        if 'versao' not in arquivo or int(arquivo['versao']) != VERSAO_ESTADOS:
+            return {}
+        campos = {}
+        for nome in arquivo.files:
+            if nome != 'versao':
+                base, inicio, fim, campo = nome.split('|')
+                campos.setdefault((base, int(inicio), int(fim)), {})[campo] = arquivo[nome]
+    return {chave: RegressaoIncremental.de_estado(estado) for chave, estado in campos.items()}
+
+
+def salvar_estados(estados: dict, caminho: Path = CAMINHO_ESTADOS) -> None:
+    """Grava os estados de calcular_previsoes em um único .npz (temporário renomeado ao final)."""
+    arrays = {'versao': np.array(VERSAO_ESTADOS)}
+    for (base, inicio, fim), estado in estados.items():
+        arrays.update({f'{base}|{inicio}|{fim}|{campo}': valor for campo, valor in estado.estado().items()})
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_name(f'.{caminho.name}.tmp')
+    with open(temporario, 'wb') as arquivo:
+        np.savez(arquivo, **arrays)
+    os.replace(temporario, caminho)
+
+
+def indexar_previsoes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Indexa a tabela pela chave de filtro e pelo grau, para consultas diretas com .loc.
+
+    Args:
+        df (pd.DataFrame): Saída de calcular_previsoes (etapa 'previsoes' do pipeline).
+
+    Returns:
+        pd.DataFrame: A mesma tabela com MultiIndex ordenado (CHAVE + 'Grau').
+    """
+    return df.set_index(CHAVE + ['Grau']).sort_index()
+
+
+@cronometrado
+def consultar_previsao(indice: pd.DataFrame | None, base: str, graus, ano_inicio: int, ano_fim: int, coluna: str,
+                       anos_para_prever: int) -> dict | None:
+    """
+    Busca as previsões pré-calculadas de um filtro, no mesmo formato de ajustar_polinomios com uma série.
+
+    Args:
+        indice (pd.DataFrame | None): Saída de indexar_previsoes, ou None se a etapa 'previsoes' não foi gerada.
+        base (str): 'Ingressantes' ou 'Concluintes'.
+        graus (iterable): Graus acadêmicos selecionados.
+        ano_inicio (int): Primeiro ano do período.
+        ano_fim (int): Último ano do período.
+        coluna (str): Coluna prevista.
+        anos_para_prever (int): Horizonte (até HORIZONTE_MAXIMO).
+
+    Returns:
+        dict | None: Resultado pronto para tabela_ajustes/tabela_metricas, ou None se o filtro não foi pré-calculado.
+    """
+    chave = (base, chave_graus(graus), ano_inicio, ano_fim, coluna)
+    # Chave parcial (sem 'Grau') em um MultiIndex ordenado: busca binária, sem montar outro índice
+    if indice is None or anos_para_prever > HORIZONTE_MAXIMO or chave not in indice.index:
+        return None
+    bloco = indice.loc[chave]
+    h = anos_para_prever
+    anos = np.asarray(bloco['anos'].iloc[0], dtype=np.float64)
+    resultado = {
+        'graus': bloco.index.tolist(), 'ano_inicial': anos[0], 'anos': anos,
+        'observados': np.asarray(bloco['observados'].iloc[0], dtype=np.float64)[:, None],
+        'anos_futuros': anos[-1] + np.arange(1, h + 1),
+    }
+    for nome in POR_GRAU:
+        resultado[nome] = np.stack([np.asarray(v, dtype=np.float64) for v in bloco[nome]])[:, :, None]
+    for nome in ['previsoes', 'limite_inferior', 'limite_superior']:
+        resultado[nome] = resultado[nome][:, :h]
+    for nome in METRICAS:
+        resultado[nome] = bloco[nome].to_numpy()[:, None]
+    return resultado
+
@@ -0,0 +1,176 @@
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cubo import serie_anual
+from instrumentacao import cronometrado
+from dados import graus_academicos
+from previsoes import COLUNAS_PREVISAO, HORIZONTE_MAXIMO, _subconjuntos, chave_graus
+from regression import GRAUS_CANDIDATOS, ajustar_polinomios, melhor_grau
+
+# Backtest com origem móvel: treina com os primeiros TREINO_MINIMO anos ou mais e prevê até HORIZONTE_BACKTEST anos à frente
+TREINO_MINIMO = 5
+HORIZONTE_BACKTEST = 3
+# Métrica usada para escolher o melhor modelo de cada série
+CRITERIO = 'RMSE'
+METRICAS_ERRO = ['MAE', 'RMSE', 'MAPE (%)']
+
+
+# --- Modelos ---
+# Cada função recebe os anos e os valores observados (arrays (n,), em ordem) e o horizonte,
+# e devolve as previsões dos próximos `horizonte` anos, shape (horizonte,).
+# O statsmodels é importado dentro das funções: é pesado e só é usado no cálculo do backtest.
+# Os avisos são silenciados depois da importação, que registra o próprio filtro 'always' para eles.
+
+def _prever_polinomial(anos: np.ndarray, valores: np.ndarray, horizonte: int) -> np.ndarray:
+    # O mesmo modelo da aba de previsão: grau escolhido pelo menor erro leave-one-out na janela de treino
+    resultado = ajustar_polinomios(anos, valores, GRAUS_CANDIDATOS, horizonte)
+    return resultado['previsoes'][GRAUS_CANDIDATOS.index(int(melhor_grau(resultado)[0])), :, 0]
+
+
+def _prever_holt(anos: np.ndarray, valores: np.ndarray, horizonte: int) -> np.ndarray:
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+    modelo = ExponentialSmoothing(valores, trend='add', damped_trend=True, initialization_method='estimated')
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # Avisos de convergência em séries curtas
+        return np.asarray(modelo.fit().forecast(horizonte))
+
+
+def _prever_arima(anos: np.ndarray, valores: np.ndarray, horizonte: int) -> np.ndarray:
+    from statsmodels.tsa.arima.model import ARIMA
+
+    # Com d = 1, trend='t' é a deriva (crescimento médio por ano) da série diferenciada
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # Avisos de convergência em séries curtas
+        return np.asarray(ARIMA(valores, order=(1, 1, 0), trend='t').fit().forecast(horizonte))
+
+
+# --- Registro de Modelos ---
+# Cada modelo declara:
+#   prever: função de previsão (ver acima)
+#   descricao: texto exibido no dashboard
+REGISTRO_MODELOS = {
+    'Polinomial': {'prever': _prever_polinomial,
+                   'descricao': "Polinômio com o grau escolhido por validação cruzada leave-one-out"},
+    'Holt': {'prever': _prever_holt, 'descricao': "Suavização exponencial de Holt com tendência amortecida"},
+    'ARIMA': {'prever': _prever_arima, 'descricao': "ARIMA(1,1,0) com deriva"},
+}
+
+
+def backtest(anos, valores, prever, horizonte: int = HORIZONTE_BACKTEST, treino_minimo: int = TREINO_MINIMO) -> pd.DataFrame:
+    """
+    Avaliação com origem móvel: para cada ano de corte, ajusta com os anos até ele e prevê os seguintes.
+
+    Args:
+        anos (array-like): Anos observados, shape (n,), em ordem.
+        valores (array-like): Valores observados, shape (n,).
+        prever (callable): Função de previsão de um modelo (ver REGISTRO_MODELOS).
+        horizonte (int): Maior número de anos previstos a partir de cada origem.
+        treino_minimo (int): Número de anos da menor janela de treino.
+
+    Returns:
+        pd.DataFrame: Uma linha por origem e horizonte, com 'Origem' (último ano de treino),
+        'Horizonte', 'Ano', 'Previsto' e 'Observado'.
+    """
+    anos = np.asarray(anos, dtype=np.float64)
+    valores = np.asarray(valores, dtype=np.float64)
+    partes = []
+    for corte in range(treino_minimo, len(anos)):
+        h = min(horizonte, len(anos) - corte)
+        partes.append(pd.DataFrame({
+            'Origem': int(anos[corte - 1]), 'Horizonte': np.arange(1, h + 1), 'Ano': anos[corte:corte + h].astype(int),
+            'Previsto': prever(anos[:corte], valores[:corte], h), 'Observado': valores[corte:corte + h],
+        }))
+    colunas = ['Origem', 'Horizonte', 'Ano', 'Previsto', 'Observado']
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=colunas)
+
+
+def metricas_erro(df_backtest: pd.DataFrame) -> dict[str, float]:
+    """MAE, RMSE e MAPE (%) de um backtest (saída de backtest)."""
+    erro = df_backtest['Previsto'].to_numpy(dtype=np.float64) - df_backtest['Observado'].to_numpy(dtype=np.float64)
+    if len(erro) == 0:
+        return {nome: np.nan for nome in METRICAS_ERRO}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentual = np.abs(erro) / np.abs(df_backtest['Observado'].to_numpy(dtype=np.float64)) * 100
+    return {
+        'MAE': float(np.mean(np.abs(erro))),
+        'RMSE': float(np.sqrt(np.mean(erro ** 2))),
+        'MAPE (%)': float(np.nanmean(np.where(np.isfinite(percentual), percentual, np.nan))) if np.isfinite(percentual).any() else np.nan,
+    }
+
+
+def _avaliar(anos: np.ndarray, valores: np.ndarray, modelo: str) -> dict:
+    # Backtest e ajuste final (com todos os anos) de um modelo em uma série; roda nos processos do executor
+    prever = REGISTRO_MODELOS[modelo]['prever']
+    try:
+        metricas = metricas_erro(backtest(anos, valores, prever))
+        previsao = prever(anos, valores, HORIZONTE_MAXIMO)
+    except (ValueError, np.linalg.LinAlgError):
+        # Série que o modelo não consegue ajustar (ex: constante): fica sem métricas e nunca é a melhor
+        metricas, previsao = {nome: np.nan for nome in METRICAS_ERRO}, np.full(HORIZONTE_MAXIMO, np.nan)
+    return {**metricas, 'previsoes': np.asarray(previsao, dtype=np.float64)}
+
+
+@cronometrado
+def avaliar_modelos(cubos: dict, modelos: list[str] | None = None, max_workers: int | None = None) -> pd.DataFrame:
+    """
+    Avalia todos os modelos em todas as séries da aba de previsão, com backtest de origem móvel.
+
+    As séries são base x conjunto de graus acadêmicos x coluna de COLUNAS_PREVISAO, no período
+    completo de cada base. Cada par (série, modelo) é uma tarefa independente, distribuída entre
+    processos: os ajustes do statsmodels são lentos demais para rodar em série a cada execução.
+
+    Args:
+        cubos (dict): Base ('Ingressantes'/'Concluintes') -> saída de montar_cubo.
+        modelos (list[str] | None): Modelos de REGISTRO_MODELOS a avaliar. Se None, todos.
+        max_workers (int | None): Número de processos. Se 1, calcula no processo atual; se None, usa todos os núcleos.
+
+    Returns:
+        pd.DataFrame: Uma linha por série e modelo, com 'Base', 'Graus', 'Coluna', 'Modelo', as métricas
+        de METRICAS_ERRO, 'previsoes' (HORIZONTE_MAXIMO anos após o último ano, ajustado com todos os anos),
+        'Ano fim' e 'Melhor' (menor CRITERIO da série).
+    """
+    modelos = list(REGISTRO_MODELOS) if modelos is None else modelos
+    series = []
+    for base, cubo in cubos.items():
+        for graus in _subconjuntos(graus_academicos(cubo['graus'])):
+            serie = serie_anual(cubo, cubo['anos'][0], cubo['anos'][-1], graus, COLUNAS_PREVISAO)
+            for coluna in COLUNAS_PREVISAO:
+                series.append((base, chave_graus(graus), coluna, serie['Ano'].to_numpy(), serie[coluna].to_numpy()))
+
+    tarefas = [(serie, modelo) for serie in series for modelo in modelos]
+    argumentos = [(anos, valores, modelo) for (_, _, _, anos, valores), modelo in tarefas]
+    if max_workers == 1:
+        resultados = [_avaliar(*args) for args in argumentos]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            resultados = list(executor.map(_avaliar, *zip(*argumentos), chunksize=8))
+
+    df = pd.DataFrame([
+        {'Base': base, 'Graus': graus, 'Coluna': coluna, 'Modelo': modelo, 'Ano fim': int(anos[-1]), **resultado}
+        for ((base, graus, coluna, anos, _), modelo), resultado in zip(tarefas, resultados)
+    ])
+    # Séries sem nenhum modelo avaliável não têm melhor modelo
+    criterio = df[CRITERIO].fillna(np.inf)
+    df['Melhor'] = (criterio == criterio.groupby([df['Base'], df['Graus'], df['Coluna']]).transform('min')) & np.isfinite(criterio)
+    return df
+
+
+def consultar_modelos(df_modelos: pd.DataFrame, base: str, graus, coluna: str) -> pd.DataFrame:
+    """
+    Resultados do backtest de uma série, do melhor para o pior modelo.
+
+    Args:
+        df_modelos (pd.DataFrame): Saída de avaliar_modelos.
+        base (str): 'Ingressantes' ou 'Concluintes'.
+        graus (iterable): Graus acadêmicos selecionados.
+        coluna (str): Coluna prevista.
+
+    Returns:
+        pd.DataFrame: Linhas da série (vazio se a combinação não foi avaliada).
+    """
+    filtro = (df_modelos['Base'] == base) & (df_modelos['Graus'] == chave_graus(graus)) & (df_modelos['Coluna'] == coluna)
+    return df_modelos[filtro].sort_values(CRITERIO, na_position='last', ignore_index=True)
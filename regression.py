@@ -1,80 +1,487 @@
+import logging
 import pandas as pd
 import numpy as np
+from math import comb
 
-def regressao_polinomial(df_historico: pd.DataFrame, anos_para_prever: int, grau: int, mostrar_curva: bool) -> tuple[pd.DataFrame, np.ndarray]:
+from instrumentacao import cronometrado
+
+GRAUS_CANDIDATOS = [1, 2, 3, 4, 5]
+# Reamostragens do bootstrap dos resíduos (bandas_bootstrap)
+REAMOSTRAGENS = 2000
+
+_logger = logging.getLogger(__name__)
+
+
+def _escala(x: np.ndarray) -> tuple[float, float]:
+    # Centro e meia-amplitude que levam os anos para o intervalo [-1, 1] (melhora o condicionamento)
+    centro = (x.max() + x.min()) / 2
+    escala = (x.max() - x.min()) / 2 or 1.0
+    return centro, escala
+
+
+def _para_base_original(coef_t: np.ndarray, centro: float, escala: float) -> np.ndarray:
+    """
+    Converte coeficientes na variável escalada t = (u - centro) / escala para a variável u.
+
+    Args:
+        coef_t (np.ndarray): Coeficientes (grau + 1, ...) em potências crescentes de t.
+        centro (float): Centro usado na escala.
+        escala (float): Meia-amplitude usada na escala.
+
+    Returns:
+        np.ndarray: Coeficientes com a mesma forma, em potências crescentes de u.
+    """
+    p = coef_t.shape[0]
+    # (u - c)^j / e^j = sum_i C(j, i) u^i (-c)^(j - i) / e^j
+    conversao = np.zeros((p, p))
+    for j in range(p):
+        for i in range(j + 1):
+            conversao[i, j] = comb(j, i) * (-centro) ** (j - i) / escala ** j
+    return np.tensordot(conversao, coef_t, axes=(1, 0))
+
+
+@cronometrado
+def ajustar_polinomios(anos, valores, graus=GRAUS_CANDIDATOS, anos_para_prever: int = 0, nivel: float = 0.95) -> dict:
+    """
+    Ajusta, de uma só vez, polinômios de vários graus a várias séries com os mesmos anos.
+
+    Usa uma única fatoração QR da matriz de Vandermonde do maior grau, com os anos escalados
+    para [-1, 1]. Como as primeiras k + 1 colunas de Q e o bloco k + 1 x k + 1 de R formam a QR
+    da matriz do grau k, todos os graus saem da mesma fatoração, sem montar X.T @ X.
+
+    A mesma fatoração fornece as métricas de seleção de grau em forma fechada: a diagonal da
+    matriz chapéu é a soma acumulada de Q², o que dá o erro de validação cruzada leave-one-out
+    sem n reajustes, e R dá a alavancagem dos anos futuros para os intervalos de previsão.
+
+    Args:
+        anos (array-like): Anos observados, shape (n,).
+        valores (array-like): Séries observadas, shape (n,) ou (n, s) com uma série por coluna.
+        graus (list[int]): Graus do polinômio a ajustar.
+        anos_para_prever (int): Número de anos futuros a prever após o último ano.
+        nivel (float): Nível de confiança dos intervalos de previsão.
+
+    Returns:
+        dict: 'graus' (g,), 'ano_inicial', 'anos' (n,) ordenados, 'observados' (n, s) na mesma ordem, 'anos_futuros' (h,),
+        'coeficientes' (g, max(graus) + 1, s) em potências de (ano - ano_inicial), com zeros acima de cada grau,
+        'ajustados' (g, n, s) e 'previsoes' (g, h, s); as métricas 'rss', 'loo_rmse', 'aic', 'aicc' e 'bic' (g, s)
+        e os intervalos 'limite_inferior' e 'limite_superior' (g, h, s). Graus sem pontos suficientes ficam com NaN.
+    """
+    anos = np.asarray(anos, dtype=np.float64)
+    Y = np.asarray(valores, dtype=np.float64)
+    Y = Y.reshape(len(anos), -1)
+    graus = list(graus)
+
+    ordem = np.argsort(anos, kind='stable')
+    anos, Y = anos[ordem], Y[ordem]
+    centro, escala = _escala(anos - anos[0])
+    V = ((anos - anos[0] - centro) / escala)[:, None] ** np.arange(max(graus) + 1)
+    Q, R = np.linalg.qr(V)
+    return _ajustes_qr(anos, Y, graus, anos_para_prever, nivel, anos[0], centro, escala, Q, R, Q.T @ Y)
+
+
+def _ajustes_qr(anos: np.ndarray, Y: np.ndarray, graus: list[int], anos_para_prever: int, nivel: float,
+                ano_inicial: float, centro: float, escala: float, Q: np.ndarray, R: np.ndarray, QtY: np.ndarray) -> dict:
+    # Coeficientes, métricas e intervalos de todos os graus a partir da QR da Vandermonde do maior grau.
+    # Q pode ter menos colunas que R (menos anos que coeficientes, ou colunas dependentes): os graus além dele ficam com NaN
+    from scipy import stats  # Importação pesada (~0,5 s): adiada para fora do início a frio do dashboard
+
+    grau_max = max(graus)
+    u = anos - ano_inicial
+    anos_futuros = anos[-1] + np.arange(1, anos_para_prever + 1)
+    u_futuro = anos_futuros - ano_inicial
+    potencias = np.arange(grau_max + 1)
+    V = ((u - centro) / escala)[:, None] ** potencias
+    V_futuro = ((u_futuro - centro) / escala)[:, None] ** potencias
+    diagonal = np.abs(np.diag(R))
+
+    n, s = Y.shape
+    coeficientes = np.full((len(graus), grau_max + 1, s), np.nan)
+    ajustados = np.full((len(graus), n, s), np.nan)
+    previsoes = np.full((len(graus), len(anos_futuros), s), np.nan)
+    metricas = {nome: np.full((len(graus), s), np.nan) for nome in ('rss', 'loo_rmse', 'aic', 'aicc', 'bic')}
+    limite_inferior = np.full_like(previsoes, np.nan)
+    limite_superior = np.full_like(previsoes, np.nan)
+    # Diagonal da matriz chapéu de cada grau: soma acumulada dos quadrados das colunas de Q
+    alavancas = np.cumsum(Q ** 2, axis=1)
+    for g, grau in enumerate(graus):
+        p = grau + 1
+        # Sem pontos suficientes ou coluna dependente: o grau não é identificável
+        if p > n or p > Q.shape[1] or diagonal[:p].min() <= 1e-10 * diagonal[0]:
+            continue
+        coef_t = np.linalg.solve(R[:p, :p], QtY[:p])
+        ajustados[g] = V[:, :p] @ coef_t
+        previsoes[g] = V_futuro[:, :p] @ coef_t
+        coeficientes[g] = 0.0
+        coeficientes[g, :p] = _para_base_original(coef_t, centro, escala)
+
+        residuos = Y - ajustados[g]
+        rss = (residuos ** 2).sum(axis=0)
+        log_verossimilhanca = n * np.log(np.maximum(rss, np.finfo(float).tiny) / n)
+        metricas['rss'][g] = rss
+        metricas['aic'][g] = log_verossimilhanca + 2 * p
+        metricas['bic'][g] = log_verossimilhanca + p * np.log(n)
+        graus_liberdade = n - p
+        if graus_liberdade <= 0:
+            continue  # Interpolação exata: não há resíduo para estimar o erro
+        if graus_liberdade > 1:
+            metricas['aicc'][g] = metricas['aic'][g] + 2 * p * (p + 1) / (graus_liberdade - 1)
+        metricas['loo_rmse'][g] = np.sqrt(np.mean((residuos / (1 - alavancas[:, p - 1])[:, None]) ** 2, axis=0))
+
+        # Intervalo de previsão: y0 +- t * sigma * sqrt(1 + x0' (X'X)^-1 x0), com (X'X)^-1 = R^-1 R^-T
+        W = np.linalg.solve(R[:p, :p].T, V_futuro[:, :p].T)
+        alavanca_futura = (W ** 2).sum(axis=0)
+        margem = stats.t.ppf(0.5 + nivel / 2, graus_liberdade) * np.sqrt(np.outer(1 + alavanca_futura, rss / graus_liberdade))
+        limite_inferior[g] = previsoes[g] - margem
+        limite_superior[g] = previsoes[g] + margem
+
+    return {
+        'graus': graus, 'ano_inicial': ano_inicial, 'anos': anos, 'observados': Y, 'anos_futuros': anos_futuros,
+        'coeficientes': coeficientes, 'ajustados': ajustados, 'previsoes': previsoes,
+        'limite_inferior': limite_inferior, 'limite_superior': limite_superior, **metricas,
+    }
+
+
+@cronometrado
+def bandas_bootstrap(anos, valores, grau: int, anos_para_prever: int, reamostragens: int = REAMOSTRAGENS,
+                     nivel: float = 0.95, semente: int = 0) -> dict:
+    """
+    Bandas de previsão por bootstrap dos resíduos para um polinômio, sem laço de reajustes.
+
+    Cada reamostragem soma ao ajuste resíduos sorteados com reposição (centrados e corrigidos pela
+    alavancagem) e reajusta o polinômio. Como a matriz de Vandermonde é a mesma em todas, os B
+    reajustes são um único solve com o fator R da QR, com as B séries reamostradas empilhadas como colunas.
+    Cada previsão reamostrada recebe ainda um resíduo sorteado (o erro do próprio ano futuro), então
+    a banda é de previsão, não só de confiança da curva. Não supõe resíduos normais, ao contrário
+    dos intervalos de ajustar_polinomios.
+
+    Args:
+        anos (array-like): Anos observados, shape (n,).
+        valores (array-like): Séries observadas, shape (n,) ou (n, s) com uma série por coluna.
+        grau (int): Grau do polinômio.
+        anos_para_prever (int): Número de anos futuros a prever após o último ano.
+        reamostragens (int): Número de reamostragens B.
+        nivel (float): Nível da banda (percentis centrais das previsões reamostradas).
+        semente (int): Semente do gerador aleatório (bandas iguais para os mesmos dados).
+
+    Returns:
+        dict: 'anos_futuros' (h,), 'previsoes' (h, s) do ajuste original e 'limite_inferior' e
+        'limite_superior' (h, s). Sem graus de liberdade para os resíduos, os limites ficam com NaN
+        (e também as previsões, se os pontos não bastam para o grau).
+    """
+    anos = np.asarray(anos, dtype=np.float64)
+    Y = np.asarray(valores, dtype=np.float64).reshape(len(anos), -1)
+    ordem = np.argsort(anos, kind='stable')
+    anos, Y = anos[ordem], Y[ordem]
+    n, s = Y.shape
+    p = grau + 1
+    anos_futuros = anos[-1] + np.arange(1, anos_para_prever + 1)
+    if p > n:  # Pontos insuficientes para o grau
+        vazio = np.full((len(anos_futuros), s), np.nan)
+        return {'anos_futuros': anos_futuros, 'previsoes': vazio, 'limite_inferior': vazio.copy(), 'limite_superior': vazio.copy()}
+
+    # Mesma base escalada de ajustar_polinomios
+    u = anos - anos[0]
+    centro, escala = _escala(u)
+    V = ((u - centro) / escala)[:, None] ** np.arange(p)
+    V_futuro = ((anos_futuros - anos[0] - centro) / escala)[:, None] ** np.arange(p)
+    Q, R = np.linalg.qr(V)
+    ajustados = Q @ (Q.T @ Y)
+    previsoes = V_futuro @ np.linalg.solve(R, Q.T @ Y)
+    if n <= p:
+        vazio = np.full_like(previsoes, np.nan)
+        return {'anos_futuros': anos_futuros, 'previsoes': previsoes, 'limite_inferior': vazio, 'limite_superior': vazio.copy()}
+
+    # Resíduos corrigidos pela alavancagem (r / sqrt(1 - h)) e centrados: a variância fica próxima da do erro
+    alavancas = (Q ** 2).sum(axis=1)
+    residuos = (Y - ajustados) / np.sqrt(1 - np.minimum(alavancas, 1 - 1e-12))[:, None]
+    residuos -= residuos.mean(axis=0)
+
+    rng = np.random.default_rng(semente)
+    sorteio = rng.integers(0, n, size=(n, reamostragens))
+    # (n, B, s): série ajustada mais resíduos sorteados de cada série; o solve trata as B * s colunas de uma vez
+    Y_reamostrado = ajustados[:, None, :] + residuos[sorteio]
+    coeficientes = np.linalg.solve(R, Q.T @ Y_reamostrado.reshape(n, -1))
+    previsoes_reamostradas = (V_futuro @ coeficientes).reshape(len(anos_futuros), reamostragens, s)
+    previsoes_reamostradas += residuos[rng.integers(0, n, size=(len(anos_futuros), reamostragens))]
+
+    limite_inferior, limite_superior = np.quantile(previsoes_reamostradas, [0.5 - nivel / 2, 0.5 + nivel / 2], axis=1)
+    return {'anos_futuros': anos_futuros, 'previsoes': previsoes,
+            'limite_inferior': limite_inferior, 'limite_superior': limite_superior}
+
+
+@cronometrado
+def melhor_grau(resultado: dict, criterio: str = 'loo_rmse') -> np.ndarray:
+    """
+    Escolhe, para cada série, o grau com o menor valor do critério.
+
+    Args:
+        resultado (dict): Saída de ajustar_polinomios.
+        criterio (str): 'loo_rmse', 'aic', 'aicc' ou 'bic'.
+
+    Returns:
+        np.ndarray: Grau escolhido para cada série, shape (s,). Séries sem nenhum grau avaliável recebem o menor grau.
+    """
+    valores = np.where(np.isnan(resultado[criterio]), np.inf, resultado[criterio])
+    return np.asarray(resultado['graus'])[np.argmin(valores, axis=0)]
+
+
+@cronometrado
+def tabela_metricas(resultado: dict, nomes_series: list[str] | None = None) -> pd.DataFrame:
+    """
+    Monta um DataFrame (Série, Grau, RSS, Erro LOO (RMSE), AIC, AICc, BIC) a partir de ajustar_polinomios.
+
+    Args:
+        resultado (dict): Saída de ajustar_polinomios.
+        nomes_series (list[str] | None): Nome de cada série. Se None, usa 0, 1, 2, ...
+
+    Returns:
+        pd.DataFrame: Uma linha por série e grau.
+    """
+    g, s = resultado['rss'].shape
+    nomes_series = list(range(s)) if nomes_series is None else list(nomes_series)
+    return pd.DataFrame({
+        'Série': np.tile(nomes_series, g),
+        'Grau': np.repeat(resultado['graus'], s),
+        'RSS': resultado['rss'].reshape(-1),
+        'Erro LOO (RMSE)': resultado['loo_rmse'].reshape(-1),
+        'AIC': resultado['aic'].reshape(-1),
+        'AICc': resultado['aicc'].reshape(-1),
+        'BIC': resultado['bic'].reshape(-1),
+    })
+
+
+@cronometrado
+def tabela_ajustes(resultado: dict, nomes_series: list[str] | None = None, mostrar_curva: bool = True) -> pd.DataFrame:
+    """
+    Monta um DataFrame longo (Série, Grau, Ano, Tipo, Valor) a partir de ajustar_polinomios.
+
+    Args:
+        resultado (dict): Saída de ajustar_polinomios.
+        nomes_series (list[str] | None): Nome de cada série. Se None, usa 0, 1, 2, ...
+        mostrar_curva (bool): Se True, inclui a curva ajustada sobre os anos históricos.
+
+    Returns:
+        pd.DataFrame: Uma linha por série, grau, ano e tipo ('Histórico', 'Ajuste Polinomial', 'Previsão Polinomial').
+    """
+    graus, anos, anos_futuros = resultado['graus'], resultado['anos'], resultado['anos_futuros']
+    g, n, s = resultado['ajustados'].shape
+    nomes_series = list(range(s)) if nomes_series is None else list(nomes_series)
+
+    # Blocos (grau, ano, série) achatados na mesma ordem
+    blocos = [('Histórico', np.broadcast_to(resultado['observados'], (g, n, s)), anos)]
+    if mostrar_curva:
+        blocos.append(('Ajuste Polinomial', resultado['ajustados'], anos))
+    blocos.append(('Previsão Polinomial', resultado['previsoes'], anos_futuros))
+
+    partes = []
+    for tipo, bloco, anos_bloco in blocos:
+        m = len(anos_bloco)
+        partes.append(pd.DataFrame({
+            'Série': np.tile(nomes_series, g * m),
+            'Grau': np.repeat(graus, m * s),
+            'Ano': np.tile(np.repeat(anos_bloco, s), g),
+            'Tipo': tipo,
+            'Valor': bloco.reshape(-1),
+        }))
+    return pd.concat(partes, ignore_index=True)
+
+
+@cronometrado
+def regressao_polinomial(df_historico: pd.DataFrame, anos_para_prever: int, grau: int, mostrar_curva: bool,
+                         reamostragens: int = 0) -> tuple[pd.DataFrame, np.ndarray]:
     """
     Prevê tendências futuras com base em dados históricos usando regressão polinomial
-    calculada manualmente através da Equação Normal.
+    por mínimos quadrados (fatoração QR, ver ajustar_polinomios).
 
     Args:
         df_historico (pd.DataFrame): DataFrame com colunas 'Ano' e 'Total geral'.
         anos_para_prever (int): Número de anos para prever no futuro.
         grau (int): O grau do polinômio a ser ajustado (ex: 1 para linear, 2 para quadrática).
         mostrar_curva (bool): Se True, mostra a curva ajustada nos dados históricos.
+        reamostragens (int): Se maior que zero, acrescenta as colunas 'Limite inferior' e 'Limite superior'
+            (banda de 95% por bootstrap dos resíduos, ver bandas_bootstrap) nas linhas de previsão.
 
     Returns:
         tuple: Um DataFrame com os anos previstos e seus totais, e um array com os coeficientes do polinômio.
     """
-    df_limpo = df_historico[['Ano', 'Total geral']].copy().sort_values(by='Ano').reset_index(drop=True)
-
-    x_hist = df_limpo['Ano'].values
-    y_hist = df_limpo['Total geral'].values
-
-    x_hist = np.array(x_hist, dtype=np.float64)
-    y_hist = np.array(y_hist, dtype=np.float64)
-
-    # Matriz de Design (X)
-    # Normalizar o ano para evitar problemas numéricos
-    ano_inicial = df_limpo['Ano'].min()
-    x_hist_normalizado = df_limpo['Ano'].values - ano_inicial 
-    y_hist = df_limpo['Total geral'].values
-    # Cada coluna é x elevado a uma potência, de 0 até o grau do polinômio.
-    X_hist_matrix = np.column_stack([x_hist_normalizado**p for p in range(grau + 1)])
-
-    # Equação Normal para encontrar os coeficientes (beta)
-    # beta = inv(X.T * X) * X.T * y
-    try:
-        xt = X_hist_matrix.T
-        xtx = xt @ X_hist_matrix # Multiplicação de matrizes
-        xtx_inv = np.linalg.inv(xtx) # Inversa da matriz
-        xty = xt @ y_hist
-        beta = xtx_inv @ xty
-    except np.linalg.LinAlgError:
-        # Caso a matriz seja singular (não inversível), retorna um DataFrame vazio e um array vazio
-        # Isso pode acontecer se o grau do polinômio for muito alto ou se os dados forem insuficientes.
-        # O usuário deve ser avisado para tentar um grau menor ou verificar os dados.
-        print("Erro: A matriz X.T * X é singular e não pode ser invertida. Tente um grau menor ou verifique os dados.")
+    df_limpo = df_historico[['Ano', 'Total geral']].sort_values(by='Ano')
+    x_hist = df_limpo['Ano'].to_numpy(dtype=np.float64)
+    y_hist = df_limpo['Total geral'].to_numpy(dtype=np.float64)
+
+    resultado = ajustar_polinomios(x_hist, y_hist, [grau], anos_para_prever)
+    beta = resultado['coeficientes'][0, :, 0]
+    if np.isnan(beta).any():
+        # Pontos insuficientes para o grau pedido: o usuário deve tentar um grau menor ou verificar os dados.
+        _logger.warning("Não há pontos suficientes (%d anos) para ajustar um polinômio de grau %d. "
+                        "Tente um grau menor ou verifique os dados.", len(x_hist), grau)
         return pd.DataFrame(), np.array([])
 
-    # Fazer previsões
-    # Gerar os anos futuros
-    ultimo_ano = x_hist[-1]
-    anos_futuros = np.array([ultimo_ano + i + 1 for i in range(anos_para_prever)])
+    df_final = tabela_ajustes(resultado, mostrar_curva=mostrar_curva)
+    df_final = df_final[['Ano', 'Valor', 'Tipo']].rename(columns={'Valor': 'Total geral'})
+    if reamostragens > 0:
+        bandas = bandas_bootstrap(x_hist, y_hist, grau, anos_para_prever, reamostragens)
+        previsao = (df_final['Tipo'] == 'Previsão Polinomial').to_numpy()
+        for coluna, chave in (('Limite inferior', 'limite_inferior'), ('Limite superior', 'limite_superior')):
+            df_final[coluna] = np.nan
+            df_final.loc[previsao, coluna] = bandas[chave][:, 0]
+    return df_final, beta
+
+
+class RegressaoIncremental:
+    """
+    Regressão polinomial atualizável, que incorpora novos anos sem refazer a fatoração do histórico.
+
+    Guarda o fator R (triangular superior) da QR da matriz de Vandermonde do maior grau, o vetor
+    Q.T @ y de cada série, a soma de y² e as observações. Um novo ano entra por rotações de Givens
+    em O(grau²) por série. Como o bloco inicial de R é o fator do grau menor, todos os graus de 1
+    até grau_max são mantidos pelo mesmo estado. As observações não entram na atualização: servem
+    para os resíduos das métricas de resultado e para conferir se o histórico foi revisto.
+
+    Args:
+        anos (array-like): Anos já observados, shape (n,), em ordem.
+        valores (array-like): Séries observadas, shape (n,) ou (n, s).
+        nomes_series (list[str] | None): Nome de cada série.
+        grau_max (int): Maior grau de polinômio mantido.
+        anos_escala (array-like | None): Anos que fixam a base escalada (ver _escala). Se None, os próprios `anos`;
+            passe o período esperado quando o estado começa com poucos anos e recebe os demais por atualizar.
+    """
+
+    def __init__(self, anos, valores, nomes_series: list[str] | None = None, grau_max: int = max(GRAUS_CANDIDATOS),
+                 anos_escala=None):
+        anos = np.asarray(anos, dtype=np.float64)
+        Y = np.asarray(valores, dtype=np.float64).reshape(len(anos), -1)
+        s = Y.shape[1]
+        p = grau_max + 1
+
+        self.grau_max = grau_max
+        self.nomes_series = list(range(s)) if nomes_series is None else list(nomes_series)
+        # A base escalada é fixada na criação; anos novos apenas ficam fora de [-1, 1]
+        anos_escala = anos if anos_escala is None else np.asarray(anos_escala, dtype=np.float64)
+        self.ano_inicial = float(anos[0])
+        self.centro, self.escala = _escala(anos_escala - self.ano_inicial)
+        self.R = np.zeros((p, p))
+        self.z = np.zeros((p, s))
+        self.soma_y2 = np.zeros(s)
+        self.anos = []
+        self.valores = []
+        for ano, linha in zip(anos, Y):
+            self.atualizar(ano, linha)
+
+    def _linha(self, ano: float) -> np.ndarray:
+        return ((ano - self.ano_inicial - self.centro) / self.escala) ** np.arange(self.grau_max + 1)
+
+    def atualizar(self, ano: int, valor) -> None:
+        """
+        Incorpora a observação de um novo ano (ponto de entrada para cada nova divulgação do INEP).
+
+        Args:
+            ano (int): Ano observado, posterior aos já incorporados.
+            valor (float | array-like): Valor de cada série nesse ano, shape (s,).
+        """
+        x = self._linha(float(ano))
+        y = np.broadcast_to(np.asarray(valor, dtype=np.float64), self.z.shape[1:]).copy()
+        self.valores.append(y.copy())
+        self.soma_y2 += y ** 2
+        for i in range(self.grau_max + 1):
+            if x[i] == 0:
+                continue
+            r = np.hypot(self.R[i, i], x[i])
+            c, sn = self.R[i, i] / r, x[i] / r
+            linha_r = self.R[i, i:].copy()
+            self.R[i, i:] = c * linha_r + sn * x[i:]
+            x[i:] = -sn * linha_r + c * x[i:]
+            z_i = self.z[i].copy()
+            self.z[i] = c * z_i + sn * y
+            y = -sn * z_i + c * y
+        self.anos.append(float(ano))
+
+    def copiar(self) -> 'RegressaoIncremental':
+        """Cópia independente do estado (para atualizar sem alterar o original)."""
+        return RegressaoIncremental.de_estado(self.estado())
+
+    def _coeficientes_escalados(self, grau: int) -> np.ndarray:
+        p = grau + 1
+        diagonal = np.abs(np.diag(self.R))
+        if p > len(self.anos) or diagonal[:p].min() <= 1e-10 * diagonal[0]:
+            return np.full((p, self.z.shape[1]), np.nan)
+        return np.linalg.solve(self.R[:p, :p], self.z[:p])
+
+    def coeficientes(self, grau: int) -> np.ndarray:
+        """Coeficientes (grau + 1, s) em potências de (ano - ano_inicial), como em ajustar_polinomios."""
+        return _para_base_original(self._coeficientes_escalados(grau), self.centro, self.escala)
+
+    def soma_residuos(self, grau: int) -> np.ndarray:
+        """Soma dos quadrados dos resíduos de cada série para o grau pedido, shape (s,)."""
+        return np.maximum(self.soma_y2 - (self.z[:grau + 1] ** 2).sum(axis=0), 0.0)
+
+    def prever(self, anos_para_prever: int, grau: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Prevê os próximos anos após o último ano observado.
+
+        Args:
+            anos_para_prever (int): Número de anos futuros.
+            grau (int): Grau do polinômio.
+
+        Returns:
+            tuple: Anos futuros (h,) e previsões (h, s).
+        """
+        anos_futuros = max(self.anos) + np.arange(1, anos_para_prever + 1)
+        V_futuro = np.array([self._linha(a)[:grau + 1] for a in anos_futuros]).reshape(len(anos_futuros), grau + 1)
+        return anos_futuros, V_futuro @ self._coeficientes_escalados(grau)
+
+    def resultado(self, graus=GRAUS_CANDIDATOS, anos_para_prever: int = 0, nivel: float = 0.95) -> dict:
+        """
+        Ajustes, métricas e intervalos de todos os graus, no formato de ajustar_polinomios, a partir do fator R guardado.
 
-    # Normalizar os anos futuros da mesma forma
-    ultimo_ano_original = df_limpo['Ano'].values[-1]
-    anos_futuros_original = np.array([ultimo_ano_original + i + 1 for i in range(anos_para_prever)])
-    anos_futuros_normalizado = anos_futuros_original - ano_inicial
+        Nenhuma fatoração é refeita: as colunas de Q (para a alavancagem do erro leave-one-out) saem
+        de um solve triangular com R, e os resíduos das observações guardadas.
 
-    # Construir a Matriz de Design para os anos futuros
-    X_futuro_matrix = np.column_stack([anos_futuros_normalizado**p for p in range(grau + 1)])
+        Args:
+            graus (list[int]): Graus do polinômio (até grau_max).
+            anos_para_prever (int): Número de anos futuros a prever após o último ano.
+            nivel (float): Nível de confiança dos intervalos de previsão.
 
-    # Prever os valores multiplicando a matriz futura pelos coeficientes
-    previsoes = X_futuro_matrix @ beta
+        Returns:
+            dict: Mesmas chaves de ajustar_polinomios.
+        """
+        anos = np.asarray(self.anos)
+        Y = np.asarray(self.valores).reshape(len(anos), -1)
+        V = np.array([self._linha(a) for a in anos])
+        # Colunas identificáveis: as primeiras, até a primeira coluna dependente (ou o número de anos)
+        diagonal = np.abs(np.diag(self.R))
+        identificaveis = diagonal > 1e-10 * diagonal[0]
+        q = min(len(anos), len(diagonal) if identificaveis.all() else int(np.argmin(identificaveis)))
+        Q = np.linalg.solve(self.R[:q, :q].T, V[:, :q].T).T
+        return _ajustes_qr(anos, Y, list(graus), anos_para_prever, nivel, self.ano_inicial, self.centro, self.escala,
+                           Q, self.R, self.z)
 
-    # Montar o DataFrame final para visualização
-    # Curva ajustada sobre os dados históricos
-    y_ajustado = X_hist_matrix @ beta
+    def estado(self) -> dict[str, np.ndarray]:
+        """Arrays que descrevem o estado (o conteúdo gravado por salvar)."""
+        return {
+            'R': self.R.copy(), 'z': self.z.copy(), 'soma_y2': self.soma_y2.copy(), 'anos': np.array(self.anos),
+            'valores': np.asarray(self.valores).reshape(len(self.anos), self.z.shape[1]),
+            'parametros': np.array([self.grau_max, self.ano_inicial, self.centro, self.escala]),
+            'nomes_series': np.array([str(n) for n in self.nomes_series]),
+        }
 
-    df_plot_hist = pd.DataFrame({'Ano': x_hist, 'Total geral': y_hist, 'Tipo': 'Histórico'})
-    df_plot_ajuste = pd.DataFrame({'Ano': x_hist, 'Total geral': y_ajustado, 'Tipo': 'Ajuste Polinomial'})
-    df_futuro = pd.DataFrame({'Ano': anos_futuros, 'Total geral': previsoes, 'Tipo': 'Previsão Polinomial'})
+    @classmethod
+    def de_estado(cls, estado: dict) -> 'RegressaoIncremental':
+        """Recria o objeto a partir de estado(), sem reajustar nenhuma série."""
+        modelo = cls.__new__(cls)
+        grau_max, modelo.ano_inicial, modelo.centro, modelo.escala = (float(v) for v in estado['parametros'])
+        modelo.grau_max = int(grau_max)
+        modelo.R, modelo.z, modelo.soma_y2 = (np.array(estado[campo], dtype=np.float64) for campo in ('R', 'z', 'soma_y2'))
+        modelo.anos = np.asarray(estado['anos'], dtype=np.float64).tolist()
+        modelo.valores = list(np.array(estado['valores'], dtype=np.float64))
+        modelo.nomes_series = np.asarray(estado['nomes_series']).tolist()
+        return modelo
 
-    if mostrar_curva: # Se o usuário quiser ver a curva ajustada
-        # Concatenar os dados históricos, a curva ajustada e as previsões
-        df_final = pd.concat([df_plot_hist, df_plot_ajuste, df_futuro]).reset_index(drop=True)
-    else:
-        # Se não, concatena apenas os dados históricos e as previsões
-        df_final = pd.concat([df_plot_hist, df_futuro]).reset_index(drop=True)
+    def salvar(self, caminho) -> None:
+        """Grava o estado em um arquivo .npz (ex: ao lado do cache Parquet dos dados)."""
+        np.savez(caminho, **self.estado())
 
-    return df_final, beta
\ No newline at end of file
+    @classmethod
+    def carregar(cls, caminho) -> 'RegressaoIncremental':
+        """Recria o estado gravado por salvar, sem reajustar nenhuma série."""
+        with np.load(caminho) as arquivo:
+            return cls.de_estado(arquivo)
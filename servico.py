@@ -0,0 +1,336 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+import tornado.web
+
+from dados import colunas_medidas
+from pipeline import carregar_etapa, carregar_instantaneo
+from previsoes import COLUNAS_PREVISAO, HORIZONTE_MAXIMO, consultar_previsao, indexar_previsoes
+from regression import GRAUS_CANDIDATOS, ajustar_polinomios, melhor_grau, tabela_ajustes, tabela_metricas
+from taxas import DEFASAGEM_MAXIMA, fatiar_taxas
+
+ENDERECO = '127.0.0.1'
+PORTA = 8600
+BASES = ('Ingressantes', 'Concluintes')
+# Limite de memória das respostas serializadas guardadas
+TAMANHO_MAXIMO_BYTES = 64 * 1024 * 1024
+TIPO_JSON = 'application/json; charset=utf-8'
+TIPO_ARROW = 'application/vnd.apache.arrow.stream'
+
+
+class Armazem:
+    """
+    Estado compartilhado pelo serviço: tabelas, camada de consultas, previsões e respostas prontas.
+
+    É carregado uma vez (das etapas em cache do pipeline) e atende todas as requisições. As
+    respostas já serializadas ficam em um LRU limitado em bytes, pela chave canônica da requisição;
+    o ETag de uma resposta depende só da versão dos dados e dessa chave, então um If-None-Match
+    é respondido sem calcular nem serializar nada.
+
+    Args:
+        tamanho_maximo_bytes (int): Limite da soma dos tamanhos das respostas guardadas.
+    """
+
+    def __init__(self, tamanho_maximo_bytes: int = TAMANHO_MAXIMO_BYTES):
+        self.consultas = carregar_instantaneo()
+        self.tabelas = self.consultas.tabelas
+        self.versao = self.consultas.versao
+        # A etapa 'previsoes' é gerada antes (python pipeline.py); sem ela as previsões são ajustadas a cada requisição
+        try:
+            self.previsoes = indexar_previsoes(carregar_etapa('previsoes', calcular=False)['previsoes'])
+        except FileNotFoundError:
+            self.previsoes = None
+        # As taxas cobrem todas as medidas, com o próprio nome da coluna como categoria
+        medidas = colunas_medidas(self.tabelas['Ingressantes'])
+        self.categorias_taxas = {coluna: (coluna, coluna) for coluna in medidas}
+        self.tamanho_maximo_bytes = tamanho_maximo_bytes
+        self.bytes = 0
+        self.acertos = 0
+        self.faltas = 0
+        self._respostas = OrderedDict()
+        self._trava = threading.Lock()
+
+    def etag(self, chave: tuple) -> str:
+        return hashlib.sha256(repr((self.versao, chave)).encode()).hexdigest()[:32]
+
+    def resposta(self, chave: tuple, construir) -> bytes:
+        """
+        Corpo serializado da resposta da chave, construído com `construir()` se não estiver guardado.
+
+        Args:
+            chave (tuple): Chave canônica da requisição (inclui o formato).
+            construir (callable): Função sem argumentos que devolve os bytes da resposta.
+
+        Returns:
+            bytes: Corpo da resposta.
+        """
+        with self._trava:
+            corpo = self._respostas.get(chave)
+            if corpo is not None:
+                self._respostas.move_to_end(chave)
+                self.acertos += 1
+                return corpo
+
+        # Construção fora da trava: requisições iguais e simultâneas podem calcular a mesma resposta, o que é inofensivo
+        corpo = construir()
+        with self._trava:
+            self.faltas += 1
+            if chave not in self._respostas:
+                self._respostas[chave] = corpo
+                self.bytes += len(corpo)
+            while self.bytes > self.tamanho_maximo_bytes and len(self._respostas) > 1:
+                _, removida = self._respostas.popitem(last=False)
+                self.bytes -= len(removida)
+        return corpo
+
+
+# --- Serialização ---
+
+def _registros(df: pd.DataFrame) -> list[dict]:
+    # to_json converte os tipos do numpy e NaN (vira null) do mesmo jeito em todas as respostas
+    return json.loads(df.to_json(orient='records', force_ascii=False))
+
+
+def _json(dados) -> bytes:
+    return json.dumps(dados, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _arrow(df: pd.DataFrame) -> bytes:
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    return sink.getvalue().to_pybytes()
+
+
+# --- Cálculos de cada recurso ---
+# Cada função devolve (dados em JSON, tabela principal para Arrow).
+
+def _tabela(armazem: Armazem, base: str) -> tuple[dict, pd.DataFrame]:
+    df = armazem.tabelas[base]
+    return {'base': base, 'linhas': _registros(df)}, df
+
+
+def _kpis(armazem: Armazem, base: str, ano_inicio: int, ano_fim: int, graus: tuple) -> tuple[dict, pd.DataFrame]:
+    resultado = armazem.consultas.resultado(base, ano_inicio, ano_fim, graus)
+    dados = {
+        'base': base, 'ano_inicio': ano_inicio, 'ano_fim': ano_fim, 'graus': list(graus),
+        'totais': {coluna: int(valor) for coluna, valor in resultado['totais'].items()},
+        'serie': _registros(resultado['serie']),
+    }
+    return dados, resultado['serie']
+
+
+def _taxas(armazem: Armazem, graus: tuple, anos_ingresso: tuple, defasagem: int, categorias: tuple) -> tuple[dict, pd.DataFrame]:
+    df = fatiar_taxas(armazem.consultas.matriz_taxas(armazem.categorias_taxas, graus), range(anos_ingresso[0], anos_ingresso[1] + 1), defasagem, list(categorias))
+    dados = {'graus': list(graus), 'anos_ingresso': list(anos_ingresso), 'defasagem': defasagem, 'taxas': _registros(df)}
+    return dados, df
+
+
+def _previsao(armazem: Armazem, base: str, ano_inicio: int, ano_fim: int, graus: tuple, coluna: str,
+              anos_para_prever: int, grau: int | None) -> tuple[dict, pd.DataFrame]:
+    # Verificado antes da consulta, como no dashboard: a tabela pré-calculada também tem períodos curtos (sem ajustes)
+    serie = armazem.consultas.resultado(base, ano_inicio, ano_fim, graus)['serie']
+    if len(serie) < 3:
+        raise tornado.web.HTTPError(400, reason="São necessários pelo menos 3 anos de dados para a previsão")
+    resultado = consultar_previsao(armazem.previsoes, base, graus, ano_inicio, ano_fim, coluna, anos_para_prever)
+    if resultado is None:  # Combinação fora da tabela pré-calculada (ou tabela não gerada): ajusta na hora, como o dashboard
+        resultado = ajustar_polinomios(serie['Ano'], serie[coluna], GRAUS_CANDIDATOS, anos_para_prever)
+    grau_sugerido = int(melhor_grau(resultado)[0])
+    grau = grau_sugerido if grau is None else grau
+    i = list(resultado['graus']).index(grau)
+    ajustes = tabela_ajustes(resultado, [coluna])
+    ajustes = ajustes[ajustes['Grau'] == grau].reset_index(drop=True)
+    intervalo = pd.DataFrame({
+        'Ano': resultado['anos_futuros'].astype(int),
+        'Previsão': resultado['previsoes'][i, :, 0],
+        'Limite inferior': resultado['limite_inferior'][i, :, 0],
+        'Limite superior': resultado['limite_superior'][i, :, 0],
+    })
+    dados = {
+        'base': base, 'ano_inicio': ano_inicio, 'ano_fim': ano_fim, 'graus': list(graus), 'coluna': coluna,
+        'grau': grau, 'grau_sugerido': grau_sugerido,
+        # Polinômio em potências de (Ano - ano_inicial)
+        'ano_inicial': int(resultado['ano_inicial']),
+        'coeficientes': _registros(pd.DataFrame({'Potência': range(grau + 1), 'Coeficiente': resultado['coeficientes'][i, :grau + 1, 0]})),
+        'intervalo': _registros(intervalo),
+        'metricas': _registros(tabela_metricas(resultado, [coluna])),
+        'ajustes': _registros(ajustes),
+    }
+    return dados, ajustes
+
+
+# --- Handlers ---
+
+class BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, armazem: Armazem):
+        self.armazem = armazem
+
+    def write_error(self, status_code: int, **kwargs):
+        self.set_header('Content-Type', TIPO_JSON)
+        self.finish(_json({'erro': self._reason, 'status': status_code}))
+
+    def formato(self) -> str:
+        formato = self.get_query_argument('formato', None)
+        if formato is None:
+            formato = 'arrow' if TIPO_ARROW in self.request.headers.get('Accept', '') else 'json'
+        if formato not in ('json', 'arrow'):
+            raise tornado.web.HTTPError(400, reason="formato deve ser 'json' ou 'arrow'")
+        return formato
+
+    def inteiro(self, nome: str, padrao: int | None = None, minimo: int | None = None, maximo: int | None = None) -> int | None:
+        valor = self.get_query_argument(nome, None)
+        if valor is None:
+            return padrao
+        try:
+            valor = int(valor)
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason=f"{nome} deve ser um inteiro")
+        if (minimo is not None and valor < minimo) or (maximo is not None and valor > maximo):
+            raise tornado.web.HTTPError(400, reason=f"{nome} deve estar entre {minimo} e {maximo}")
+        return valor
+
+    def lista(self, nome: str, opcoes: list[str]) -> tuple:
+        # Lista separada por vírgulas (ou parâmetro repetido); ausente = todas as opções. Ordem canônica, para a chave
+        valores = [v for argumento in self.get_query_arguments(nome) for v in argumento.split(',') if v]
+        invalidos = [v for v in valores if v not in opcoes]
+        if invalidos:
+            raise tornado.web.HTTPError(400, reason=f"{nome} inválido(s): {', '.join(invalidos)}")
+        return tuple(sorted(valores or opcoes))
+
+    def base(self, base: str | None = None) -> str:
+        # Base na rota (recurso inexistente: 404) ou no parâmetro 'base' (requisição inválida: 400)
+        status = 400 if base is None else 404
+        base = self.get_query_argument('base', 'Ingressantes') if base is None else base
+        if base not in BASES:
+            raise tornado.web.HTTPError(status, reason=f"base deve ser uma de {', '.join(BASES)}")
+        return base
+
+    def periodo(self, base: str) -> tuple[int, int]:
+        anos = self.armazem.consultas.anos(base)
+        ano_inicio = self.inteiro('ano_inicio', int(anos[0]), int(anos[0]), int(anos[-1]))
+        ano_fim = self.inteiro('ano_fim', int(anos[-1]), ano_inicio, int(anos[-1]))
+        return ano_inicio, ano_fim
+
+    async def responder(self, chave: tuple, calcular) -> None:
+        """
+        Responde com o recurso da chave, em JSON ou Arrow, usando ETag/If-None-Match.
+
+        Args:
+            chave (tuple): Parâmetros canônicos do recurso (sem o formato).
+            calcular (callable): Função sem argumentos que devolve (dados JSON, DataFrame para Arrow).
+        """
+        formato = self.formato()
+        chave = (self.request.path, formato) + chave
+        self.set_header('Etag', f'"{self.armazem.etag(chave)}"')
+        self.set_header('Cache-Control', 'no-cache')  # O cliente pode guardar, mas revalida com If-None-Match
+        self.set_header('Vary', 'Accept')
+        if self.check_etag_header():
+            self.set_status(304)
+            return
+
+        def construir() -> bytes:
+            dados, df = calcular()
+            return _arrow(df) if formato == 'arrow' else _json(dados)
+
+        # Cálculos fora do laço de eventos: uma resposta lenta não segura as outras requisições
+        corpo = await asyncio.get_running_loop().run_in_executor(None, self.armazem.resposta, chave, construir)
+        self.set_header('Content-Type', TIPO_ARROW if formato == 'arrow' else TIPO_JSON)
+        self.write(corpo)
+
+
+class SaudeHandler(BaseHandler):
+    def get(self):
+        self.set_header('Content-Type', TIPO_JSON)
+        self.write(_json({
+            'versao': self.armazem.versao, 'bases': list(BASES),
+            'respostas_guardadas': len(self.armazem._respostas), 'bytes': self.armazem.bytes,
+            'acertos': self.armazem.acertos, 'faltas': self.armazem.faltas,
+        }))
+
+
+class TabelaHandler(BaseHandler):
+    async def get(self, base: str):
+        base = self.base(base)
+        await self.responder((base,), lambda: _tabela(self.armazem, base))
+
+
+class KpisHandler(BaseHandler):
+    async def get(self):
+        base = self.base()
+        ano_inicio, ano_fim = self.periodo(base)
+        graus = self.lista('graus', self.armazem.consultas.graus(base))
+        await self.responder((base, ano_inicio, ano_fim, graus), lambda: _kpis(self.armazem, base, ano_inicio, ano_fim, graus))
+
+
+class TaxasHandler(BaseHandler):
+    async def get(self):
+        graus = self.lista('graus', self.armazem.consultas.graus('Ingressantes'))
+        anos = self.armazem.consultas.anos('Ingressantes')
+        defasagem = self.inteiro('defasagem', 5, 1, DEFASAGEM_MAXIMA)
+        anos_ingresso = (self.inteiro('ingresso_inicio', int(anos[0]), int(anos[0]), int(anos[-1])),
+                         self.inteiro('ingresso_fim', int(anos[-1]) - defasagem, int(anos[0]), int(anos[-1])))
+        categorias = self.lista('categorias', list(self.armazem.categorias_taxas))
+        await self.responder((graus, anos_ingresso, defasagem, categorias),
+                             lambda: _taxas(self.armazem, graus, anos_ingresso, defasagem, categorias))
+
+
+class PrevisaoHandler(BaseHandler):
+    async def get(self):
+        base = self.base()
+        ano_inicio, ano_fim = self.periodo(base)
+        graus = self.lista('graus', self.armazem.consultas.graus(base))
+        coluna = self.get_query_argument('coluna', COLUNAS_PREVISAO[0])
+        if coluna not in self.armazem.consultas.cubos[base]['medidas']:
+            raise tornado.web.HTTPError(400, reason=f"coluna desconhecida: {coluna}")
+        anos_para_prever = self.inteiro('anos', 3, 1, HORIZONTE_MAXIMO)
+        grau = self.inteiro('grau', None, min(GRAUS_CANDIDATOS), max(GRAUS_CANDIDATOS))
+        await self.responder(
+            (base, ano_inicio, ano_fim, graus, coluna, anos_para_prever, grau),
+            lambda: _previsao(self.armazem, base, ano_inicio, ano_fim, graus, coluna, anos_para_prever, grau)
+        )
+
+
+def criar_aplicacao(armazem: Armazem | None = None) -> tornado.web.Application:
+    """
+    Aplicação tornado com os endpoints do serviço.
+
+    Endpoints (GET; JSON por padrão, Arrow IPC com ?formato=arrow ou Accept: application/vnd.apache.arrow.stream):
+        /saude: versão dos dados e contadores do cache de respostas.
+        /tabelas/<base>: tabela larga limpa.
+        /kpis?base=&ano_inicio=&ano_fim=&graus=: totais do período e série anual (como a barra lateral do dashboard).
+        /taxas?graus=&ingresso_inicio=&ingresso_fim=&defasagem=&categorias=: taxas de aproveitamento.
+        /previsoes?base=&ano_inicio=&ano_fim=&graus=&coluna=&anos=&grau=: previsão polinomial e métricas.
+
+    Args:
+        armazem (Armazem | None): Estado compartilhado. Se None, carrega um novo.
+    """
+    argumentos = {'armazem': armazem or Armazem()}
+    return tornado.web.Application([
+        (r'/saude', SaudeHandler, argumentos),
+        (r'/tabelas/([^/]+)', TabelaHandler, argumentos),
+        (r'/kpis', KpisHandler, argumentos),
+        (r'/taxas', TaxasHandler, argumentos),
+        (r'/previsoes', PrevisaoHandler, argumentos),
+    ])
+
+
+async def servir(endereco: str = ENDERECO, porta: int = PORTA) -> None:
+    aplicacao = criar_aplicacao()
+    aplicacao.listen(porta, address=endereco)
+    print(f"Serviço de agregados em http://{endereco}:{porta}", flush=True)
+    await asyncio.Event().wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serviço HTTP local com os agregados do censo (JSON/Arrow).")
+    parser.add_argument('--endereco', default=ENDERECO, help="Endereço de escuta (padrão: só a máquina local).")
+    parser.add_argument('--porta', type=int, default=PORTA, help="Porta de escuta.")
+    args = parser.parse_args()
+    asyncio.run(servir(args.endereco, args.porta))
@@ -0,0 +1,176 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from dados import MAPA_COLUNAS, colunas_medidas, compactar_tabela
+
+ANOS = range(2013, 2024)
+GRAUS_INGRESSANTES = ['Bacharelado', 'Licenciatura', 'Tecnológico', 'Não aplicável']
+GRAUS_CONCLUINTES = ['Bacharelado', 'Licenciatura', 'Tecnológico']
+
+# Colunas-folha (uma modalidade e uma subcategoria): as demais colunas da tabela larga são somas delas
+FOLHAS = [(coluna, m, c, s) for coluna, m, c, s in MAPA_COLUNAS if m != 'Total' and s != 'Total']
+# Ordem de grandeza do total nacional por ano nas tabelas reais de 2013 a 2023
+TOTAL_ANUAL = {'Ingressantes': 3_500_000, 'Concluintes': 1_200_000}
+# Os concluintes de um ano vêm dos ingressantes de DEFASAGEM anos antes, com esta taxa média de conclusão
+DEFASAGEM = 4
+TAXA_CONCLUSAO = 0.35
+# Eixos de tempo mais longos que o dos dados reais têm a mesma tendência comprimida nesse intervalo:
+# crescimento, curvatura e avanço do ensino a distância ficam limitados mesmo com milhares de anos
+ANOS_REFERENCIA = len(ANOS)
+
+
+def _matriz_agregacao() -> np.ndarray:
+    # (n_folhas, n_colunas): 1 onde a folha entra na soma da coluna ('Total' em uma dimensão soma todos os valores dela)
+    matriz = np.zeros((len(FOLHAS), len(MAPA_COLUNAS)))
+    for i, (_, m, c, s) in enumerate(FOLHAS):
+        for j, (_, mc, cc, sc) in enumerate(MAPA_COLUNAS):
+            matriz[i, j] = mc in ('Total', m) and cc in ('Total', c) and sc in ('Total', s)
+    return matriz
+
+
+def _niveis(dimensoes: dict) -> dict[str, list[str]]:
+    # Dimensão extra -> valores; um inteiro n vira n valores numerados ('UF 01', 'UF 02', ...)
+    niveis = {}
+    for nome, valores in (dimensoes or {}).items():
+        if isinstance(valores, int):
+            largura = len(str(valores))
+            valores = [f'{nome} {i:0{largura}d}' for i in range(1, valores + 1)]
+        niveis[nome] = list(valores)
+    return niveis
+
+
+def _folhas(rng: np.random.Generator, n_anos: int, n_celulas: int, n_graus: int, total_anual: float) -> np.ndarray:
+    # Valores das colunas-folha, shape (n_anos, n_celulas, n_graus, n_folhas), em ponto flutuante
+    escala = min(1.0, ANOS_REFERENCIA / n_anos)
+    t = escala * np.arange(n_anos, dtype=np.float64)[:, None, None, None]
+    # Peso de cada grau e de cada combinação das dimensões extras (somam 1, para manter o total nacional)
+    peso_grau = rng.dirichlet(np.full(n_graus, 2.0))
+    peso_celula = rng.dirichlet(np.full(n_celulas, 1.0)) if n_celulas > 1 else np.ones(1)
+    # Participação de cada folha por grau; o ensino a distância cresce ao longo dos anos, como nos dados reais
+    participacao = rng.dirichlet(np.ones(len(FOLHAS)), size=n_graus)[None, None]
+    remota = np.array([m == 'A distância' for _, m, *_ in FOLHAS])
+    participacao = participacao * np.where(remota, np.exp(0.12 * t), 1.0)
+    participacao /= participacao.sum(axis=-1, keepdims=True)
+    # Tendência suave por grau (crescimento e curvatura) com ruído multiplicativo em cada célula
+    crescimento = rng.normal(0.02, 0.03, size=n_graus)[:, None]
+    curvatura = rng.normal(0.0, 0.002, size=n_graus)[:, None]
+    tendencia = np.exp(crescimento * t + curvatura * (t - escala * n_anos / 2) ** 2)
+    # Produto feito no próprio array do ruído: em milhões de linhas, cada cópia temporária pesa centenas de MiB
+    valores = rng.lognormal(0.0, 0.05, size=(n_anos, n_celulas, n_graus, len(FOLHAS)))
+    valores *= total_anual * peso_celula[None, :, None, None] * peso_grau[None, None, :, None]
+    valores *= tendencia
+    valores *= participacao
+    return valores
+
+
+def _montar_tabela(folhas: np.ndarray, anos: np.ndarray, graus: list[str], niveis: dict) -> pd.DataFrame:
+    # Acrescenta a linha 'Total' de cada ano e célula, expande as folhas nas 24 colunas e empilha as linhas
+    n_anos, n_celulas, n_graus, _ = folhas.shape
+    # Contas em float64 (BLAS), exatas para inteiros dessa ordem de grandeza; só o resultado vira inteiro
+    folhas = np.rint(folhas)
+    if not np.isfinite(folhas).all():
+        raise ValueError("Valores sintéticos não finitos: a conversão para inteiros produziria lixo.")
+    folhas = np.concatenate([folhas.sum(axis=2, keepdims=True), folhas], axis=2)
+    valores = (folhas.reshape(-1, len(FOLHAS)) @ _matriz_agregacao()).astype(np.int64)
+
+    graus = ['Total'] + list(graus)
+    df = pd.DataFrame(valores, columns=[coluna for coluna, *_ in MAPA_COLUNAS])
+    df.insert(0, 'Ano', np.repeat(anos, n_celulas * len(graus)))
+    df.insert(1, 'Grau', pd.Categorical.from_codes(np.tile(np.arange(len(graus)), n_anos * n_celulas), graus))
+    # As dimensões extras variam mais devagar que o grau e mais rápido que o ano
+    if niveis:
+        celulas = np.tile(np.repeat(np.arange(n_celulas), len(graus)), n_anos)
+        codigos = np.unravel_index(celulas, [len(valores) for valores in niveis.values()])
+        for posicao, ((nome, valores), codigo) in enumerate(zip(niveis.items(), codigos), start=2):
+            df.insert(posicao, nome, pd.Categorical.from_codes(codigo, valores))
+    return compactar_tabela(df)
+
+
+def gerar_censo(anos=ANOS, graus_ingressantes: list[str] = GRAUS_INGRESSANTES,
+                graus_concluintes: list[str] = GRAUS_CONCLUINTES, dimensoes: dict | None = None,
+                semente: int = 0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Gera tabelas sintéticas de ingressantes e concluintes com o mesmo esquema das tabelas do INEP.
+
+    Cada ano tem uma linha 'Total' e uma linha por grau (para cada combinação das dimensões
+    extras), com as 24 colunas de MAPA_COLUNAS coerentes entre si: as colunas de total são
+    somas exatas das colunas detalhadas. Os concluintes acompanham os ingressantes de DEFASAGEM
+    anos antes, então as taxas de aproveitamento ficam em uma faixa realista. O resultado é
+    determinístico para a mesma semente.
+
+    Args:
+        anos (iterable): Anos das tabelas.
+        graus_ingressantes (list[str]): Graus acadêmicos dos ingressantes (sem 'Total').
+        graus_concluintes (list[str]): Graus dos concluintes; devem estar entre os dos ingressantes.
+        dimensoes (dict | None): Dimensões categóricas extras, inseridas depois de 'Grau':
+            nome -> lista de valores ou número de valores (ex: {'UF': 27}). Multiplicam o número de linhas.
+        semente (int): Semente do gerador aleatório.
+
+    Returns:
+        tuple: DataFrames de ingressantes e concluintes, compactados como os do cache (ver compactar_tabela).
+    """
+    anos = np.asarray(list(anos), dtype=np.int64)
+    niveis = _niveis(dimensoes)
+    n_celulas = math.prod(len(valores) for valores in niveis.values())
+    rng = np.random.default_rng(semente)
+
+    folhas_ing = _folhas(rng, len(anos), n_celulas, len(graus_ingressantes), TOTAL_ANUAL['Ingressantes'])
+    # Ingressantes de DEFASAGEM anos antes (o primeiro ano se repete para o início da série)
+    origem = np.maximum(np.arange(len(anos)) - DEFASAGEM, 0)
+    posicoes = [graus_ingressantes.index(g) for g in graus_concluintes]
+    taxa = rng.normal(TAXA_CONCLUSAO, 0.05, size=len(graus_concluintes)).clip(0.05, 0.9)
+    folhas_con = folhas_ing[origem][:, :, posicoes]
+    folhas_con *= taxa[None, None, :, None]
+    folhas_con *= rng.lognormal(0.0, 0.05, size=folhas_con.shape)
+
+    return (_montar_tabela(folhas_ing, anos, graus_ingressantes, niveis),
+            _montar_tabela(folhas_con, anos, graus_concluintes, niveis))
+
+
+def dimensionar(linhas: int, anos: int = len(ANOS), graus: int = len(GRAUS_INGRESSANTES), nome: str = 'Região') -> dict:
+    """
+    Dimensão extra com o tamanho necessário para que os ingressantes tenham cerca de `linhas` linhas.
+
+    Returns:
+        dict: Argumento `dimensoes` de gerar_censo ({} se o tamanho natural já basta).
+    """
+    n = max(1, round(linhas / (anos * (graus + 1))))
+    return {nome: n} if n > 1 else {}
+
+
+def escalar_tabela(df: pd.DataFrame, fator: int, semente: int = 0) -> pd.DataFrame:
+    """
+    Aumenta uma tabela do censo em aproximadamente `fator` vezes, mantendo o esquema.
+
+    Metade do fator (em escala logarítmica) vira anos extras, a outra metade vira graus extras.
+    Os valores são os reais com um ruído multiplicativo, de forma determinística.
+
+    Args:
+        df (pd.DataFrame): Tabela larga de ingressantes ou concluintes.
+        fator (int): Fator de aumento do número de linhas.
+        semente (int): Semente do gerador aleatório.
+
+    Returns:
+        pd.DataFrame: Tabela com as mesmas colunas e tipos.
+    """
+    if fator <= 1:
+        return df.copy()
+    rng = np.random.default_rng(semente)
+    fator_anos = max(1, round(math.sqrt(fator)))
+    fator_graus = max(1, round(fator / fator_anos))
+    n_anos = df['Ano'].nunique()
+    numericas = colunas_medidas(df)
+
+    partes = []
+    for bloco_ano in range(fator_anos):
+        for bloco_grau in range(fator_graus):
+            parte = df.copy()
+            parte['Ano'] = parte['Ano'] + bloco_ano * n_anos
+            if bloco_grau:
+                parte['Grau'] = parte['Grau'].astype(str) + f' {bloco_grau}'
+            ruido = rng.uniform(0.8, 1.2, size=(len(parte), len(numericas)))
+            parte[numericas] = (parte[numericas].to_numpy() * ruido).astype(np.int64)
+            partes.append(parte)
+    return compactar_tabela(pd.concat(partes, ignore_index=True))
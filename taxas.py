@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+DEFASAGEM_MAXIMA = 10
+
+
+def matriz_aproveitamento(df_ingressantes: pd.DataFrame, df_concluintes: pd.DataFrame,
+                          dicionario_modalidades: dict, defasagem_maxima: int = DEFASAGEM_MAXIMA) -> dict:
+    """
+    Calcula a taxa de aproveitamento para todos os anos de ingresso, defasagens e categorias de uma vez.
+
+    Os dois DataFrames são agregados por ano uma única vez; as defasagens viram um deslocamento
+    do índice de anos dos concluintes, sem laços sobre anos ou categorias.
+
+    Args:
+        df_ingressantes (pd.DataFrame): Ingressantes (já filtrados por grau, se for o caso).
+        df_concluintes (pd.DataFrame): Concluintes (já filtrados por grau, se for o caso).
+        dicionario_modalidades (dict): Categoria -> (coluna de ingressantes, coluna de concluintes).
+        defasagem_maxima (int): Maior defasagem calculada (as defasagens vão de 1 até este valor).
+
+    Returns:
+        dict: 'anos' (n_anos,), 'defasagens' (n_def,), 'categorias' (n_cat,) e 'taxas' (n_anos, n_def, n_cat),
+        com NaN onde o ano de conclusão não existe nos dados.
+    """
+    categorias = list(dicionario_modalidades)
+    colunas_ing = [c_ing for c_ing, _ in dicionario_modalidades.values()]
+    colunas_conc = [c_conc for _, c_conc in dicionario_modalidades.values()]
+
+    # Pré-agregação por ano (uma passada em cada base)
+    ing_por_ano = df_ingressantes.groupby('Ano')[list(dict.fromkeys(colunas_ing))].sum()
+    conc_por_ano = df_concluintes.groupby('Ano')[list(dict.fromkeys(colunas_conc))].sum()
+
+    anos = np.union1d(ing_por_ano.index.to_numpy(), conc_por_ano.index.to_numpy()).astype(int)
+    defasagens = np.arange(1, defasagem_maxima + 1)
+
+    ing = ing_por_ano.reindex(anos, fill_value=0)[colunas_ing].to_numpy(dtype=np.float64)  # (n_anos, n_cat)
+
+    # Junção deslocada: para cada (ano, defasagem), a linha de concluintes de ano + defasagem
+    anos_conclusao = (anos[:, None] + defasagens[None, :]).ravel()
+    conc = conc_por_ano[colunas_conc].reindex(anos_conclusao).to_numpy(dtype=np.float64)
+    conc = conc.reshape(len(anos), len(defasagens), len(categorias))  # NaN se o ano não existe
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        taxas = np.where(ing[:, None, :] > 0, conc / ing[:, None, :] * 100, 0.0)
+    taxas = np.where(np.isnan(conc), np.nan, np.round(taxas, 2))
+
+    return {'anos': anos, 'defasagens': defasagens, 'categorias': categorias, 'taxas': taxas}
+
+
+def fatiar_taxas(matriz: dict, anos_ingresso, defasagem: int, categorias: list[str] | None = None) -> pd.DataFrame:
+    """
+    Extrai da matriz pré-calculada as taxas de uma defasagem para os anos de ingresso pedidos.
+
+    Args:
+        matriz (dict): Saída de matriz_aproveitamento.
+        anos_ingresso (iterable): Anos de ingresso a incluir.
+        defasagem (int): Número de anos entre ingresso e conclusão.
+        categorias (list[str] | None): Subconjunto de categorias. Se None, usa todas.
+
+    Returns:
+        pd.DataFrame: Colunas 'Ano Ingresso', 'Ano Conclusão', 'Categoria' e 'Taxa de Aproveitamento (%)',
+        no mesmo formato da antiga implementação em laço.
+    """
+    colunas = ['Ano Ingresso', 'Ano Conclusão', 'Categoria', 'Taxa de Aproveitamento (%)']
+    categorias = matriz['categorias'] if categorias is None else categorias
+    anos = matriz['anos']
+    if defasagem not in matriz['defasagens']:
+        return pd.DataFrame(columns=colunas)
+
+    posicoes_anos = np.flatnonzero(np.isin(anos, np.asarray(list(anos_ingresso), dtype=int)))
+    posicoes_cat = [matriz['categorias'].index(c) for c in categorias]
+
+    bloco = matriz['taxas'][posicoes_anos, defasagem - 1][:, posicoes_cat]  # (n_anos, n_cat)
+    validos = ~np.isnan(bloco).all(axis=1)
+    bloco, anos_validos = bloco[validos], anos[posicoes_anos][validos]
+
+    return pd.DataFrame({
+        'Ano Ingresso': np.repeat(anos_validos, len(categorias)),
+        'Ano Conclusão': np.repeat(anos_validos + defasagem, len(categorias)),
+        'Categoria': np.tile(categorias, len(anos_validos)),
+        'Taxa de Aproveitamento (%)': bloco.ravel(),
+    }, columns=colunas)
+
+
+def tabela_defasagens(matriz: dict, categoria: str) -> pd.DataFrame:
+    """
+    Tabela Ano Ingresso x Defasagem de uma categoria, pronta para um mapa de calor.
+
+    Args:
+        matriz (dict): Saída de matriz_aproveitamento.
+        categoria (str): Categoria a exibir.
+
+    Returns:
+        pd.DataFrame: Índice com os anos de ingresso, colunas com as defasagens e valores em %.
+    """
+    taxas = matriz['taxas'][:, :, matriz['categorias'].index(categoria)]
+    df = pd.DataFrame(taxas, index=pd.Index(matriz['anos'], name='Ano Ingresso'),
+                      columns=pd.Index(matriz['defasagens'], name='Defasagem (anos)'))
+    return df.dropna(how='all')
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os módulos do projeto ficam na raiz do repositório, sem pacote instalável
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from microdados import CAMINHO_AMOSTRA, abrir_microdados, agregar_microdados, consultar_microdados, ingerir_microdados, _filtro
+
+# Amostra de data/fixtures: 63 cursos de 2022 e 2023, um deles sem categoria administrativa
+LINHAS_AMOSTRA = 63
+
+
+@pytest.fixture(scope='module')
+def dataset(tmp_path_factory):
+    destino = tmp_path_factory.mktemp('microdados') / 'dataset'
+    # Blocos pequenos para passar por vários blocos e partições
+    resumo = ingerir_microdados([CAMINHO_AMOSTRA], destino, linhas_por_bloco=10)
+    return destino, resumo
+
+
+def test_ingestao_conta_linhas_e_descartes(dataset):
+    destino, resumo = dataset
+    assert resumo['linhas'] == 62
+    assert resumo['descartadas'] == 1
+    assert resumo['linhas'] + resumo['descartadas'] == LINHAS_AMOSTRA
+    assert resumo['blocos'] == 7
+    assert resumo['anos'] == [2022, 2023]
+    assert abrir_microdados(destino).count_rows() == 62
+
+
+def test_consulta_le_so_a_particao_filtrada(dataset):
+    destino, _ = dataset
+    fragmentos = list(abrir_microdados(destino).get_fragments(filter=_filtro(anos=[2023])))
+    assert fragmentos and all('Ano=2023' in fragmento.path for fragmento in fragmentos)
+
+    df = consultar_microdados(destino, colunas=['Ano', 'SG_UF', 'Ingressantes'], anos=[2023], ufs=['SP'])
+    assert len(df) == 6
+    assert df['Ano'].dtype == np.int16 and (df['Ano'] == 2023).all()
+    assert (df['SG_UF'] == 'SP').all()
+    assert df['Ingressantes'].sum() == 1349
+
+
+def test_categoria_especial_nao_vira_publica(dataset):
+    destino, _ = dataset
+    df = agregar_microdados(['Categoria', 'Subcategoria'], destino, bases=['Ingressantes'])
+    especial = df[df['Categoria'] == 'Especial']
+    assert especial['Subcategoria'].tolist() == ['Especial']
+    assert especial['Ingressantes'].item() == 43 + 277 + 91 + 137 + 359 + 285 + 193 + 103